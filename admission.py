@@ -0,0 +1,165 @@
+"""
+Admission control for chat turns.
+
+At most `MAX_INFLIGHT_RUNS` turns run at once and each session has at most
+one turn running; a new message from the same session waits behind the
+previous one, since a thread accepts a single active run. Turns that cannot
+start wait in a bounded queue served round-robin across sessions, so one
+busy user cannot starve the others. When the queue is full, or a turn has
+waited `ADMISSION_MAX_WAIT` seconds for a slot, it is rejected right away
+instead of piling up behind the run timeout. Time spent behind the same
+session's previous turn does not count: that turn is bounded by the message
+timeout, and the follow-up must not be rejected while the server is idle.
+"""
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from metrics import Counter, Gauge, METRIC_PREFIX, STAGE_LATENCY, register
+from shared_logging import logger
+
+# Constants
+MAX_INFLIGHT_RUNS = int(os.environ.get("MAX_INFLIGHT_RUNS", 32))  # Turns running at once, 0 disables admission control
+ADMISSION_QUEUE_SIZE = int(os.environ.get("ADMISSION_QUEUE_SIZE", 64))  # Turns allowed to wait for a slot
+ADMISSION_MAX_WAIT = float(os.environ.get("ADMISSION_MAX_WAIT", 30))  # Seconds a turn may wait for a slot before it is rejected
+MAX_QUEUED_PER_SESSION = 2  # Messages one session may have waiting behind its running turn
+
+ADMISSION_EVENTS = register(Counter(
+    f"{METRIC_PREFIX}_admission_events_total", "Turns admitted or rejected by admission control", "outcome"
+))
+ADMISSION_DEPTH = register(Gauge(
+    f"{METRIC_PREFIX}_admission_turns", "Turns running and waiting for a slot", "state"
+))
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a turn cannot be admitted; the message is safe to show to the user"""
+
+class _Waiter:
+    """A queued turn: eligible once nothing of its own session is ahead of it, granted once it holds a slot"""
+    __slots__ = ("eligible", "granted")
+
+    def __init__(self, loop):
+        self.eligible = loop.create_future()
+        self.granted = loop.create_future()
+
+class AdmissionController:
+    """Global in-flight cap with one running turn per session and a fair bounded wait queue"""
+
+    def __init__(self, max_inflight=MAX_INFLIGHT_RUNS, max_queued=ADMISSION_QUEUE_SIZE,
+                 max_wait=ADMISSION_MAX_WAIT, max_queued_per_session=MAX_QUEUED_PER_SESSION):
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.max_wait = max_wait
+        self.max_queued_per_session = max_queued_per_session
+        self.inflight = 0
+        self.queued = 0
+        self._active = set()  # Sessions with a running turn
+        self._waiting = OrderedDict()  # session id -> deque of _Waiter, in round-robin order
+
+    @asynccontextmanager
+    async def slot(self, session_id):
+        """
+        Hold a turn slot for a session while the enclosed block runs.
+
+        Raises:
+            AdmissionRejected: The queue is full or the wait for a slot exceeded max_wait
+        """
+        if not self.max_inflight:
+            yield
+            return
+        await self._acquire(session_id)
+        try:
+            yield
+        finally:
+            self._release(session_id)
+
+    async def _acquire(self, session_id):
+        start_time = time.perf_counter()
+        # Nobody runnable is waiting whenever a slot is free, so a free slot can be taken directly
+        if self.inflight < self.max_inflight and session_id not in self._active and session_id not in self._waiting:
+            self._admit(session_id)
+            self._record("admitted", start_time)
+            return
+
+        waiters = self._waiting.get(session_id, ())
+        if self.queued >= self.max_queued or len(waiters) >= self.max_queued_per_session:
+            ADMISSION_EVENTS.inc("rejected_full")
+            logger.warning(f"Admission queue full ({self.queued} waiting, {self.inflight} running), rejecting turn")
+            raise AdmissionRejected("The assistant is busy right now. Please try again in a moment.")
+
+        waiter = _Waiter(asyncio.get_running_loop())
+        self._waiting.setdefault(session_id, deque()).append(waiter)
+        self.queued += 1
+        self._mark_eligible(session_id)
+        self._update_depth()
+        try:
+            # Waiting behind this session's own turns is not limited by max_wait
+            await asyncio.wait({waiter.eligible, waiter.granted}, return_when=asyncio.FIRST_COMPLETED)
+            # Shielded so a timeout never cancels a future that is being granted a slot
+            await asyncio.wait_for(asyncio.shield(waiter.granted), self.max_wait)
+        except asyncio.TimeoutError:
+            if not waiter.granted.done():
+                self._withdraw(session_id, waiter)
+                ADMISSION_EVENTS.inc("rejected_timeout")
+                logger.warning(f"Turn waited {self.max_wait}s for a slot, rejecting it")
+                raise AdmissionRejected("The assistant is busy right now. Please try again in a moment.")
+        except asyncio.CancelledError:
+            if waiter.granted.done():
+                # Granted just as the caller went away; hand the slot on
+                self._release(session_id)
+            else:
+                self._withdraw(session_id, waiter)
+            raise
+        self._record("admitted_after_wait", start_time)
+
+    def _admit(self, session_id):
+        self.inflight += 1
+        self._active.add(session_id)
+        self._update_depth()
+
+    def _release(self, session_id):
+        self.inflight -= 1
+        self._active.discard(session_id)
+        self._mark_eligible(session_id)
+        self._dispatch()
+        self._update_depth()
+
+    def _withdraw(self, session_id, waiter):
+        waiters = self._waiting.get(session_id)
+        if waiters is not None and waiter in waiters:
+            waiters.remove(waiter)
+            self.queued -= 1
+            if not waiters:
+                del self._waiting[session_id]
+        self._mark_eligible(session_id)
+        self._update_depth()
+
+    def _mark_eligible(self, session_id):
+        """Start the max_wait clock of a session's oldest waiter once the session has no running turn"""
+        waiters = self._waiting.get(session_id)
+        if waiters and session_id not in self._active and not waiters[0].eligible.done():
+            waiters[0].eligible.set_result(None)
+
+    def _dispatch(self):
+        """Grant free slots to the oldest waiter of each idle session, round-robin"""
+        while self.inflight < self.max_inflight:
+            session_id = next((sid for sid in self._waiting if sid not in self._active), None)
+            if session_id is None:
+                return
+            waiters = self._waiting.pop(session_id)
+            waiter = waiters.popleft()
+            self.queued -= 1
+            if waiters:
+                # Back of the rotation, behind the sessions that have not been served yet
+                self._waiting[session_id] = waiters
+            self._admit(session_id)
+            waiter.granted.set_result(None)
+
+    def _record(self, outcome, start_time):
+        ADMISSION_EVENTS.inc(outcome)
+        STAGE_LATENCY.observe("admission_wait", time.perf_counter() - start_time)
+
+    def _update_depth(self):
+        ADMISSION_DEPTH.set("running", self.inflight)
+        ADMISSION_DEPTH.set("waiting", self.queued)
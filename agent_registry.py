@@ -0,0 +1,108 @@
+"""
+Agent ownership shared by several worker processes.
+
+The agent id and the pids of the workers using it are kept in
+`config/agent_info.json`. Every read-modify-write of that file happens
+under a cross-process file lock and the file is replaced atomically, so
+concurrent workers create the agent exactly once, and only the last worker
+to exit deletes it.
+"""
+import json
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from filelock import FileLock
+from file_locks import hold_file_lock, pid_alive
+from shared_logging import logger
+
+class AgentRegistry:
+    """Reference-counted agent ownership backed by a locked JSON file"""
+
+    def __init__(self, path):
+        """
+        Args:
+            path: The agent info file, e.g. config/agent_info.json; the lock lives next to it
+        """
+        self.path = Path(path)
+        self.lock_path = self.path.with_name(f".{self.path.name}.lock")
+        self._lock = FileLock(str(self.lock_path))
+        self.registered = False
+
+    @asynccontextmanager
+    async def locked(self):
+        """
+        Hold the cross-process lock without blocking the event loop.
+
+        The file lock is re-entrant within a thread, so callers in one process
+        must already be serialized (async-app.py holds `_agent_lock`).
+        """
+        async with hold_file_lock(self._lock):
+            yield
+
+    def read(self) -> dict:
+        """Return the registry contents, pruning workers that are no longer running"""
+        try:
+            info = json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {}
+        except ValueError as e:
+            logger.warning(f"Ignoring unreadable {self.path}: {e}")
+            return {}
+        info["workers"] = [pid for pid in info.get("workers", []) if pid_alive(pid)]
+        return info
+
+    def write(self, info):
+        """Replace the registry file atomically"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(info, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    async def register(self, resolve_agent):
+        """
+        Register this worker as a user of the shared agent.
+
+        Args:
+            resolve_agent: Coroutine function taking the recorded agent id (or None)
+                and returning the agent to use, creating one if needed
+
+        Returns:
+            The agent returned by resolve_agent
+        """
+        async with self.locked():
+            info = self.read()
+            agent = await resolve_agent(info.get("agent_id"))
+            workers = [pid for pid in info.get("workers", []) if pid != os.getpid()] + [os.getpid()]
+            if agent.id != info.get("agent_id"):
+                # A new agent belongs only to the workers that register from now on
+                workers = [os.getpid()]
+            self.write({"agent_id": agent.id, "workers": workers})
+            self.registered = True
+            logger.info(f"Worker {os.getpid()} registered for agent {agent.id} ({len(workers)} worker(s))")
+            return agent
+
+    async def release(self, delete_agent):
+        """
+        Unregister this worker and delete the agent if no other worker uses it.
+
+        Args:
+            delete_agent: Coroutine function taking the agent id to delete
+        """
+        if not self.registered:
+            return
+        self.registered = False
+        async with self.locked():
+            info = self.read()
+            agent_id = info.get("agent_id")
+            workers = [pid for pid in info.get("workers", []) if pid != os.getpid()]
+            if workers:
+                self.write({"agent_id": agent_id, "workers": workers})
+                logger.info(f"Worker {os.getpid()} released agent {agent_id}, {len(workers)} worker(s) remain")
+                return
+            if agent_id:
+                await delete_agent(agent_id)
+            self.path.unlink(missing_ok=True)
+            logger.info(f"Last worker {os.getpid()} deleted agent {agent_id}")
@@ -0,0 +1,52 @@
+"""
+Resilient calls to the Azure AI agents API.
+
+Every agents call goes through `call_agents`, which applies the shared
+retry, circuit breaker and rate limit policy of `resilience.py` and records
+the call's latency under a stage name. The SDK's own retries are disabled on
+the shared client (see `SDK_CLIENT_OPTIONS`) so retry budgets do not multiply.
+"""
+import os
+from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+from metrics import measure
+from resilience import RetryableError, Upstream, parse_retry_after
+
+# Constants
+AGENTS_RETRY_ATTEMPTS = int(os.environ.get("AGENTS_RETRY_ATTEMPTS", 3))  # Attempts per agents call
+AGENTS_RATE_LIMIT = float(os.environ.get("AGENTS_RATE_LIMIT", 0))  # Requests per second, 0 disables
+SDK_CLIENT_OPTIONS = {"retry_total": 0}  # Retries are handled by call_agents
+REJECTED_STATUSES = (429, 503)  # The service did not process the request; safe to resend
+TRANSIENT_STATUSES = (408, 500, 502, 504)  # May have been processed; only resent for reads
+
+_upstream = Upstream("agents", attempts=AGENTS_RETRY_ATTEMPTS, rate=AGENTS_RATE_LIMIT)
+
+async def call_agents(stage, operation, idempotent=True):
+    """
+    Call the agents API with retries and a circuit breaker.
+
+    Args:
+        stage: Stage name the latency of each attempt is recorded under, e.g. "create_run"
+        operation: Coroutine function performing the call
+        idempotent: False for calls that create something (messages, runs, tool outputs);
+            those are only resent when the service certainly did not process them
+
+    Returns:
+        The operation's result
+    """
+    retry_statuses = REJECTED_STATUSES + (TRANSIENT_STATUSES if idempotent else ())
+
+    async def attempt():
+        with measure(stage):
+            try:
+                return await operation()
+            except HttpResponseError as e:
+                if e.status_code in retry_statuses:
+                    headers = e.response.headers if e.response is not None else None
+                    raise RetryableError(
+                        f"HTTP {e.status_code} from {stage}", retry_after=parse_retry_after(headers)
+                    ) from e
+                raise
+
+    # A request that never reached the service can always be resent
+    retryable = (RetryableError, ServiceRequestError) + ((ServiceResponseError,) if idempotent else ())
+    return await _upstream.call(attempt, retryable=retryable)
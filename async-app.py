@@ -1,29 +1,66 @@
 import asyncio
+import contextvars
 import os
+import sys
+import time
 import chainlit as cl
+from chainlit.session import WebsocketSession
 from azure.ai.projects.aio import AIProjectClient
-from azure.ai.projects.models import AsyncFunctionTool, RequiredFunctionToolCall, SubmitToolOutputsAction, ToolOutput
+from azure.ai.projects.models import AsyncAgentEventHandler, AsyncFunctionTool, RequiredFunctionToolCall, SubmitToolOutputsAction, ToolOutput
 from azure.identity.aio import DefaultAzureCredential
 from user_async_functions import user_async_functions
+from stockdata_client import close_session as close_stockdata_session
+from metrics import STAGE_ERRORS, STAGE_LATENCY, TOOL_OUTPUT_BYTES, measure, start_metrics, stop_metrics
+from tool_output import compact_tool_output
+from thread_pool import ThreadPool, latest_response, truncation_strategy
+from token_manager import TokenManager
+from agents_api import SDK_CLIENT_OPTIONS, call_agents
+from resilience import CircuitOpenError
+from news_prefetcher import get_prefetcher
+from agent_registry import AgentRegistry
+from admission import AdmissionController, AdmissionRejected
+from chart_store import chart_ids, file_name, get_chart_store
 from functools import lru_cache
 from contextlib import asynccontextmanager
-from shared_logging import logger
+from shared_logging import bind_log_context, log_context, logger
 import json
 from pathlib import Path
-import aiofiles
 import asyncio
 
 # Constants
-POLLING_INTERVAL = 2  # Seconds between polling requests
+STREAMING_ENABLED = os.environ.get("AGENT_STREAMING", "true").lower() == "true"  # Consume run events instead of polling
+STREAM_MESSAGE_SEPARATOR = "\n\n"  # Between the texts of consecutive messages of one streamed run
+POLLING_INITIAL_INTERVAL = 0.25  # Seconds before the first poll when streaming is not used
+POLLING_MAX_INTERVAL = 2  # Upper bound for the polling back-off
+POLLING_BACKOFF = 1.5  # Growth factor between consecutive polls
 MESSAGE_TIMEOUT = 120  # Maximum seconds to wait for a response
+TOOL_CONCURRENCY = int(os.environ.get("TOOL_CONCURRENCY", 8))  # Maximum tool calls executed at once per run
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", 30))  # Maximum seconds for a single tool call
+SESSION_IDLE_TIMEOUT = int(os.environ.get("SESSION_IDLE_TIMEOUT", 1800))  # Seconds before an idle, disconnected session handle is evicted
+SESSION_SWEEP_INTERVAL = 60  # Minimum seconds between idle-session sweeps
 AGENT_INFO_FILE = Path('./config/agent_info.json')  # File to store agent ID
+AGENTS_TOKEN_SCOPE = "https://ml.azure.com/.default"  # Scope of the tokens used by the agents API
 
 # Ensure config directory exists
 Path('./config').mkdir(exist_ok=True)
 
-# Initialize lock for agent creation
+# Chart ids produced by the tool calls of the current turn, attached to its reply
+_turn_charts = contextvars.ContextVar("turn_charts", default=None)
+
+# Initialize locks for process-wide initialization and agent creation
+_init_lock = asyncio.Lock()
 _agent_lock = asyncio.Lock()
 
+class SessionState:
+    """Lightweight per-chat state: the conversation thread and the last activity time"""
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.last_active = time.monotonic()
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
 class AppState:
     _instance = None
     
@@ -31,11 +68,17 @@ class AppState:
     def init_attributes(self):
         """Initialize instance attributes only once"""
         if not hasattr(self, 'initialized'):
+            # Process-wide resources shared by every chat session
             self.project_client = None
             self.agent = None
-            self.thread = None
             self.functions = None
+            self.thread_pool = None
+            self.agent_registry = None
+            self.admission = AdmissionController()
             self.initialized = False
+            # Per-session thread handles keyed by Chainlit session id
+            self.sessions = {}
+            self.last_sweep = time.monotonic()
             logger.debug("AppState attributes initialized")
     
     def __new__(cls):
@@ -46,10 +89,10 @@ class AppState:
 
 app_state = AppState()
 
-# Create credential only once and cache it
+# Create credential only once and cache it; tokens are shared and refreshed in the background
 @lru_cache(maxsize=1)
 def get_credential():
-    return DefaultAzureCredential()
+    return TokenManager(DefaultAzureCredential())
 
 # Resource management using async context manager
 @asynccontextmanager
@@ -65,222 +108,482 @@ async def get_client():
     finally:
         await client.close()
 
-# Helper functions for agent persistence
-async def save_agent_id(agent_id):
-    """Save agent ID to persistent storage"""
-    try:
-        async with aiofiles.open(AGENT_INFO_FILE, 'w') as f:
-            await f.write(json.dumps({"agent_id": agent_id}))
-        logger.debug(f"Saved agent ID to {AGENT_INFO_FILE}")
-    except Exception as e:
-        logger.warning(f"Failed to save agent ID: {e}")
-
-async def load_agent_id():
-    """Load agent ID from persistent storage"""
-    try:
-        if os.path.exists(AGENT_INFO_FILE):
-            async with aiofiles.open(AGENT_INFO_FILE, 'r') as f:
-                data = json.loads(await f.read())
-                return data.get("agent_id")
-    except Exception as e:
-        logger.warning(f"Failed to load agent ID: {e}")
-    return None
-
 # Initialize the application with optimized client creation and proper locking
 async def initialize() -> None:
+    """Create the shared client, function tools and agent once per process"""
     if app_state.initialized:
-        logger.debug("Session already initialized, skipping...")
         return
     
+    async with _init_lock:
+        if app_state.initialized:
+            return
+        try:
+            await _initialize_shared()
+            await start_metrics()
+            get_prefetcher().start()
+        except Exception as e:
+            logger.error(f"Initialization failed: {e}")
+            await close_client()
+            raise
+
+async def _initialize_shared() -> None:
+    # Acquire the first token now rather than on the first agents call of a user turn
     try:
-        # Create client connection
-        app_state.project_client = AIProjectClient.from_connection_string(
-            credential=get_credential(),
-            conn_str=os.environ["PROJECT_CONNECTION_STRING"]
-        )
-        
-        # Initialize function tools - do this once and cache
-        app_state.functions = AsyncFunctionTool(functions=user_async_functions)
-        
-        # Use atomic agent creation with proper locking
-        async with _agent_lock:
-            # First check if we already have an agent in this session
-            agent_id = await load_agent_id()
-            
-            if agent_id:
-                try:
-                    logger.info(f"Attempting to use existing agent with ID: {agent_id}")
-                    app_state.agent = await app_state.project_client.agents.get_agent(agent_id)
-                    logger.info(f"Successfully retrieved existing agent with ID: {agent_id}")
-                except Exception as e:
-                    logger.warning(f"Failed to get existing agent: {e}. Will create new one.")
-                    agent_id = None
-            
-            # Create agent if needed
-            if not agent_id:
-                app_state.agent = await app_state.project_client.agents.create_agent(
-                    model=os.environ["MODEL_DEPLOYMENT_NAME"],
-                    name="Nasdaq Stock Assistant",
-                    instructions="You support people to get information or news about Nasdaq Stocks.",
-                    tools=app_state.functions.definitions,
+        await get_credential().start(AGENTS_TOKEN_SCOPE)
+    except Exception as e:
+        logger.warning(f"Could not prefetch credential token: {e}")
+    
+    # Create the shared client connection; its HTTP pipeline is pooled across sessions
+    app_state.project_client = AIProjectClient.from_connection_string(
+        credential=get_credential(),
+        conn_str=os.environ["PROJECT_CONNECTION_STRING"],
+        **SDK_CLIENT_OPTIONS
+    )
+    
+    # Initialize function tools - do this once and cache
+    app_state.functions = AsyncFunctionTool(functions=user_async_functions)
+    
+    async def resolve_agent(agent_id):
+        # Reuse the agent recorded by this or another worker if it still exists
+        if agent_id:
+            try:
+                logger.info(f"Attempting to use existing agent with ID: {agent_id}")
+                agent = await call_agents(
+                    "get_agent", lambda: app_state.project_client.agents.get_agent(agent_id)
                 )
-                agent_id = app_state.agent.id
-                logger.info(f"Created new agent, agent ID: {agent_id}")
-                await save_agent_id(agent_id)
-            else:
-                app_state.agent = await app_state.project_client.agents.get_agent(agent_id)
-        
-        # Create a new thread for this session
-        app_state.thread = await app_state.project_client.agents.create_thread()
-        logger.info(f"Created thread, ID: {app_state.thread.id}")
+                logger.info(f"Successfully retrieved existing agent with ID: {agent_id}")
+                return agent
+            except Exception as e:
+                logger.warning(f"Failed to get existing agent: {e}. Will create new one.")
         
-        app_state.initialized = True
-    except Exception as e:
-        logger.error(f"Initialization failed: {e}")
-        await cleanup_session()
-        raise
+        # Create agent if needed
+        agent = await call_agents("create_agent", lambda: app_state.project_client.agents.create_agent(
+            model=os.environ["MODEL_DEPLOYMENT_NAME"],
+            name="Nasdaq Stock Assistant",
+            instructions="You support people to get information or news about Nasdaq Stocks.",
+            tools=app_state.functions.definitions,
+        ), idempotent=False)
+        logger.info(f"Created new agent, agent ID: {agent.id}")
+        return agent
+    
+    # Agent lookup and creation are serialized within the process by _agent_lock
+    # and across worker processes by the registry's file lock
+    async with _agent_lock:
+        if app_state.agent_registry is None:
+            app_state.agent_registry = AgentRegistry(AGENT_INFO_FILE)
+        app_state.agent = await app_state.agent_registry.register(resolve_agent)
+    
+    # Pre-create threads in the background so new sessions do not wait on create_thread
+    app_state.thread_pool = ThreadPool(app_state.project_client.agents)
+    app_state.thread_pool.start()
+    
+    app_state.initialized = True
+
+async def get_session_state(session_id) -> SessionState:
+    """Return the state of a chat session, creating its thread on first use"""
+    await initialize()
+    evict_idle_sessions()
+    
+    session = app_state.sessions.get(session_id)
+    if session is None:
+        # Take a pre-created thread for this session, creating one if the pool is empty
+        thread = await app_state.thread_pool.acquire()
+        logger.info(f"Created thread, ID: {thread.id} for session {session_id}")
+        session = app_state.sessions.setdefault(session_id, SessionState(thread))
+    session.touch()
+    return session
+
+def evict_idle_sessions() -> None:
+    """
+    Drop handles of orphaned sessions: idle longer than SESSION_IDLE_TIMEOUT and no longer known to Chainlit.
+
+    A session whose chat is still open keeps its thread however long the user is away, so
+    the conversation continues; only sessions that ended without on_chat_end are dropped.
+    """
+    now = time.monotonic()
+    if now - app_state.last_sweep < SESSION_SWEEP_INTERVAL:
+        return
+    app_state.last_sweep = now
+    idle = [
+        sid for sid, session in app_state.sessions.items()
+        if now - session.last_active > SESSION_IDLE_TIMEOUT and WebsocketSession.get_by_id(sid) is None
+    ]
+    for session_id in idle:
+        del app_state.sessions[session_id]
+    if idle:
+        logger.info(f"Evicted {len(idle)} orphaned session(s), {len(app_state.sessions)} active")
 
 # Separate session cleanup from agent cleanup
-async def cleanup_session():
-    if app_state.initialized:
-        if app_state.project_client:
-            try:
-                await app_state.project_client.close()
-                logger.info("Closed project client for session")
-            except Exception as e:
-                logger.error(f"Error during session cleanup: {e}")
-        app_state.initialized = False
+async def cleanup_session(session_id):
+    """Release the state of one chat session; shared resources stay open for other sessions"""
+    session = app_state.sessions.pop(session_id, None)
+    if session:
+        logger.info(f"Released thread {session.thread.id} for session {session_id}")
+
+async def close_client():
+    """Close the shared project client"""
+    if app_state.thread_pool:
+        try:
+            await app_state.thread_pool.close()
+        except Exception as e:
+            logger.error(f"Error closing thread pool: {e}")
+        app_state.thread_pool = None
+    if app_state.project_client:
+        try:
+            await app_state.project_client.close()
+            logger.info("Closed shared project client")
+        except Exception as e:
+            logger.error(f"Error closing project client: {e}")
+    app_state.project_client = None
+    app_state.sessions.clear()
+    app_state.initialized = False
 
 # Complete server shutdown with agent deletion
 async def shutdown_server():
+    # Release pooled upstream connections used by the tools and the agents API
+    await get_prefetcher().stop()
+    await close_stockdata_session()
+    await close_client()
+    # The chart renderer is only imported once a chart tool has run
+    chart_renderer = sys.modules.get("chart_renderer")
+    if chart_renderer is not None:
+        chart_renderer.shutdown_renderer()
+    await stop_metrics()
+    async def delete_agent(agent_id):
+        # Only create a client if this worker is the last one using the agent
+        async with get_client() as client:
+            await client.agents.delete_agent(agent_id)
+            logger.info(f"Server shutdown: Deleted agent: {agent_id}")
+    
     try:
-        # Load agent ID from file
-        agent_id = await load_agent_id()
-        if agent_id:
-            # Only create a client if needed
-            async with get_client() as client:
-                try:
-                    await client.agents.delete_agent(agent_id)
-                    logger.info(f"Server shutdown: Deleted agent: {agent_id}")
-                    # Remove the agent info file
-                    if os.path.exists(AGENT_INFO_FILE):
-                        os.remove(AGENT_INFO_FILE)
-                except Exception as e:
-                    logger.error(f"Error deleting agent during shutdown: {e}")
+        if app_state.agent_registry is not None:
+            await app_state.agent_registry.release(delete_agent)
     except Exception as e:
         logger.error(f"Error during server shutdown: {e}")
+    # Stop token refreshes last; deleting the agent above still needs a token
+    await get_credential().close()
 
 # Optimized message processing function
-async def process_message(message_content):
-    """Process a user message and get a response from the agent"""
+async def process_message(message_content, session_id, on_token=None):
+    """
+    Process a user message and get a response from the agent
+
+    :param message_content: The text sent by the user
+    :param session_id: The Chainlit session id the message belongs to
+    :param on_token: Optional coroutine called with each text delta while the answer is streamed
+    """
     try:
-        if not app_state.initialized:
-            await initialize()
-        
-        # Create and send message
-        message = await app_state.project_client.agents.create_message(
-            thread_id=app_state.thread.id, role="user", content=message_content
-        )
-        
-        # Create and run assistant task
-        run = await app_state.project_client.agents.create_run(
-            thread_id=app_state.thread.id, agent_id=app_state.agent.id
-        )
-        
-        start_time = asyncio.get_event_loop().time()
-        
-        # Improved polling loop
-        while run.status in ["queued", "in_progress", "requires_action"]:
-            # Check for timeout
-            current_time = asyncio.get_event_loop().time()
-            if current_time - start_time > MESSAGE_TIMEOUT:
-                logger.warning(f"Run {run.id} timed out after {MESSAGE_TIMEOUT} seconds")
-                await app_state.project_client.agents.cancel_run(
-                    thread_id=app_state.thread.id, run_id=run.id
-                )
-                return "Request timed out. Please try again."
-            
-            # Sleep with appropriate back-off
-            await asyncio.sleep(POLLING_INTERVAL)
+        # Wait for a run slot; messages from the same session run one after another
+        async with app_state.admission.slot(session_id):
+            session = await get_session_state(session_id)
+            thread_id = session.thread.id
+            bind_log_context(thread_id=thread_id)
             
-            # Get updated run status
-            run = await app_state.project_client.agents.get_run(
-                thread_id=app_state.thread.id, run_id=run.id
-            )
+            # Create and send message
+            message = await call_agents("create_message", lambda: app_state.project_client.agents.create_message(
+                thread_id=thread_id, role="user", content=message_content
+            ), idempotent=False)
             
-            if run.status == "requires_action" and isinstance(run.required_action, SubmitToolOutputsAction):
-                await handle_tool_calls(run, app_state.thread.id)
-        
-        # Get response when run completes
-        if run.status == "completed":
-            messages = await app_state.project_client.agents.list_messages(thread_id=app_state.thread.id)
-            return messages['data'][0]['content'][0]['text']['value']
-        else:
-            logger.error(f"Run ended with unexpected status: {run.status}")
-            return f"Sorry, I encountered an issue. Run status: {run.status}"
+            if STREAMING_ENABLED and hasattr(app_state.project_client.agents, "create_stream"):
+                return await stream_run(thread_id, on_token)
+            return await poll_run(thread_id)
             
+    except AdmissionRejected as e:
+        return str(e)
+    except CircuitOpenError as e:
+        logger.warning(f"Agents API unavailable: {e}")
+        return "The assistant service is temporarily unavailable. Please try again in a moment."
     except Exception as e:
         logger.exception(f"Error processing message: {e}")
         return "Sorry, I encountered an error processing your request."
 
+class RunStreamHandler(AsyncAgentEventHandler):
+    """Event handler that submits tool outputs as they are required and relays text deltas"""
+
+    def __init__(self, thread_id, on_token=None):
+        super().__init__()
+        self.thread_id = thread_id
+        self.on_token = on_token
+        self.run = None
+        self.chunks = []
+        self.message_id = None
+
+    async def on_message_delta(self, delta) -> None:
+        if delta.text:
+            if self.chunks and delta.id != self.message_id:
+                # A new message of the same run, e.g. the answer after a note written before a tool call
+                await self._emit(STREAM_MESSAGE_SEPARATOR)
+            self.message_id = delta.id
+            await self._emit(delta.text)
+
+    async def _emit(self, text):
+        self.chunks.append(text)
+        if self.on_token:
+            await self.on_token(text)
+
+    async def on_thread_run(self, run) -> None:
+        if self.run is None:
+            bind_log_context(run_id=run.id)
+        self.run = run
+        if run.status == "requires_action" and isinstance(run.required_action, SubmitToolOutputsAction):
+            tool_outputs = await run_tool_calls(run, self.thread_id)
+            if tool_outputs:
+                await call_agents("submit_tool_outputs", lambda: app_state.project_client.agents.submit_tool_outputs_to_stream(
+                    thread_id=self.thread_id, run_id=run.id, tool_outputs=tool_outputs, event_handler=self
+                ), idempotent=False)
+
+    async def on_error(self, data) -> None:
+        logger.error(f"Run stream error: {data}")
+
+    async def on_unhandled_event(self, event_type, event_data) -> None:
+        logger.debug(f"Unhandled run stream event: {event_type}")
+
+async def stream_run(thread_id, on_token=None):
+    """Create a run and consume its event stream until the run reaches a final state"""
+    handler = RunStreamHandler(thread_id, on_token)
+
+    async def consume():
+        stream = await call_agents("create_stream", lambda: app_state.project_client.agents.create_stream(
+            thread_id=thread_id, agent_id=app_state.agent.id, event_handler=handler,
+            truncation_strategy=truncation_strategy()
+        ), idempotent=False)
+        # Entering the stream yields the event handler, which consumes the events
+        async with stream as events:
+            await events.until_done()
+
+    try:
+        with measure("run_stream"):
+            await asyncio.wait_for(consume(), timeout=MESSAGE_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning(f"Run stream timed out after {MESSAGE_TIMEOUT} seconds")
+        if handler.run:
+            await app_state.project_client.agents.cancel_run(
+                thread_id=thread_id, run_id=handler.run.id
+            )
+        return "Request timed out. Please try again."
+
+    run = handler.run
+    if run and run.status == "completed":
+        if handler.chunks:
+            return "".join(handler.chunks)
+        return await get_last_response(thread_id, run.id)
+    status = run.status if run else "unknown"
+    logger.error(f"Run ended with unexpected status: {status}")
+    return f"Sorry, I encountered an issue. Run status: {status}"
+
+async def poll_run(thread_id):
+    """Create a run and poll it with exponential back-off until it reaches a final state"""
+    # Create and run assistant task
+    run = await call_agents("create_run", lambda: app_state.project_client.agents.create_run(
+        thread_id=thread_id, agent_id=app_state.agent.id, truncation_strategy=truncation_strategy()
+    ), idempotent=False)
+    bind_log_context(run_id=run.id)
+    
+    start_time = asyncio.get_event_loop().time()
+    interval = POLLING_INITIAL_INTERVAL
+    
+    # Adaptive polling loop: fast first polls, then exponential growth
+    while run.status in ["queued", "in_progress", "requires_action"]:
+        # Check for timeout
+        current_time = asyncio.get_event_loop().time()
+        if current_time - start_time > MESSAGE_TIMEOUT:
+            logger.warning(f"Run {run.id} timed out after {MESSAGE_TIMEOUT} seconds")
+            await app_state.project_client.agents.cancel_run(
+                thread_id=thread_id, run_id=run.id
+            )
+            return "Request timed out. Please try again."
+        
+        # Sleep with appropriate back-off
+        await asyncio.sleep(interval)
+        interval = min(interval * POLLING_BACKOFF, POLLING_MAX_INTERVAL)
+        
+        # Get updated run status
+        run_id = run.id
+        run = await call_agents("get_run", lambda: app_state.project_client.agents.get_run(
+            thread_id=thread_id, run_id=run_id
+        ))
+        
+        if run.status == "requires_action" and isinstance(run.required_action, SubmitToolOutputsAction):
+            await handle_tool_calls(run, thread_id)
+            # The run resumes quickly after tool outputs, so poll fast again
+            interval = POLLING_INITIAL_INTERVAL
+    
+    # Get response when run completes
+    if run.status == "completed":
+        return await get_last_response(thread_id, run.id)
+    else:
+        logger.error(f"Run ended with unexpected status: {run.status}")
+        return f"Sorry, I encountered an issue. Run status: {run.status}"
+
+async def get_last_response(thread_id, run_id=None):
+    """Return the text of the newest message in the session thread, optionally limited to one run"""
+    return await latest_response(app_state.project_client.agents, thread_id, run_id)
+
 # Separate function for handling tool calls
 async def handle_tool_calls(run, thread_id):
     """Handle tool calls from the agent"""
+    tool_outputs = await run_tool_calls(run, thread_id)
+    if tool_outputs:
+        await call_agents("submit_tool_outputs", lambda: app_state.project_client.agents.submit_tool_outputs_to_run(
+            thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
+        ), idempotent=False)
+
+async def run_tool_calls(run, thread_id):
+    """Execute the tool calls required by a run and return their outputs"""
     tool_calls = run.required_action.submit_tool_outputs.tool_calls
     if not tool_calls:
         logger.error("No tool calls provided - cancelling run")
         await app_state.project_client.agents.cancel_run(
             thread_id=thread_id, run_id=run.id
         )
-        return
+        return []
 
-    tool_outputs = []
-    for tool_call in tool_calls:
-        if isinstance(tool_call, RequiredFunctionToolCall):
-            try:
-                output = await app_state.functions.execute(tool_call)
-                if output:
-                    tool_outputs.append(
-                        ToolOutput(
-                            tool_call_id=tool_call.id,
-                            output=output,
-                        )
-                    )
-            except Exception as e:
-                logger.error(f"Error executing tool_call {tool_call.id}: {e}")
+    function_calls = [tc for tc in tool_calls if isinstance(tc, RequiredFunctionToolCall)]
+    semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+    start_time = asyncio.get_event_loop().time()
 
-    if tool_outputs:
-        await app_state.project_client.agents.submit_tool_outputs_to_run(
-            thread_id=thread_id, run_id=run.id, tool_outputs=tool_outputs
+    # Run all tool calls concurrently; results keep the order of the requested calls
+    results = await asyncio.gather(
+        *(execute_tool_call(tool_call, semaphore) for tool_call in function_calls)
+    )
+
+    wall_time = asyncio.get_event_loop().time() - start_time
+    sequential_time = sum(duration for _, duration in results)
+    logger.info(
+        f"Executed {len(function_calls)} tool call(s) for run {run.id} in {wall_time:.3f}s "
+        f"(sequential {sequential_time:.3f}s, saved {max(sequential_time - wall_time, 0):.3f}s)"
+    )
+
+    return [
+        ToolOutput(tool_call_id=tool_call.id, output=output)
+        for tool_call, (output, _) in zip(function_calls, results)
+        if output
+    ]
+
+async def execute_tool_call(tool_call, semaphore):
+    """Execute a single tool call, turning failures into an error output for that call"""
+    async with semaphore:
+        bind_log_context(tool_call_id=tool_call.id, tool=tool_call.function.name)
+        stage = f"tool.{tool_call.function.name}"
+        start_time = asyncio.get_event_loop().time()
+        try:
+            output = await asyncio.wait_for(app_state.functions.execute(tool_call), timeout=TOOL_TIMEOUT)
+        except asyncio.TimeoutError:
+            STAGE_ERRORS.inc(stage)
+            logger.error(f"Tool call {tool_call.id} timed out after {TOOL_TIMEOUT} seconds")
+            output = json.dumps({"error": "timeout", "message": f"Tool call timed out after {TOOL_TIMEOUT} seconds"})
+        except Exception as e:
+            STAGE_ERRORS.inc(stage)
+            logger.error(f"Error executing tool_call {tool_call.id}: {e}")
+            output = json.dumps({"error": str(e), "message": "Tool call failed"})
+        duration = asyncio.get_event_loop().time() - start_time
+        STAGE_LATENCY.observe(stage, duration)
+        if isinstance(output, str):
+            # Project, round and summarize the raw API payload before it reaches the model
+            TOOL_OUTPUT_BYTES.inc("raw", len(output))
+            output = compact_tool_output(tool_call.function.name, output)
+            TOOL_OUTPUT_BYTES.inc("submitted", len(output))
+            charts = _turn_charts.get()
+            if charts is not None:
+                charts.extend(chart_ids(output))
+        logger.debug(
+            f"Tool call {tool_call.id} ({tool_call.function.name}) took {duration:.3f}s",
+            extra={"duration_ms": round(duration * 1000, 1), "bytes": len(output) if isinstance(output, str) else None}
         )
+        return output, duration
+
+if hasattr(cl, "on_app_startup"):
+    @cl.on_app_startup
+    async def on_app_startup() -> None:
+        """Warm up the credential, client, agent and thread pool before the first chat"""
+        start_time = time.perf_counter()
+        try:
+            await initialize()
+            logger.info(f"Server initialized in {time.perf_counter() - start_time:.3f}s")
+        except Exception as e:
+            # The first session retries initialization
+            logger.error(f"Warm initialization failed: {e}")
+
+if hasattr(cl, "on_app_shutdown"):
+    @cl.on_app_shutdown
+    async def on_app_shutdown() -> None:
+        """Release this worker's share of the agent when the server stops"""
+        await shutdown_server()
 
 @cl.on_chat_start
 async def on_chat_start() -> None:
-    logger.info("A new chat session has started!")
-    await initialize()
-    await cl.Message(content="Welcome to the Nasdaq Stock Assistant! How can I help you?").send()
+    with log_context(session_id=cl.context.session.id):
+        logger.info("A new chat session has started!")
+        # Greet first; the thread comes from the warm pool right after
+        await cl.Message(content="Welcome to the Nasdaq Stock Assistant! How can I help you?").send()
+        await get_session_state(cl.context.session.id)
 
 @cl.on_chat_end
 async def on_chat_end():
-    logger.info("Chat session ended")
-    await cleanup_session()
+    with log_context(session_id=cl.context.session.id):
+        logger.info("Chat session ended")
+        await cleanup_session(cl.context.session.id)
 
 @cl.on_message
 async def main(message: cl.Message):
+    with log_context(session_id=cl.context.session.id):
+        await reply(message)
+
+async def reply(message: cl.Message):
+    """Answer a user message, streaming the response into the thinking indicator when possible"""
     logger.info(f"User input: {message.content}")
+    start_time = asyncio.get_event_loop().time()
     
     # Send thinking indicator
     thinking_msg = cl.Message(content="Thinking...")
     await thinking_msg.send()
     
-    # Process the message
-    response = await process_message(message.content)
+    # Turn the thinking indicator into the live answer as tokens arrive
+    streamed = False
+    async def on_token(token):
+        nonlocal streamed
+        if not streamed:
+            streamed = True
+            thinking_msg.content = ""
+        await thinking_msg.stream_token(token)
+    
+    # Process the message, collecting the charts its tool calls render
+    charts = []
+    token = _turn_charts.set(charts)
+    try:
+        response = await process_message(message.content, cl.context.session.id, on_token=on_token)
+    finally:
+        _turn_charts.reset(token)
+    elements = [
+        cl.Image(name=name, content=data, mime=mime_type, display="inline")
+        for name, data, mime_type in await load_charts(charts)
+    ]
     
-    # Send the response as a new message and remove the thinking indicator
-    await cl.Message(content=response).send()
-    await thinking_msg.remove()
+    if streamed:
+        # Replace the streamed text with the final response
+        thinking_msg.content = response
+        thinking_msg.elements = elements
+        await thinking_msg.update()
+    else:
+        # Send the response as a new message and remove the thinking indicator
+        await cl.Message(content=response, elements=elements).send()
+        await thinking_msg.remove()
     
-    logger.info("Response sent to user")
+    duration = asyncio.get_event_loop().time() - start_time
+    STAGE_LATENCY.observe("turn", duration)
+    logger.info("Response sent to user", extra={"duration_ms": round(duration * 1000, 1), "bytes": len(response)})
+
+async def load_charts(charts):
+    """Look up the chart ids referenced during a turn; return (file name, image bytes, MIME type) per chart"""
+    loaded = []
+    for chart_id in dict.fromkeys(charts):
+        chart = await get_chart_store().get(chart_id)
+        if chart is None:
+            logger.warning(f"Chart {chart_id} is no longer in the chart store")
+            continue
+        data, mime_type = chart
+        loaded.append((file_name(chart_id, mime_type), data, mime_type))
+    return loaded
 
 if __name__ == "__main__":
     logger.info("Starting server...")
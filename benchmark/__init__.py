@@ -0,0 +1,7 @@
+"""
+Offline replay benchmark for the Nasdaq Stock Assistant.
+
+Runs the application against a local stand-in for the Azure AI agents API and
+a local mock of the stockdata.org endpoints, so throughput and latency can be
+measured without any credentials.
+"""
@@ -0,0 +1,133 @@
+"""
+Chart renderer benchmark: renders per second and RSS growth over many plots.
+
+Usage:
+    python -m benchmark.chart_render --plots 10000
+
+Renders distinct time series through `chart_renderer.render_time_series`
+with at most CHART_MAX_PENDING renders in flight, sampling throughput and
+resident memory as it goes, then renders some of them again to measure the
+content-hash cache. For comparison, renders a smaller number with the
+previous implementation (pyplot on the event loop, `plt.figure()` followed
+by `df.plot()`), which leaves one open figure behind per chart.
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import math
+import resource
+import time
+import pandas as pd
+
+def rss_mb() -> float:
+    """Current resident set size, or the peak where /proc is not available"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def series(i, days):
+    """A distinct daily series per index, shaped like the rows the agent passes to plot_time_series"""
+    start = datetime.date(2023, 1, 2)
+    return [
+        {"date": (start + datetime.timedelta(days=d)).isoformat(), "close": 100 + 10 * math.sin((d + i) / 7) + i % 50}
+        for d in range(days)
+    ]
+
+def pyplot_render(records) -> bytes:
+    """The previous plot_time_series body"""
+    import matplotlib.pyplot as plt
+
+    df = pd.DataFrame(records)
+    df['date'] = pd.to_datetime(df['date'])
+    df.set_index('date', inplace=True)
+    plt.figure(figsize=(10, 6))
+    fig = df.plot().get_figure()
+    img_buf = io.BytesIO()
+    fig.savefig(img_buf, format='png')
+    plt.close(fig)
+    return img_buf.getvalue()
+
+async def measure_pool(args, chart_renderer):
+    chart_renderer.CHART_CACHE_SIZE = max(chart_renderer.CHART_CACHE_SIZE, args.repeat)
+    in_flight = asyncio.Semaphore(chart_renderer.CHART_MAX_PENDING)
+    done, window_start, window_done = 0, time.perf_counter(), 0
+    start_rss = rss_mb()
+
+    async def render(i):
+        nonlocal done
+        async with in_flight:
+            await chart_renderer.render_time_series(series(i, args.days))
+        done += 1
+
+    print(
+        f"pool: {chart_renderer.CHART_RENDER_WORKERS} worker(s), format {chart_renderer.CHART_FORMAT}, "
+        f"preset {chart_renderer.CHART_PRESET}, {args.days} points per series, RSS {start_rss:.0f}MB"
+    )
+    start = time.perf_counter()
+    tasks = [asyncio.ensure_future(render(i)) for i in range(args.plots)]
+    next_report = args.report_every
+    while done < args.plots:
+        await asyncio.sleep(0.2)
+        if done >= next_report or done == args.plots:
+            now = time.perf_counter()
+            print(
+                f"  {done:>6} plots  {(done - window_done) / (now - window_start):6.1f} renders/s  "
+                f"RSS {rss_mb():.0f}MB (+{rss_mb() - start_rss:.0f}MB)"
+            )
+            window_start, window_done = now, done
+            next_report = (done // args.report_every + 1) * args.report_every
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+    print(f"  total {args.plots} plots in {elapsed:.1f}s = {args.plots / elapsed:.1f} renders/s, RSS growth {rss_mb() - start_rss:+.0f}MB")
+
+    start = time.perf_counter()
+    for i in range(args.plots - args.repeat, args.plots):
+        await chart_renderer.render_time_series(series(i, args.days))
+    print(f"  cache: {args.repeat} repeated series in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+def measure_pyplot(args):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    # The leak is what is being measured; keep pyplot from warning about it on every chart
+    matplotlib.rcParams["figure.max_open_warning"] = 0
+
+    start_rss = rss_mb()
+    start = time.perf_counter()
+    for i in range(args.baseline_plots):
+        pyplot_render(series(i, args.days))
+    elapsed = time.perf_counter() - start
+    print(
+        f"pyplot on the event loop: {args.baseline_plots} plots in {elapsed:.1f}s = {args.baseline_plots / elapsed:.1f} renders/s, "
+        f"RSS growth {rss_mb() - start_rss:+.0f}MB, {len(plt.get_fignums())} figure(s) left open"
+    )
+    plt.close("all")
+
+async def main(args):
+    import chart_renderer
+
+    try:
+        await measure_pool(args, chart_renderer)
+    finally:
+        chart_renderer.shutdown_renderer()
+    if args.baseline_plots:
+        measure_pyplot(args)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chart renders per second and memory growth")
+    parser.add_argument("--plots", type=int, default=10000, help="Distinct series rendered through the pool")
+    parser.add_argument("--days", type=int, default=250, help="Points per series")
+    parser.add_argument("--repeat", type=int, default=100, help="Series rendered again to measure the cache")
+    parser.add_argument("--report-every", type=int, default=1000, help="Plots between throughput and RSS samples")
+    parser.add_argument("--baseline-plots", type=int, default=500, help="Plots rendered with the previous pyplot code, 0 to skip")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
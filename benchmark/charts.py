@@ -0,0 +1,106 @@
+"""
+Chart delivery benchmark: image size, tool-output bytes and chart turn latency.
+
+Usage:
+    python -m benchmark.charts --turns 20
+
+For every encoding and size preset, renders `plot_historical_eod` charts
+from the mock EOD endpoint and reports the image size, the render time and
+the tool output sent to the agent, compared with embedding the image in
+the output as base64. Then runs chart turns end to end through
+`process_message` with the fake agents API, including the lookup that
+attaches the image to the reply.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import statistics
+import tempfile
+import time
+from benchmark.fake_agents import FakeAgents, FakeCredential, FakeProjectClient
+from benchmark.load_driver import load_app, percentile
+
+FORMATS = ("png", "png8", "webp")
+CHART_SCRIPT = ([[("plot_historical_eod", {"symbol": "{symbol}", "date_from": "2023-01-01", "fields": "close,open"})]],)
+
+async def measure_tool(args, user_async_functions, chart_renderer):
+    print(f"{'format':<6} {'preset':<9} {'image':>9} {'render':>8} {'embedded output':>16} {'reference output':>17}")
+    for chart_format in FORMATS:
+        for preset in chart_renderer.CHART_PRESETS:
+            chart_renderer.CHART_FORMAT, chart_renderer.CHART_PRESET = chart_format, preset
+            sizes, durations, outputs = [], [], []
+            for i in range(args.charts):
+                start = time.perf_counter()
+                output = await user_async_functions.plot_historical_eod(
+                    f"C{chart_format}{preset}{i}", date_from="2023-01-01", fields="close,open"
+                )
+                durations.append(time.perf_counter() - start)
+                payload = json.loads(output)
+                sizes.append(payload["bytes"])
+                outputs.append(len(output))
+            # What the tool used to hand back: the image itself, serialized into the output
+            embedded = len(json.dumps({"image_data": base64.b64encode(b"x" * int(statistics.fmean(sizes))).decode()}))
+            print(
+                f"{chart_format:<6} {preset:<9} {statistics.fmean(sizes) / 1024:>7.1f}KB "
+                f"{statistics.fmean(durations) * 1000:>6.0f}ms {embedded:>14}B {statistics.fmean(outputs):>15.0f}B"
+            )
+
+async def measure_turns(args, app, chart_renderer, agents):
+    print(f"\nchart turns (preset {args.preset}, fake agent latency {args.agent_latency}s)")
+    chart_renderer.CHART_PRESET = args.preset
+    for chart_format in FORMATS:
+        chart_renderer.CHART_FORMAT = chart_format
+        latencies, attached = [], 0
+        for i in range(args.turns):
+            agents._symbols = iter([f"T{chart_format}{i}"])
+            start = time.perf_counter()
+            charts = []
+            token = app._turn_charts.set(charts)
+            try:
+                await app.process_message("Chart please", f"session-{chart_format}")
+            finally:
+                app._turn_charts.reset(token)
+            elements = await app.load_charts(charts)
+            latencies.append(time.perf_counter() - start)
+            attached += len(elements)
+        print(
+            f"{chart_format:<6} p50={percentile(latencies, 50) * 1000:.0f}ms p95={percentile(latencies, 95) * 1000:.0f}ms "
+            f"attached={attached}/{args.turns}"
+        )
+
+async def main(args):
+    from benchmark.mock_stockdata import start_mock_server
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        import chart_renderer
+        import stockdata_client
+        import user_async_functions
+
+        runner, base_url, _ = await start_mock_server(latency=0.01)
+        stockdata_client.STOCKDATA_BASE_URL = base_url
+        agents = FakeAgents(script=CHART_SCRIPT, latency=args.agent_latency, think_time=args.think_time)
+        app.AIProjectClient.from_connection_string = staticmethod(lambda **kwargs: FakeProjectClient(agents))
+        credential = app.TokenManager(FakeCredential(latency=0.01))
+        app.get_credential = lambda: credential
+        try:
+            await measure_tool(args, user_async_functions, chart_renderer)
+            await measure_turns(args, app, chart_renderer, agents)
+        finally:
+            await app.close_client()
+            await stockdata_client.close_session()
+            await runner.cleanup()
+            chart_renderer.shutdown_renderer()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Chart encoding, tool output size and chart turn latency")
+    parser.add_argument("--charts", type=int, default=5, help="Charts rendered per format and preset")
+    parser.add_argument("--turns", type=int, default=20, help="Chart turns per format")
+    parser.add_argument("--preset", default="standard", help="Size/DPI preset used for the chart turns")
+    parser.add_argument("--agent-latency", type=float, default=0.02, help="Seconds per fake agents API call")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Seconds the fake model takes per step")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
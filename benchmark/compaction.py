@@ -0,0 +1,45 @@
+"""
+Measure bytes and estimated tokens saved by tool output compaction.
+
+Usage:
+    python -m benchmark.compaction
+
+Builds quote, news and EOD responses shaped like the stockdata.org API from the
+mock fixtures and compares the raw tool output with what is submitted to the agent.
+"""
+import datetime
+import json
+from benchmark.mock_stockdata import _article, _eod, _quote
+from tool_output import compact_tool_output, estimate_tokens
+
+def fixtures():
+    """Return (label, tool name, raw output) triples covering typical tool calls"""
+    today = datetime.date.today()
+    symbols = ("AAPL", "MSFT", "NVDA")
+    quote = {"meta": {"requested": 3, "returned": 3}, "data": [_quote(s) for s in symbols]}
+    news = {
+        "meta": {"found": 1000, "returned": 6, "limit": 2, "page": 1},
+        "data": [_article(s, i) for s in symbols for i in range(2)],
+    }
+    cases = [("quote x3", "get_quote", quote), ("news x6", "get_news", news)]
+    for label, days in (("eod 1 month", 30), ("eod 1 year", 365), ("eod 5 years", 5 * 365)):
+        rows = _eod("AAPL", today - datetime.timedelta(days=days), today)
+        payload = {"meta": {"date_from": rows[-1]["date"], "date_to": rows[0]["date"]}, "data": rows}
+        cases.append((label, "get_historical_eod", payload))
+    return [(label, name, json.dumps(payload)) for label, name, payload in cases]
+
+def main():
+    total_raw = total_compact = 0
+    print(f"{'fixture':<14}{'raw bytes':>12}{'compact':>10}{'raw tok':>10}{'compact':>10}{'saved':>8}")
+    for label, name, raw in fixtures():
+        compact = compact_tool_output(name, raw)
+        total_raw += len(raw)
+        total_compact += len(compact)
+        print(
+            f"{label:<14}{len(raw):>12}{len(compact):>10}{estimate_tokens(raw):>10}"
+            f"{estimate_tokens(compact):>10}{1 - len(compact) / len(raw):>8.0%}"
+        )
+    print(f"{'total':<14}{total_raw:>12}{total_compact:>10}{'':>20}{1 - total_compact / total_raw:>8.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+EOD store benchmark: date-range queries from the local store versus the API, and concurrent workers.
+
+Usage:
+    python -m benchmark.eod_store --symbols 20 --queries 10 --processes 4
+
+Replays random date-range queries per symbol against the local stockdata
+mock, once the way `get_historical_eod` used to answer them (one data/eod
+request per query) and once through `eod_store.get_eod_bars` (one download
+per symbol, then slices from disk). Then starts worker processes at the
+same moment on one store directory and checks that each symbol is
+downloaded once, every worker reads identical bars and no temporary files
+are left behind. Exits with status 1 if a check fails.
+"""
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from benchmark.load_driver import percentile
+
+HISTORY_START = datetime.date(2023, 1, 2)
+
+def random_ranges(rng, count):
+    """Date windows of one week to a year inside the stored history"""
+    span = (datetime.date.today() - HISTORY_START).days
+    ranges = []
+    for _ in range(count):
+        length = rng.randint(7, 365)
+        start = HISTORY_START + datetime.timedelta(days=rng.randint(0, max(span - length, 0)))
+        ranges.append((start.isoformat(), (start + datetime.timedelta(days=length)).isoformat()))
+    return ranges
+
+def digest(columns):
+    """Hash of every stored column, to compare what workers read"""
+    h = hashlib.sha256()
+    for field in sorted(columns):
+        h.update(field.encode())
+        h.update(columns[field].tobytes())
+    return h.hexdigest()[:16]
+
+async def replay(queries, answer):
+    """Run the queries in order and return (latencies of first queries per symbol, of the others)"""
+    cold, warm, seen = [], [], set()
+    for symbol, date_from, date_to in queries:
+        start = time.perf_counter()
+        await answer(symbol, date_from, date_to)
+        (warm if symbol in seen else cold).append(time.perf_counter() - start)
+        seen.add(symbol)
+    return cold, warm
+
+async def compare(args, workdir):
+    os.environ["EOD_STORE_DIR"] = str(Path(workdir) / "eod")
+    import eod_store
+    import stockdata_client
+    from benchmark.mock_stockdata import start_mock_server
+
+    runner, base_url, stats = await start_mock_server(latency=args.upstream_latency)
+    stockdata_client.STOCKDATA_BASE_URL = base_url
+    rng = random.Random(42)
+    queries = []
+    for i in range(args.symbols):
+        # The first query of a symbol starts the stored history, later ones slice it
+        queries.extend((f"E{i:03d}", date_from, date_to) for date_from, date_to in
+                       [(HISTORY_START.isoformat(), None)] + random_ranges(rng, args.queries - 1))
+    rng.shuffle(queries)
+
+    async def api(symbol, date_from, date_to):
+        params = {"symbols": symbol, "date_from": date_from, **({"date_to": date_to} if date_to else {})}
+        return await stockdata_client.fetch_json("data/eod", params)
+
+    async def store(symbol, date_from, date_to):
+        return await eod_store.get_eod_bars(symbol, date_from, date_to)
+
+    print(f"{len(queries)} queries over {args.symbols} symbols, upstream latency {args.upstream_latency * 1000:.0f}ms")
+    try:
+        for name, answer in (("api", api), ("store", store)):
+            before = stats["requests"]
+            start = time.perf_counter()
+            cold, warm = await replay(queries, answer)
+            elapsed = time.perf_counter() - start
+            print(
+                f"{name:<6} total={elapsed:.2f}s requests={stats['requests'] - before:<4} "
+                f"first query p50={percentile(cold, 50) * 1000:.1f}ms "
+                f"repeat p50={percentile(warm, 50) * 1000:.1f}ms p95={percentile(warm, 95) * 1000:.1f}ms"
+            )
+    finally:
+        await stockdata_client.close_session()
+        await runner.cleanup()
+
+async def worker(args):
+    """Read every symbol from the shared store at the same moment as the other workers"""
+    import eod_store
+    import stockdata_client
+
+    await asyncio.sleep(max(args.start_at - time.time(), 0))
+    digests = {}
+    try:
+        for i in range(args.symbols):
+            columns = await eod_store.get_eod_bars(f"W{i:03d}", HISTORY_START.isoformat())
+            digests[f"W{i:03d}"] = digest(columns)
+    finally:
+        await stockdata_client.close_session()
+    print(json.dumps({"pid": os.getpid(), "digests": digests}), flush=True)
+
+async def concurrent_workers(args, workdir):
+    from benchmark.mock_stockdata import start_mock_server
+
+    store_dir = Path(workdir) / "shared_eod"
+    runner, base_url, stats = await start_mock_server(latency=args.upstream_latency)
+    env = dict(os.environ, STOCKDATA_BASE_URL=base_url, EOD_STORE_DIR=str(store_dir),
+               LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"))
+    start_at = time.time() + 1.5  # Leave time for every interpreter to import the store
+    command = [sys.executable, "-m", "benchmark.eod_store", "--worker", "--symbols", str(args.symbols),
+               "--start-at", str(start_at)]
+    processes = [
+        await asyncio.create_subprocess_exec(*command, env=env, stdout=asyncio.subprocess.PIPE)
+        for _ in range(args.processes)
+    ]
+    outputs = await asyncio.gather(*(process.communicate() for process in processes))
+    await runner.cleanup()
+
+    reports = [json.loads(stdout.decode().strip().splitlines()[-1]) for stdout, _ in outputs if stdout.strip()]
+    leftovers = [str(path.relative_to(store_dir)) for path in store_dir.rglob("*.tmp*")]
+    mismatched = [
+        symbol for symbol in (reports[0]["digests"] if reports else ())
+        if len({report["digests"][symbol] for report in reports}) != 1
+    ]
+    print(f"\n{args.processes} worker processes sharing one store")
+    results = [
+        ("every worker finished", len(reports) == args.processes and all(p.returncode == 0 for p in processes),
+         f"{len(reports)}/{args.processes} workers reported, exit codes {[p.returncode for p in processes]}"),
+        ("each symbol downloaded once", stats["requests"] == args.symbols,
+         f"{stats['requests']} upstream requests for {args.symbols} symbols"),
+        ("workers read identical bars", not mismatched, f"mismatched symbols: {mismatched}"),
+        ("no temporary files left", not leftovers, f"leftovers: {leftovers[:5]}"),
+    ]
+    for name, passed, detail in results:
+        print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+    return all(passed for _, passed, _ in results)
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        await compare(args, workdir)
+        return await concurrent_workers(args, workdir)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="EOD store query latency and multi-process consistency")
+    parser.add_argument("--symbols", type=int, default=20, help="Symbols queried")
+    parser.add_argument("--queries", type=int, default=10, help="Date-range queries per symbol")
+    parser.add_argument("--processes", type=int, default=4, help="Worker processes sharing one store")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds per mock stockdata request")
+    # Worker mode, used by the parent process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.worker:
+        asyncio.run(worker(args))
+    else:
+        sys.exit(0 if asyncio.run(main(args)) else 1)
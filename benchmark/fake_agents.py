@@ -0,0 +1,256 @@
+"""
+Local stand-in for the `AIProjectClient.agents` surface used by async-app.py.
+
+Runs follow a scripted sequence of tool-call steps with configurable API
+latency and model "think time", and complete with a canned assistant message.
+Runs can be polled or streamed; streamed runs emit the service's server-sent
+events, parsed by the SDK's own `AsyncAgentRunStream` and event handler.
+"""
+import asyncio
+import itertools
+import json
+import time
+from types import SimpleNamespace
+from azure.core.credentials import AccessToken
+from azure.ai.projects.models import (
+    AsyncAgentRunStream,
+    RequiredFunctionToolCall,
+    RequiredFunctionToolCallDetails,
+    SubmitToolOutputsAction,
+    SubmitToolOutputsDetails,
+)
+
+# Each turn is a list of steps; each step is a list of (function name, arguments) called in parallel
+DEFAULT_SCRIPT = (
+    [[("get_quote", {"symbols": "{symbol}"})]],
+    [[("get_news", {"symbols": "{symbol}"}), ("get_historical_eod", {"symbol": "{symbol}"})]],
+    [[("get_quote", {"symbols": "{symbol},MSFT"})], [("get_technical_indicators", {"symbols": "{symbol}"})]],
+)
+
+class FakeAgents:
+    """In-memory agents API with scripted runs and simulated latencies"""
+
+    def __init__(self, script=DEFAULT_SCRIPT, latency=0.05, think_time=0.3, symbols=("AAPL",),
+                 token_interval=0.01, narrate=False):
+        """
+        Args:
+            script: Turns to cycle through; each turn is a list of parallel tool-call steps
+            latency: Seconds every API call takes
+            think_time: Seconds the model "thinks" before each step and before the final answer
+            symbols: Symbols substituted for "{symbol}" in the script, cycled per run
+            token_interval: Seconds between the text deltas of a streamed message
+            narrate: Write a short message before each tool-call step, as models often do
+        """
+        self.script = script
+        self.latency = latency
+        self.think_time = think_time
+        self.token_interval = token_interval
+        self.narrate = narrate
+        self._symbols = itertools.cycle(symbols)
+        self._ids = itertools.count(1)
+        self._turns = itertools.cycle(script)
+        self.threads = {}  # thread id -> list of messages, newest first
+        self.runs = {}  # run id -> run state
+        self.calls = {}  # method name -> number of calls
+        self.errors = 0  # Tool outputs that did not match the requested tool calls
+
+    async def _api(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        await asyncio.sleep(self.latency)
+
+    def _new_id(self, prefix):
+        return f"{prefix}_{next(self._ids)}"
+
+    async def get_agent(self, agent_id):
+        await self._api("get_agent")
+        return SimpleNamespace(id=agent_id)
+
+    async def create_agent(self, **kwargs):
+        await self._api("create_agent")
+        return SimpleNamespace(id=self._new_id("asst"))
+
+    async def delete_agent(self, agent_id):
+        await self._api("delete_agent")
+
+    async def create_thread(self):
+        await self._api("create_thread")
+        thread_id = self._new_id("thread")
+        self.threads[thread_id] = []
+        return SimpleNamespace(id=thread_id)
+
+    async def create_message(self, thread_id, role, content):
+        await self._api("create_message")
+        message = {"role": role, "content": [{"text": {"value": content}}]}
+        self.threads[thread_id].insert(0, message)
+        return message
+
+    async def delete_thread(self, thread_id):
+        await self._api("delete_thread")
+        self.threads.pop(thread_id, None)
+
+    async def create_run(self, thread_id, agent_id, **kwargs):
+        await self._api("create_run")
+        return self._view(self._new_run(thread_id))
+
+    def _new_run(self, thread_id):
+        symbol = next(self._symbols)
+        steps = [
+            [(name, {k: v.format(symbol=symbol) for k, v in arguments.items()}) for name, arguments in step]
+            for step in next(self._turns)
+        ]
+        run = SimpleNamespace(
+            id=self._new_id("run"), thread_id=thread_id, status="queued", required_action=None,
+            steps=steps, step=0, ready_at=time.monotonic() + self.think_time, pending=set(),
+        )
+        self.runs[run.id] = run
+        return run
+
+    async def get_run(self, thread_id, run_id):
+        await self._api("get_run")
+        run = self.runs[run_id]
+        if run.status in ("completed", "cancelled") or run.pending:
+            return self._view(run)
+        if time.monotonic() < run.ready_at:
+            run.status = "in_progress"
+        elif run.step < len(run.steps):
+            tool_calls = [
+                RequiredFunctionToolCall(
+                    id=self._new_id("call"),
+                    function=RequiredFunctionToolCallDetails(name=name, arguments=json.dumps(arguments)),
+                )
+                for name, arguments in run.steps[run.step]
+            ]
+            run.pending = {tool_call.id for tool_call in tool_calls}
+            run.status = "requires_action"
+            run.required_action = SubmitToolOutputsAction(
+                submit_tool_outputs=SubmitToolOutputsDetails(tool_calls=tool_calls)
+            )
+        else:
+            run.status = "completed"
+            run.required_action = None
+            self.threads[run.thread_id].insert(
+                0, {"role": "assistant", "run_id": run.id, "content": [{"text": {"value": f"Answer for {run.id}"}}]}
+            )
+        return self._view(run)
+
+    async def submit_tool_outputs_to_run(self, thread_id, run_id, tool_outputs):
+        await self._api("submit_tool_outputs_to_run")
+        self._accept_tool_outputs(self.runs[run_id], tool_outputs)
+
+    def _accept_tool_outputs(self, run, tool_outputs):
+        if {output.tool_call_id for output in tool_outputs} != run.pending:
+            self.errors += 1
+        run.pending = set()
+        run.step += 1
+        run.status = "in_progress"
+        run.required_action = None
+        run.ready_at = time.monotonic() + self.think_time
+
+    async def create_stream(self, thread_id, agent_id, event_handler, **kwargs):
+        await self._api("create_stream")
+        return AsyncAgentRunStream(self._events(self._new_run(thread_id), created=True), _no_toolset, event_handler)
+
+    async def submit_tool_outputs_to_stream(self, thread_id, run_id, tool_outputs, event_handler):
+        await self._api("submit_tool_outputs_to_stream")
+        run = self.runs[run_id]
+        self._accept_tool_outputs(run, tool_outputs)
+        # Like the SDK, continue the run's events on the handler that is already being consumed
+        event_handler.initialize(self._events(run), _no_toolset)
+
+    async def _events(self, run, created=False):
+        """Server-sent events of a run until it requires action or completes"""
+        if created:
+            yield _sse("thread.run.created", self._run_json(run))
+        await asyncio.sleep(max(run.ready_at - time.monotonic(), 0))
+        if run.step < len(run.steps):
+            if self.narrate:
+                names = ", ".join(name for name, _ in run.steps[run.step])
+                async for event in self._message_events(run, f"Let me check {names}."):
+                    yield event
+            tool_calls = [
+                {"id": self._new_id("call"), "type": "function", "function": {"name": name, "arguments": json.dumps(arguments)}}
+                for name, arguments in run.steps[run.step]
+            ]
+            run.pending = {tool_call["id"] for tool_call in tool_calls}
+            run.status = "requires_action"
+            yield _sse("thread.run.requires_action", self._run_json(
+                run, required_action={"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": tool_calls}}
+            ))
+            return
+        async for event in self._message_events(run, f"Answer for {run.id}: the requested figures are ready."):
+            yield event
+        run.status = "completed"
+        run.required_action = None
+        yield _sse("thread.run.completed", self._run_json(run))
+        yield b"event: done\ndata: [DONE]\n\n"
+
+    async def _message_events(self, run, text):
+        """Stream one assistant message word by word and keep it in the thread"""
+        message_id = self._new_id("msg")
+        for i, word in enumerate(text.split(" ")):
+            await asyncio.sleep(self.token_interval)
+            yield _sse("thread.message.delta", {
+                "id": message_id, "object": "thread.message.delta",
+                "delta": {"role": "assistant", "content": [{"index": 0, "type": "text", "text": {"value": word if i == 0 else f" {word}"}}]},
+            })
+        self.threads[run.thread_id].insert(0, {"role": "assistant", "run_id": run.id, "content": [{"text": {"value": text}}]})
+
+    @staticmethod
+    def _run_json(run, required_action=None):
+        return {
+            "id": run.id, "object": "thread.run", "thread_id": run.thread_id, "assistant_id": "asst",
+            "status": run.status, "required_action": required_action,
+        }
+
+    async def cancel_run(self, thread_id, run_id):
+        await self._api("cancel_run")
+        self.runs[run_id].status = "cancelled"
+
+    async def list_messages(self, thread_id, run_id=None, limit=None, order="desc", **kwargs):
+        await self._api("list_messages")
+        messages = [m for m in self.threads[thread_id] if run_id is None or m.get("run_id") == run_id]
+        if order == "asc":
+            messages.reverse()
+        return {"data": messages[:limit]}
+
+    @staticmethod
+    def _view(run):
+        # Callers only read id, status and required_action
+        return SimpleNamespace(id=run.id, status=run.status, required_action=run.required_action)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+async def _no_toolset(run, event_handler):
+    # The SDK's automatic tool execution; the app submits tool outputs itself
+    pass
+
+class FakeCredential:
+    """Stand-in for DefaultAzureCredential that issues dummy tokens after a delay"""
+
+    def __init__(self, latency=0.2, lifetime=3600):
+        """
+        Args:
+            latency: Seconds every token acquisition takes, like walking the credential chain
+            lifetime: Seconds until an issued token expires
+        """
+        self.latency = latency
+        self.lifetime = lifetime
+        self.calls = 0
+
+    async def get_token(self, *scopes, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return AccessToken(f"fake-{self.calls}", int(time.time()) + self.lifetime)
+
+    async def close(self):
+        pass
+
+class FakeProjectClient:
+    """Stand-in for AIProjectClient exposing only `agents` and `close`"""
+
+    def __init__(self, agents):
+        self.agents = agents
+
+    async def close(self):
+        pass
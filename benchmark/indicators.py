@@ -0,0 +1,124 @@
+"""
+Indicators benchmark: vectorized batch computation versus a per-row Python loop.
+
+Usage:
+    python -m benchmark.indicators --years 5 --symbols 1 10 100
+
+Generates multi-year daily closes for a batch of symbols and computes every
+supported indicator with `indicators.compute_indicators` over one wide frame,
+and with a naive implementation that walks each symbol's closes row by row
+in plain Python. Reports both timings and checks that the latest values
+agree. Exits with status 1 if they do not.
+"""
+import argparse
+import math
+import sys
+import time
+import numpy as np
+import pandas as pd
+import indicators
+
+def synthetic_closes(symbols, years, seed=42):
+    """Geometric random walks, one column per symbol, on business days"""
+    rng = np.random.default_rng(seed)
+    days = years * indicators.TRADING_DAYS_PER_YEAR
+    returns = rng.normal(0.0003, 0.02, size=(days, symbols))
+    index = pd.bdate_range(end="2024-12-31", periods=days)
+    return pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=index, columns=[f"S{i:03d}" for i in range(symbols)])
+
+def _ema_series(values, span=None, alpha=None):
+    alpha = alpha if alpha is not None else 2 / (span + 1)
+    result, current = [], None
+    for value in values:
+        current = value if current is None else alpha * value + (1 - alpha) * current
+        result.append(current)
+    return result
+
+def _std(values):
+    mean = sum(values) / len(values)
+    return math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1))
+
+def naive_indicators(closes, window):
+    """Every indicator of one symbol, each computed for every row and the latest row kept"""
+    sma = [sum(closes[i - window + 1:i + 1]) / window if i >= window - 1 else None for i in range(len(closes))]
+    ema = _ema_series(closes, span=window)
+    deltas = [closes[i] - closes[i - 1] for i in range(1, len(closes))]
+    gains = _ema_series([max(delta, 0) for delta in deltas], alpha=1 / indicators.RSI_PERIOD)
+    losses = _ema_series([max(-delta, 0) for delta in deltas], alpha=1 / indicators.RSI_PERIOD)
+    rsi = [100.0 if loss == 0 else 100 - 100 / (1 + gain / loss) for gain, loss in zip(gains, losses)]
+    line = [fast - slow for fast, slow in zip(_ema_series(closes, span=indicators.MACD_FAST), _ema_series(closes, span=indicators.MACD_SLOW))]
+    signal = _ema_series(line, span=indicators.MACD_SIGNAL)
+    stds = [_std(closes[i - window + 1:i + 1]) if i >= window - 1 else None for i in range(len(closes))]
+    log_returns = [math.log(closes[i] / closes[i - 1]) for i in range(1, len(closes))]
+    volatility = [
+        _std(log_returns[i - window + 1:i + 1]) * math.sqrt(indicators.TRADING_DAYS_PER_YEAR) if i >= window - 1 else None
+        for i in range(len(log_returns))
+    ]
+    peak, drawdown = closes[0], 0.0
+    for value in closes:
+        peak = max(peak, value)
+        drawdown = min(drawdown, value / peak - 1)
+    return {
+        "close": closes[-1],
+        f"sma_{window}": sma[-1],
+        f"ema_{window}": ema[-1],
+        f"rsi_{indicators.RSI_PERIOD}": rsi[-1],
+        "macd": line[-1],
+        "macd_signal": signal[-1],
+        "macd_histogram": line[-1] - signal[-1],
+        "bollinger_lower": sma[-1] - indicators.BOLLINGER_STD * stds[-1],
+        "bollinger_middle": sma[-1],
+        "bollinger_upper": sma[-1] + indicators.BOLLINGER_STD * stds[-1],
+        f"volatility_{window}d_annualized": volatility[-1],
+        "max_drawdown_pct": drawdown * 100,
+    }
+
+def best_of(repeat, compute):
+    """Shortest of several runs, and the result of the last one"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = compute()
+        durations.append(time.perf_counter() - start)
+    return min(durations), result
+
+def mismatches(vectorized, naive):
+    """Values that differ by more than the 4-decimal rounding of compute_indicators"""
+    return [
+        (symbol, key, vectorized[symbol][key], value)
+        for symbol, values in naive.items()
+        for key, value in values.items()
+        if not math.isclose(vectorized[symbol][key], value, rel_tol=1e-6, abs_tol=1e-4)
+    ]
+
+def main(args):
+    ok = True
+    print(f"{args.years} years of daily closes, window {args.window}, {len(indicators.SUPPORTED_INDICATORS)} indicators")
+    for symbols in args.symbols:
+        close = synthetic_closes(symbols, args.years)
+        vectorized_time, vectorized = best_of(
+            args.repeat, lambda: indicators.compute_indicators(close, indicators.SUPPORTED_INDICATORS, args.window)
+        )
+        naive_time, naive = best_of(
+            args.repeat, lambda: {symbol: naive_indicators(close[symbol].tolist(), args.window) for symbol in close.columns}
+        )
+
+        wrong = mismatches(vectorized, naive)
+        ok = ok and not wrong
+        print(
+            f"symbols={symbols:<4} bars={len(close)} vectorized={vectorized_time * 1000:.1f}ms "
+            f"per-row={naive_time * 1000:.1f}ms speedup={naive_time / vectorized_time:.1f}x "
+            f"{'values agree' if not wrong else f'MISMATCH {wrong[:3]}'}"
+        )
+    return ok
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized indicators versus a per-row Python implementation")
+    parser.add_argument("--years", type=int, default=5, help="Years of daily closes per symbol")
+    parser.add_argument("--symbols", type=int, nargs="+", default=[1, 10, 100], help="Batch sizes to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement, the fastest is reported")
+    parser.add_argument("--window", type=int, default=20, help="Look-back window in trading days")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(0 if main(parse_args()) else 1)
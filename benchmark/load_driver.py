@@ -0,0 +1,115 @@
+"""
+Load driver simulating concurrent Chainlit sessions against fake upstreams.
+
+Usage:
+    python -m benchmark.load_driver --sessions 50 --turns 3
+
+Reports p50/p95/p99 turn latency, throughput and event-loop lag.
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SYMBOLS = ("AAPL", "MSFT", "NVDA", "AMZN", "GOOGL", "META", "TSLA", "AVGO", "COST", "NFLX")
+LAG_SAMPLE_INTERVAL = 0.01  # Seconds between event-loop lag probes
+
+def load_app(workdir):
+    """Import async-app.py with credentials and external services replaced by local fakes"""
+    os.environ.setdefault("PROJECT_CONNECTION_STRING", "fake")
+    os.environ.setdefault("MODEL_DEPLOYMENT_NAME", "fake")
+    os.environ.setdefault("AGENT_STREAMING", "false")
+    os.environ.setdefault("METRICS_PORT", "0")
+    os.environ.setdefault("LOG_LEVEL", "INFO")
+    os.environ.setdefault("EOD_STORE_DIR", str(Path(workdir) / "eod"))
+    sys.path.insert(0, str(ROOT))
+    spec = importlib.util.spec_from_file_location("async_app", ROOT / "async-app.py")
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    # Keep the real agent id file untouched
+    app.AGENT_INFO_FILE = Path(workdir) / "agent_info.json"
+    return app
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+async def monitor_loop_lag(samples, stop):
+    """Record how late the event loop wakes a sleeping task"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        start = loop.time()
+        await asyncio.sleep(LAG_SAMPLE_INTERVAL)
+        samples.append(max(loop.time() - start - LAG_SAMPLE_INTERVAL, 0))
+
+async def run_session(app, session_id, turns, latencies, failures):
+    for turn in range(turns):
+        start = time.perf_counter()
+        response = await app.process_message(f"Turn {turn}", session_id)
+        latencies.append(time.perf_counter() - start)
+        if response.startswith("Sorry") or response.startswith("Request timed out"):
+            failures.append(response)
+
+async def main(args):
+    from benchmark.fake_agents import FakeAgents, FakeCredential, FakeProjectClient
+    from benchmark.mock_stockdata import start_mock_server
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        import stockdata_client
+
+        runner, base_url, upstream_stats = await start_mock_server(latency=args.upstream_latency)
+        stockdata_client.STOCKDATA_BASE_URL = base_url
+
+        agents = FakeAgents(latency=args.agent_latency, think_time=args.think_time, symbols=SYMBOLS)
+        app.AIProjectClient.from_connection_string = staticmethod(lambda **kwargs: FakeProjectClient(agents))
+        credential = app.TokenManager(FakeCredential(latency=args.token_latency))
+        app.get_credential = lambda: credential
+
+        lag_samples, stop = [], asyncio.Event()
+        monitor = asyncio.ensure_future(monitor_loop_lag(lag_samples, stop))
+        latencies, failures = [], []
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            run_session(app, f"session-{i}", args.turns, latencies, failures) for i in range(args.sessions)
+        ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await monitor
+
+        await app.close_client()
+        await stockdata_client.close_session()
+        await runner.cleanup()
+
+    print(f"sessions={args.sessions} turns/session={args.turns} elapsed={elapsed:.2f}s")
+    print(f"throughput={len(latencies) / elapsed:.2f} turns/s failures={len(failures)} tool_output_mismatches={agents.errors}")
+    print(
+        f"turn latency p50={percentile(latencies, 50):.3f}s p95={percentile(latencies, 95):.3f}s "
+        f"p99={percentile(latencies, 99):.3f}s max={max(latencies):.3f}s"
+    )
+    print(
+        f"event-loop lag p50={percentile(lag_samples, 50) * 1000:.1f}ms p99={percentile(lag_samples, 99) * 1000:.1f}ms "
+        f"max={max(lag_samples, default=0) * 1000:.1f}ms mean={statistics.fmean(lag_samples) * 1000 if lag_samples else 0:.1f}ms"
+    )
+    print(f"upstream stockdata requests={upstream_stats['requests']} agents API calls={sum(agents.calls.values())}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline load benchmark for the Nasdaq Stock Assistant")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent simulated chat sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Messages sent by each session, one after another")
+    parser.add_argument("--agent-latency", type=float, default=0.05, help="Seconds per fake agents API call")
+    parser.add_argument("--think-time", type=float, default=0.3, help="Seconds the fake model takes per step")
+    parser.add_argument("--token-latency", type=float, default=0.2, help="Seconds the fake credential takes per token")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds per mock stockdata request")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
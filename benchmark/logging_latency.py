@@ -0,0 +1,101 @@
+"""
+Logging benchmark: event-loop latency during a burst of tool calls, synchronous versus queued logging.
+
+Usage:
+    python -m benchmark.logging_latency --calls 500 --payload-kb 50
+
+Simulates a burst of concurrent tool calls that each log a few lines and
+their whole payload at DEBUG, the way the tools do, and samples event-loop
+lag meanwhile. Compares the previous setup (handlers writing on the calling
+thread, payload formatted eagerly with an f-string) with the queue mode of
+`log_utils.setup_logging` (lazy %-style arguments, truncation and I/O on the
+listener thread), at DEBUG and at INFO. Console output goes to a file in a
+temporary directory so the terminal speed does not dominate.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import log_utils
+from benchmark.load_driver import monitor_loop_lag, percentile
+
+MODES = (  # name, async_mode, level, lazy payload formatting
+    ("sync eager DEBUG", False, logging.DEBUG, False),
+    ("queue lazy DEBUG", True, logging.DEBUG, True),
+    ("queue lazy INFO", True, logging.INFO, True),
+)
+
+def payload(kb):
+    """A tool input shaped like EOD rows, about kb kilobytes once serialized"""
+    rows = [{"date": f"2024-01-{i % 28 + 1:02d}", "data": {"open": 1.5 * i, "close": 1.6 * i, "volume": 1000 + i}} for i in range(kb * 12)]
+    return {"data": rows}
+
+async def tool_call(logger, data, lazy):
+    logger.info('plot_time_series() tool used.')
+    if lazy:
+        logger.debug('working on data: %s', data)
+    else:
+        logger.debug(f'working on data: {data}')
+    await asyncio.sleep(0.005)
+    logger.info(f"Tool call finished with {len(data['data'])} rows")
+
+async def measure(args, name, async_mode, level, lazy, data):
+    logger = log_utils.setup_logging(
+        app_name="logging_benchmark", log_level=level, async_mode=async_mode,
+        max_message_chars=args.max_chars if async_mode else None,
+    )
+    lag_samples, stop = [], asyncio.Event()
+    monitor = asyncio.ensure_future(monitor_loop_lag(lag_samples, stop))
+    await asyncio.sleep(0.1)
+    start = time.perf_counter()
+    for i in range(0, args.calls, args.concurrency):
+        await asyncio.gather(*(tool_call(logger, data, lazy) for _ in range(min(args.concurrency, args.calls - i))))
+    burst = time.perf_counter() - start
+    stop.set()
+    await monitor
+    start = time.perf_counter()
+    log_utils.stop_logging()
+    drain = time.perf_counter() - start
+    for handler in logger.handlers:
+        handler.close()
+    logger.handlers.clear()
+    print(
+        f"{name:<17} burst={burst:.2f}s loop lag p50={percentile(lag_samples, 50) * 1000:.1f}ms "
+        f"p99={percentile(lag_samples, 99) * 1000:.1f}ms max={max(lag_samples, default=0) * 1000:.0f}ms "
+        f"| background drain={drain:.2f}s"
+    )
+
+async def main(args):
+    data = payload(args.payload_kb)
+    print(
+        f"{args.calls} tool calls, {args.concurrency} at a time, payload {len(json.dumps(data)) / 1024:.0f}KB, "
+        f"queue mode truncates at {args.max_chars} chars"
+    )
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        stderr = sys.stderr
+        try:
+            # The console handler binds sys.stderr when it is created
+            with open("console.log", "w") as console:
+                sys.stderr = console
+                for name, async_mode, level, lazy in MODES:
+                    await measure(args, name, async_mode, level, lazy, data)
+        finally:
+            sys.stderr = stderr
+            os.chdir(cwd)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Event-loop latency of synchronous versus queued logging")
+    parser.add_argument("--calls", type=int, default=500, help="Tool calls in the burst")
+    parser.add_argument("--concurrency", type=int, default=50, help="Tool calls running at once")
+    parser.add_argument("--payload-kb", type=int, default=50, help="Approximate size of each logged payload")
+    parser.add_argument("--max-chars", type=int, default=2000, help="Truncation of records in queue mode")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,147 @@
+"""
+Local mock of the stockdata.org quote, news and EOD endpoints.
+
+Responses are synthetic but shaped like the real API, and every request can
+be delayed by a configurable latency. Faults (random errors, rate limiting
+with Retry-After, a full outage) can be injected and changed at runtime
+through the `faults` dict of the application.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import random
+from aiohttp import web
+
+def _seed(symbol):
+    return int(hashlib.md5(symbol.encode()).hexdigest()[:8], 16)
+
+def _quote(symbol):
+    price = 50 + _seed(symbol) % 450
+    day_change = round((_seed(symbol) // 450 % 1000 - 500) / 100, 2)  # -5% to +5%
+    return {
+        "ticker": symbol, "name": f"{symbol} Inc.", "exchange_short": "NASDAQ", "currency": "USD",
+        "price": price, "day_high": price * 1.01, "day_low": price * 0.99, "day_open": price,
+        "previous_close_price": round(price / (1 + day_change / 100), 2), "day_change": day_change,
+        "market_cap": price * (_seed(symbol) % 5000 + 100) * 1_000_000, "volume": 1_000_000,
+    }
+
+NEWS_EPOCH = datetime.datetime(2024, 6, 1)  # Publication time of the newest article of every symbol
+
+def _article(symbol, i):
+    """Article i of a symbol, newest first"""
+    return {
+        "uuid": f"{symbol}-{i}", "title": f"{symbol} news {i}", "description": "Synthetic article",
+        "snippet": "Lorem ipsum " * 20, "url": f"https://example.com/{symbol}/{i}",
+        "published_at": (NEWS_EPOCH - datetime.timedelta(hours=i)).isoformat() + "Z",
+        "source": "example.com",
+        "entities": [{"symbol": symbol, "name": f"{symbol} Inc.", "sentiment_score": 0.1,
+                      "highlights": [{"highlight": "Lorem ipsum", "sentiment": 0.1, "highlighted_in": "main_text"}]}],
+        "similar": [{"uuid": f"{symbol}-{i}-s{j}", "title": f"Similar {j}"} for j in range(3)],
+    }
+
+def _eod(symbol, date_from, date_to):
+    base = 50 + _seed(symbol) % 450
+    rows = []
+    day = date_from
+    while day <= date_to:
+        if day.weekday() < 5:
+            n = (day - datetime.date(2000, 1, 1)).days
+            close = base * (1 + 0.2 * ((n * 7919 + _seed(symbol)) % 1000 - 500) / 500)
+            rows.append({
+                "date": f"{day.isoformat()}T00:00:00.000Z", "ticker": symbol,
+                "data": {"open": close * 0.99, "high": close * 1.02, "low": close * 0.98, "close": close, "volume": 1_000_000},
+            })
+        day += datetime.timedelta(days=1)
+    return rows[::-1]
+
+DEFAULT_FAULTS = {
+    "error_rate": 0.0,  # Share of requests answered with error_status
+    "error_status": 503,
+    "rate_limit_every": 0,  # Answer every Nth request with 429, 0 disables
+    "retry_after": 1,  # Seconds sent in Retry-After with 429 responses
+    "down": False,  # Answer every request with error_status
+}
+
+def create_app(latency=0.05, faults=None):
+    """
+    Build the mock API application.
+
+    Args:
+        latency: Seconds every request is delayed by
+        faults: Optional overrides of DEFAULT_FAULTS; `app["faults"]` can be changed while serving
+
+    Returns:
+        web.Application: The mock served under /v1
+    """
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+    fault_config = {**DEFAULT_FAULTS, **(faults or {})}
+
+    @web.middleware
+    async def inject_faults(request, handler):
+        if fault_config["down"] or random.random() < fault_config["error_rate"]:
+            stats["errors"] += 1
+            await asyncio.sleep(latency)
+            payload = {"error": {"code": "service_unavailable", "message": "Injected fault"}}
+            return web.json_response(payload, status=fault_config["error_status"])
+        every = fault_config["rate_limit_every"]
+        if every and (stats["requests"] + stats["rate_limited"] + 1) % every == 0:
+            stats["rate_limited"] += 1
+            payload = {"error": {"code": "rate_limit_reached", "message": "Too many requests"}}
+            return web.json_response(payload, status=429, headers={"Retry-After": str(fault_config["retry_after"])})
+        return await handler(request)
+
+    def symbols_of(request):
+        return [s for s in request.query.get("symbols", "").split(",") if s]
+
+    async def respond(payload):
+        stats["requests"] += 1
+        await asyncio.sleep(latency)
+        return web.Response(text=json.dumps(payload), content_type="application/json")
+
+    async def quote(request):
+        data = [_quote(s) for s in symbols_of(request)]
+        return await respond({"meta": {"requested": len(data), "returned": len(data)}, "data": data})
+
+    async def news(request):
+        limit = int(request.query.get("limit", 3))
+        page = int(request.query.get("page", 1))
+        data = [_article(s, (page - 1) * limit + i) for s in symbols_of(request) for i in range(limit)]
+        published_after = request.query.get("published_after")
+        if published_after:
+            data = [a for a in data if a["published_at"][:19] > published_after]
+        return await respond({"meta": {"found": 1000, "returned": len(data), "limit": limit, "page": page}, "data": data})
+
+    async def eod(request):
+        today = datetime.date.today()
+        date_to = datetime.date.fromisoformat(request.query.get("date_to", today.isoformat()))
+        default_from = (today - datetime.timedelta(days=365)).isoformat()
+        date_from = datetime.date.fromisoformat(request.query.get("date_from", default_from))
+        data = [row for s in symbols_of(request) for row in _eod(s, date_from, date_to)]
+        return await respond({"meta": {"date_from": date_from.isoformat(), "date_to": date_to.isoformat()}, "data": data})
+
+    app = web.Application(middlewares=[inject_faults])
+    app["stats"] = stats
+    app["faults"] = fault_config
+    app.router.add_get("/v1/data/quote", quote)
+    app.router.add_get("/v1/news/all", news)
+    app.router.add_get("/v1/data/eod", eod)
+    return app
+
+async def start_mock_server(host="127.0.0.1", port=0, latency=0.05, faults=None):
+    """
+    Start the mock on a local port.
+
+    Returns:
+        tuple: (runner to clean up, base URL to use as STOCKDATA_BASE_URL, request stats dict)
+    """
+    app = create_app(latency, faults)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}/v1", app["stats"]
+
+if __name__ == "__main__":
+    web.run_app(create_app(), host="127.0.0.1", port=8765)
@@ -0,0 +1,156 @@
+"""
+Multi-worker check: several app processes sharing one agent and one response cache.
+
+Usage:
+    python -m benchmark.multiworker --workers 4
+
+Starts worker processes at the same moment against a file-backed fake
+agents service and the local stockdata mock. Each worker initializes,
+answers one message, stays up for a staggered time and shuts down; one
+extra worker is killed without shutting down. Checks that the agent is
+created once, deleted once by the last worker to exit, and that the agent
+info file is gone afterwards. Exits with status 1 if a check fails.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from filelock import FileLock
+from benchmark.fake_agents import FakeAgents, FakeCredential, FakeProjectClient
+from benchmark.load_driver import load_app
+
+class FileAgents(FakeAgents):
+    """Fake agents API whose agents live in a JSON file shared by the worker processes"""
+
+    def __init__(self, workdir, **kwargs):
+        super().__init__(**kwargs)
+        self.state_path = Path(workdir) / "agents_service.json"
+        self._lock = FileLock(str(self.state_path) + ".lock")
+
+    def _update(self, event, change=None):
+        """Apply change(agents) under the lock and log the event; return change's result"""
+        with self._lock:
+            state = json.loads(self.state_path.read_text()) if self.state_path.exists() else {"agents": [], "events": []}
+            result = change(state["agents"]) if change else None
+            state["events"].append({"event": event, "pid": os.getpid(), "time": time.time()})
+            self.state_path.write_text(json.dumps(state))
+        return result
+
+    async def get_agent(self, agent_id):
+        await self._api("get_agent")
+
+        def find(agents):
+            if agent_id not in agents:
+                raise LookupError(f"Agent {agent_id} not found")
+            return SimpleNamespace(id=agent_id)
+        return self._update("get_agent", find)
+
+    async def create_agent(self, **kwargs):
+        await self._api("create_agent")
+        agent_id = f"asst_{os.getpid()}"
+        self._update("create_agent", lambda agents: agents.append(agent_id))
+        return SimpleNamespace(id=agent_id)
+
+    async def delete_agent(self, agent_id):
+        await self._api("delete_agent")
+        self._update("delete_agent", lambda agents: agents.remove(agent_id))
+
+async def worker(args):
+    """Run one app process: initialize, answer a message, hold, then shut down (or die)"""
+    app = load_app(args.workdir)
+    import stockdata_client
+
+    agents = FileAgents(args.workdir, latency=0.02, think_time=0.05)
+    app.AIProjectClient.from_connection_string = staticmethod(lambda **kwargs: FakeProjectClient(agents))
+    credential = app.TokenManager(FakeCredential(latency=0.01))
+    app.get_credential = lambda: credential
+
+    # Start together so the workers race for the agent
+    await asyncio.sleep(max(args.start_at - time.time(), 0))
+    await app.initialize()
+    response = await app.process_message("Hello", "session-1")
+    await asyncio.sleep(args.hold)
+    cache = stockdata_client._response_cache
+    print(json.dumps({
+        "pid": os.getpid(), "agent_id": app.app_state.agent.id, "response": response,
+        "cache_misses": cache.misses, "shared_hits": cache.shared_hits,
+    }), flush=True)
+    if args.crash:
+        # Die without releasing; the survivors must prune this pid
+        os._exit(0)
+    await app.shutdown_server()
+
+async def main(args):
+    from benchmark.mock_stockdata import start_mock_server
+
+    with tempfile.TemporaryDirectory() as workdir:
+        runner, base_url, upstream_stats = await start_mock_server(latency=0.05)
+        env = dict(
+            os.environ, STOCKDATA_BASE_URL=base_url, LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"),
+            STOCKDATA_SHARED_CACHE_DIR=str(Path(workdir) / "shared_cache") if args.shared_cache else "",
+        )
+        start_at = time.time() + 1.5  # Leave time for every interpreter to import the app
+        holds = [0.2 + i * args.stagger for i in range(args.workers)]
+        commands = [
+            [sys.executable, "-m", "benchmark.multiworker", "--worker", "--workdir", workdir,
+             "--start-at", str(start_at), "--hold", str(hold)]
+            for hold in holds
+        ]
+        commands.append(commands[0][:-1] + [str(holds[-1] / 2), "--crash"])
+        processes = [
+            await asyncio.create_subprocess_exec(*command, env=env, stdout=asyncio.subprocess.PIPE)
+            for command in commands
+        ]
+        outputs = await asyncio.gather(*(process.communicate() for process in processes))
+        await runner.cleanup()
+
+        reports = [json.loads(stdout.decode().strip().splitlines()[-1]) for stdout, _ in outputs if stdout.strip()]
+        state = json.loads((Path(workdir) / "agents_service.json").read_text())
+        agent_info_left = (Path(workdir) / "agent_info.json").exists()
+
+    events = state["events"]
+    created = [e for e in events if e["event"] == "create_agent"]
+    deleted = [e for e in events if e["event"] == "delete_agent"]
+    last_pid = processes[args.workers - 1].pid
+    results = [
+        ("every worker answered", len(reports) == len(commands) and all(r["response"].startswith("Answer") for r in reports),
+         f"{len(reports)}/{len(commands)} workers reported"),
+        ("agent created once", len(created) == 1 and len({r["agent_id"] for r in reports}) == 1,
+         f"{len(created)} create_agent call(s), agent ids {sorted({r['agent_id'] for r in reports})}"),
+        ("agent deleted once by the last worker", len(deleted) == 1 and deleted[0]["pid"] == last_pid,
+         f"{len(deleted)} delete_agent call(s) from pid {[e['pid'] for e in deleted]}, last worker {last_pid}"),
+        ("agent info file removed", not agent_info_left and not state["agents"], f"agents left: {state['agents']}"),
+        ("workers exited cleanly", all(p.returncode == 0 for p in processes), f"exit codes {[p.returncode for p in processes]}"),
+    ]
+    for name, passed, detail in results:
+        print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+    print(
+        f"shared_cache={'on' if args.shared_cache else 'off'} upstream stockdata requests={upstream_stats['requests']} "
+        f"cache misses={sum(r['cache_misses'] for r in reports)} shared hits={sum(r['shared_hits'] for r in reports)}"
+    )
+    return all(passed for _, passed, _ in results)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-worker agent ownership check")
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes that shut down cleanly")
+    parser.add_argument("--stagger", type=float, default=0.5, help="Seconds between the workers' shutdowns")
+    parser.add_argument("--no-shared-cache", dest="shared_cache", action="store_false", help="Leave the shared response cache off")
+    # Worker mode, used by the parent process
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--start-at", type=float, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--hold", type=float, default=0, help=argparse.SUPPRESS)
+    parser.add_argument("--crash", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.worker:
+        asyncio.run(worker(args))
+    else:
+        sys.exit(0 if asyncio.run(main(args)) else 1)
@@ -0,0 +1,79 @@
+"""
+News benchmark: get_news latency and upstream requests with and without prefetching.
+
+Usage:
+    python -m benchmark.news --duration 20 --rate 20
+
+Replays a popularity-skewed stream of get_news calls against the mock
+stockdata server, with the response cache TTL and the prefetch interval
+scaled down so a few seconds cover several refresh cycles.
+"""
+import argparse
+import asyncio
+import random
+import time
+import news_prefetcher
+import stockdata_client
+import user_async_functions
+from benchmark.load_driver import percentile
+from benchmark.mock_stockdata import start_mock_server
+
+SYMBOLS = [f"S{i:02d}" for i in range(30)]
+
+async def replay(args, prefetch):
+    """Run the query stream once and return (latencies, upstream news requests)"""
+    prefetcher = news_prefetcher.NewsPrefetcher(interval=args.prefetch_interval if prefetch else 0)
+    news_prefetcher._prefetcher = prefetcher
+    stockdata_client._response_cache.clear()
+    runner, base_url, stats = await start_mock_server(latency=args.upstream_latency)
+    stockdata_client.STOCKDATA_BASE_URL = base_url
+    prefetcher.start()
+
+    rng = random.Random(42)
+    weights = [1 / (rank + 1) ** 1.2 for rank in range(len(SYMBOLS))]  # Zipf-like popularity
+    latencies = []
+
+    async def query(symbols):
+        start = time.perf_counter()
+        await user_async_functions.get_news(symbols)
+        latencies.append(time.perf_counter() - start)
+
+    tasks = []
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        # Some questions compare two tickers
+        count = 2 if rng.random() < args.pair_share else 1
+        tasks.append(asyncio.ensure_future(query(",".join(rng.choices(SYMBOLS, weights, k=count)))))
+        await asyncio.sleep(1 / args.rate)
+    await asyncio.gather(*tasks)
+
+    await prefetcher.stop()
+    requests = stats["requests"]
+    await stockdata_client.close_session()
+    await runner.cleanup()
+    return latencies, requests
+
+async def main(args):
+    # Compress time: live responses stay cached for a few seconds instead of minutes
+    user_async_functions.NEWS_CACHE_TTL = args.cache_ttl
+    for prefetch in (False, True):
+        latencies, requests = await replay(args, prefetch)
+        print(
+            f"prefetch={'on ' if prefetch else 'off'} calls={len(latencies)} upstream_requests={requests} "
+            f"p50={percentile(latencies, 50) * 1000:.1f}ms p90={percentile(latencies, 90) * 1000:.1f}ms "
+            f"p95={percentile(latencies, 95) * 1000:.1f}ms "
+            f"upstream_waits={sum(latency >= args.upstream_latency for latency in latencies) / len(latencies):.1%}"
+        )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="get_news benchmark with and without the prefetcher")
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of simulated traffic per mode")
+    parser.add_argument("--rate", type=float, default=20, help="get_news calls per second")
+    parser.add_argument("--cache-ttl", type=float, default=3, help="Seconds live news responses stay cached")
+    parser.add_argument("--prefetch-interval", type=float, default=3, help="Seconds between prefetch cycles")
+    parser.add_argument("--pair-share", type=float, default=0.3, help="Share of calls asking for two symbols")
+    parser.add_argument("--upstream-latency", type=float, default=0.2, help="Seconds per mock stockdata request")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
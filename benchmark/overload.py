@@ -0,0 +1,128 @@
+"""
+Overload benchmark: turn latency with and without admission control.
+
+Usage:
+    python -m benchmark.overload --rate 30 --duration 15 --capacity 20
+
+New sessions arrive at a fixed rate above what the fake model can serve.
+The fake model slows down like a shared backend: once more runs are
+active than its capacity, every step takes proportionally longer. Some
+sessions send a second message right after the first. Reports latency
+percentiles of answered turns, rejections, timeouts and peak concurrency.
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from benchmark.fake_agents import FakeAgents, FakeCredential, FakeProjectClient
+from benchmark.load_driver import SYMBOLS, load_app, percentile
+
+class ContendedAgents(FakeAgents):
+    """Fake agents API whose think time grows with the number of active runs beyond a capacity"""
+
+    def __init__(self, capacity, **kwargs):
+        super().__init__(**kwargs)
+        self.capacity = capacity
+        self.peak_active = 0
+
+    def _slowdown(self):
+        active = sum(run.status not in ("completed", "cancelled") for run in self.runs.values())
+        self.peak_active = max(self.peak_active, active)
+        return max(1.0, active / self.capacity)
+
+    async def create_run(self, thread_id, agent_id, **kwargs):
+        view = await super().create_run(thread_id, agent_id, **kwargs)
+        run = self.runs[view.id]
+        run.ready_at = time.monotonic() + self.think_time * self._slowdown()
+        return view
+
+    async def submit_tool_outputs_to_run(self, thread_id, run_id, tool_outputs):
+        await super().submit_tool_outputs_to_run(thread_id, run_id, tool_outputs)
+        self.runs[run_id].ready_at = time.monotonic() + self.think_time * self._slowdown()
+
+async def replay(args, admission):
+    """Run the arrival stream once and return (answered latencies, rejected latencies, timeouts, peak runs)"""
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        import news_prefetcher
+        import stockdata_client
+        from admission import AdmissionController
+        from benchmark.mock_stockdata import start_mock_server
+
+        runner, base_url, _ = await start_mock_server(latency=args.upstream_latency)
+        stockdata_client.STOCKDATA_BASE_URL = base_url
+        stockdata_client._response_cache.clear()
+        agents = ContendedAgents(args.capacity, latency=args.agent_latency, think_time=args.think_time, symbols=SYMBOLS)
+        app.AIProjectClient.from_connection_string = staticmethod(lambda **kwargs: FakeProjectClient(agents))
+        credential = app.TokenManager(FakeCredential(latency=0.01))
+        app.get_credential = lambda: credential
+        app.MESSAGE_TIMEOUT = args.message_timeout
+        app.app_state.admission = AdmissionController(
+            max_inflight=args.capacity if admission else 0, max_queued=args.queue_size, max_wait=args.max_wait
+        )
+        await app.initialize()
+
+        answered, rejected, timeouts = [], [], []
+
+        async def turn(session_id, text):
+            start = time.perf_counter()
+            response = await app.process_message(text, session_id)
+            elapsed = time.perf_counter() - start
+            if response.startswith("Answer"):
+                answered.append(elapsed)
+            elif response.startswith("The assistant is busy"):
+                rejected.append(elapsed)
+            else:
+                timeouts.append(elapsed)
+
+        async def session(i):
+            tasks = [asyncio.ensure_future(turn(f"session-{i}", "First question"))]
+            if rng.random() < args.follow_up_share:
+                # Sent while the first answer is still running
+                await asyncio.sleep(0.1)
+                tasks.append(asyncio.ensure_future(turn(f"session-{i}", "Follow-up question")))
+            await asyncio.gather(*tasks)
+
+        rng = random.Random(7)
+        sessions = []
+        deadline = time.perf_counter() + args.duration
+        i = 0
+        while time.perf_counter() < deadline:
+            sessions.append(asyncio.ensure_future(session(i)))
+            i += 1
+            await asyncio.sleep(rng.expovariate(args.rate))
+        await asyncio.gather(*sessions)
+
+        await news_prefetcher.get_prefetcher().stop()
+        await app.close_client()
+        await stockdata_client.close_session()
+        await runner.cleanup()
+    return answered, rejected, timeouts, agents.peak_active
+
+async def main(args):
+    for admission in (False, True):
+        answered, rejected, timeouts, peak = await replay(args, admission)
+        print(
+            f"admission={'on ' if admission else 'off'} answered={len(answered)} rejected={len(rejected)} "
+            f"timed_out={len(timeouts)} peak_runs={peak} "
+            f"p50={percentile(answered, 50):.2f}s p95={percentile(answered, 95):.2f}s p99={percentile(answered, 99):.2f}s "
+            f"reject_max={max(rejected, default=0):.2f}s"
+        )
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Turn latency under overload with and without admission control")
+    parser.add_argument("--duration", type=float, default=15, help="Seconds of arrivals per mode")
+    parser.add_argument("--rate", type=float, default=30, help="New sessions per second")
+    parser.add_argument("--capacity", type=int, default=20, help="Runs the fake model serves at full speed, also the in-flight cap")
+    parser.add_argument("--queue-size", type=int, default=40, help="Turns allowed to wait for a slot")
+    parser.add_argument("--max-wait", type=float, default=5, help="Seconds a turn may wait for a slot")
+    parser.add_argument("--follow-up-share", type=float, default=0.2, help="Share of sessions sending a second message at once")
+    parser.add_argument("--message-timeout", type=float, default=30, help="Seconds before a run is cancelled")
+    parser.add_argument("--agent-latency", type=float, default=0.02, help="Seconds per fake agents API call")
+    parser.add_argument("--think-time", type=float, default=0.3, help="Seconds per model step at or below capacity")
+    parser.add_argument("--upstream-latency", type=float, default=0.02, help="Seconds per mock stockdata request")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,87 @@
+"""
+Portfolio benchmark: bulk summary throughput for 100 and 500 symbols.
+
+Usage:
+    python -m benchmark.portfolio --sizes 100 500
+
+Runs `get_portfolio_summary` against the local stockdata mock for quotes
+and for a one-month history, cold (empty caches and EOD store) and warm,
+and compares it with fetching the same data one tool call at a time the
+way the agent had to before: `get_quote` per API-sized chunk and
+`get_historical_eod` per symbol, sequentially.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+async def timed(coro):
+    start = time.perf_counter()
+    result = await coro
+    return time.perf_counter() - start, result
+
+async def sequential_quotes(user_async_functions, symbols, chunk_size):
+    for i in range(0, len(symbols), chunk_size):
+        await user_async_functions.get_quote(",".join(symbols[i:i + chunk_size]))
+    return (len(symbols) + chunk_size - 1) // chunk_size
+
+async def sequential_history(user_async_functions, symbols, date_from, date_to):
+    for symbol in symbols:
+        await user_async_functions.get_historical_eod(symbol, date_from, date_to)
+    return len(symbols)
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ["EOD_STORE_DIR"] = workdir
+        import stockdata_client
+        import user_async_functions
+        from benchmark.mock_stockdata import start_mock_server
+        from resilience import Upstream
+
+        runner, base_url, stats = await start_mock_server(latency=args.upstream_latency)
+        stockdata_client.STOCKDATA_BASE_URL = base_url
+        stockdata_client._upstream = Upstream("stockdata", rate=args.rate_limit, burst=stockdata_client.RATE_LIMIT_BURST)
+        print(
+            f"upstream latency {args.upstream_latency * 1000:.0f}ms, rate limit "
+            f"{f'{args.rate_limit:g}/s' if args.rate_limit else 'off'}, concurrency {user_async_functions.PORTFOLIO_CONCURRENCY}"
+        )
+        try:
+            for size in args.sizes:
+                for mode in ("quotes", "history"):
+                    dates = (args.date_from, args.date_to) if mode == "history" else (None, None)
+                    # Fresh symbol names per run, so nothing is cached or stored yet
+                    bulk_symbols = [f"B{mode[0]}{size}X{i:03d}" for i in range(size)]
+                    before = stats["requests"]
+                    cold, output = await timed(user_async_functions.get_portfolio_summary(",".join(bulk_symbols), *dates))
+                    requests = stats["requests"] - before
+                    warm, _ = await timed(user_async_functions.get_portfolio_summary(",".join(bulk_symbols), *dates))
+
+                    sequential_symbols = [f"S{mode[0]}{size}X{i:03d}" for i in range(size)]
+                    if mode == "quotes":
+                        baseline = sequential_quotes(user_async_functions, sequential_symbols, stockdata_client.QUOTE_SYMBOL_LIMIT)
+                    else:
+                        baseline = sequential_history(user_async_functions, sequential_symbols, *dates)
+                    sequential, tool_calls = await timed(baseline)
+                    summary = json.loads(output)
+                    print(
+                        f"{mode:<8} symbols={size:<4} bulk cold={cold:.2f}s ({size / cold:.0f} symbols/s, {requests} requests) "
+                        f"warm={warm * 1000:.0f}ms output={len(output)}B missing={len(summary['meta']['missing'])} | "
+                        f"sequential={sequential:.2f}s over {tool_calls} tool calls"
+                    )
+        finally:
+            await stockdata_client.close_session()
+            await runner.cleanup()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk portfolio summary throughput against the stockdata mock")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 500], help="Portfolio sizes to run")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds per mock stockdata request")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Client-side requests per second, 0 for none")
+    parser.add_argument("--date-from", default="2024-05-01", help="First date of the history mode")
+    parser.add_argument("--date-to", default="2024-05-31", help="Last date of the history mode")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
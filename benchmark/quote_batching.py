@@ -0,0 +1,121 @@
+"""
+Quote batching benchmark: upstream calls saved and latency added at different arrival rates.
+
+Usage:
+    python -m benchmark.quote_batching --rates 5 20 100 400 --duration 5
+
+Sends single-symbol quote requests with Poisson arrivals against the local
+stockdata mock, once as one upstream call each and once through a
+`QuoteBatcher` with the configured window and symbol limit, and reports
+upstream calls and latency percentiles for both. Then checks that callers
+of a batch whose dispatch breaks or is cancelled get an error instead of
+waiting forever. Exits with status 1 if a check fails.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import stockdata_client
+from benchmark.load_driver import percentile
+from benchmark.mock_stockdata import start_mock_server
+from quote_batcher import QuoteBatcher
+from resilience import Upstream
+
+SYMBOLS = [f"Q{i:03d}" for i in range(100)]
+
+async def replay(args, rate, fetch):
+    """Send Poisson arrivals for args.duration seconds; return the latency of every request"""
+    rng = random.Random(rate)
+    latencies, tasks = [], []
+
+    async def request(symbol):
+        start = time.perf_counter()
+        status, _ = await fetch(symbol)
+        if status == 200:
+            latencies.append(time.perf_counter() - start)
+
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() < deadline:
+        tasks.append(asyncio.ensure_future(request(rng.choice(SYMBOLS))))
+        await asyncio.sleep(rng.expovariate(rate))
+    await asyncio.gather(*tasks)
+    return latencies
+
+async def measure(args, stats):
+    def upstream(symbols):
+        return stockdata_client.fetch_json("data/quote", {"symbols": symbols})
+
+    print(
+        f"window {args.window * 1000:.0f}ms, {args.max_symbols} symbols per upstream call, "
+        f"upstream latency {args.upstream_latency * 1000:.0f}ms, {args.duration:g}s per rate"
+    )
+    for rate in args.rates:
+        results = {}
+        for name in ("direct", "batched"):
+            fetch = upstream if name == "direct" else QuoteBatcher(upstream, args.window, args.max_symbols).fetch
+            before = stats["requests"]
+            latencies = await replay(args, rate, fetch)
+            results[name] = (len(latencies), stats["requests"] - before, latencies)
+        (requests, direct_calls, direct), (_, batched_calls, batched) = results["direct"], results["batched"]
+        print(
+            f"rate={rate:>5g}/s requests={requests:<5} upstream calls {direct_calls} -> {batched_calls} "
+            f"({(1 - batched_calls / max(direct_calls, 1)) * 100:.0f}% saved) | "
+            f"p50 {percentile(direct, 50) * 1000:.0f} -> {percentile(batched, 50) * 1000:.0f}ms "
+            f"p95 {percentile(direct, 95) * 1000:.0f} -> {percentile(batched, 95) * 1000:.0f}ms"
+        )
+
+async def check_failures():
+    """Callers of a broken or cancelled dispatch must fail fast"""
+    async def malformed(symbols):
+        # A 200 without a JSON object breaks the split of the merged response
+        return 200, None
+
+    async def stuck(symbols):
+        await asyncio.sleep(3600)
+
+    results = []
+    batcher = QuoteBatcher(malformed, window=0.01, max_symbols=3)
+    outcomes = await asyncio.wait_for(
+        asyncio.gather(batcher.fetch("AAA"), batcher.fetch("BBB"), return_exceptions=True), timeout=2
+    )
+    results.append(("broken dispatch fails its callers", all(isinstance(o, Exception) for o in outcomes),
+                    f"outcomes {[type(o).__name__ for o in outcomes]}, {len(batcher._dispatches)} dispatch(es) left"))
+
+    batcher = QuoteBatcher(stuck, window=0.01, max_symbols=3)
+    waiters = asyncio.gather(batcher.fetch("AAA"), batcher.fetch("BBB"), return_exceptions=True)
+    await asyncio.sleep(0.05)
+    for task in list(batcher._dispatches):
+        task.cancel()
+    outcomes = await asyncio.wait_for(waiters, timeout=2)
+    results.append(("cancelled dispatch fails its callers",
+                    all(isinstance(o, asyncio.CancelledError) for o in outcomes) and not batcher._dispatches,
+                    f"outcomes {[type(o).__name__ for o in outcomes]}, {len(batcher._dispatches)} dispatch(es) left"))
+    for name, passed, detail in results:
+        print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+    return all(passed for _, passed, _ in results)
+
+async def main(args):
+    runner, base_url, stats = await start_mock_server(latency=args.upstream_latency)
+    stockdata_client.STOCKDATA_BASE_URL = base_url
+    stockdata_client._upstream = Upstream("stockdata", rate=args.rate_limit, burst=stockdata_client.RATE_LIMIT_BURST)
+    try:
+        await measure(args, stats)
+        print()
+        return await check_failures()
+    finally:
+        await stockdata_client.close_session()
+        await runner.cleanup()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upstream calls and latency of batched versus direct quote requests")
+    parser.add_argument("--rates", type=float, nargs="+", default=[5, 20, 100, 400], help="Requests per second to replay")
+    parser.add_argument("--duration", type=float, default=5, help="Seconds of arrivals per rate and mode")
+    parser.add_argument("--window", type=float, default=stockdata_client.QUOTE_BATCH_WINDOW, help="Batching window in seconds")
+    parser.add_argument("--max-symbols", type=int, default=stockdata_client.QUOTE_SYMBOL_LIMIT, help="Symbols per upstream call")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds per mock stockdata request")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Client-side requests per second, 0 for none")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main(parse_args())) else 1)
@@ -0,0 +1,133 @@
+"""
+Fault-injection checks for the resilience layer.
+
+Usage:
+    python -m benchmark.resilience
+
+Runs the stockdata client against the local mock with injected errors,
+429 responses with Retry-After and a full outage, checks the token bucket
+and the agents retry rules, and prints PASS/FAIL per scenario. Exits with
+status 1 if any scenario fails.
+"""
+import asyncio
+import sys
+import time
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+import agents_api
+import stockdata_client
+from benchmark.mock_stockdata import start_mock_server
+from resilience import CircuitBreaker, CircuitOpenError, Upstream
+
+results = []
+
+def check(name, passed, detail):
+    results.append(passed)
+    print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+
+async def fetch_many(count, prefix):
+    """Fetch distinct quotes one after another; return (successes, failures)"""
+    ok = failed = 0
+    for i in range(count):
+        try:
+            status, _ = await stockdata_client.fetch_json("data/quote", {"symbols": f"{prefix}{i}"})
+            ok += status == 200
+            failed += status != 200
+        except Exception:
+            failed += 1
+    return ok, failed
+
+async def transient_errors(faults, stats):
+    faults.update(error_rate=0.3)
+    stockdata_client._upstream = Upstream("stockdata", breaker=CircuitBreaker("stockdata", failure_threshold=50))
+    ok, failed = await fetch_many(40, "T")
+    faults.update(error_rate=0.0)
+    # Three attempts at a 30% error rate fail about 3% of the time
+    check("transient 503s are retried", ok >= 36, f"{ok}/40 succeeded, {stats['errors']} injected errors")
+
+async def rate_limited(faults, stats):
+    faults.update(rate_limit_every=3, retry_after=1)
+    stockdata_client._upstream = Upstream("stockdata")
+    start = time.perf_counter()
+    ok, failed = await fetch_many(6, "R")
+    elapsed = time.perf_counter() - start
+    faults.update(rate_limit_every=0)
+    check(
+        "429 honors Retry-After", ok == 6 and elapsed >= stats["rate_limited"] * 0.9,
+        f"{ok}/6 succeeded after {stats['rate_limited']} 429(s) in {elapsed:.2f}s"
+    )
+
+async def outage(faults, stats):
+    breaker = CircuitBreaker("stockdata", failure_threshold=5, reset_timeout=1)
+    stockdata_client._upstream = Upstream("stockdata", breaker=breaker)
+    faults.update(down=True)
+    before = stats["errors"]
+    fast_failures, fast_latency = 0, 0.0
+    for i in range(10):
+        start = time.perf_counter()
+        try:
+            await stockdata_client.fetch_json("data/quote", {"symbols": f"O{i}"})
+        except CircuitOpenError:
+            fast_failures += 1
+            fast_latency = max(fast_latency, time.perf_counter() - start)
+    sent = stats["errors"] - before
+    check(
+        "circuit opens during an outage", breaker.state == "open" and sent <= 6 and fast_failures >= 7,
+        f"{sent} requests reached the upstream, {fast_failures} calls failed fast (max {fast_latency * 1000:.2f}ms)"
+    )
+    faults.update(down=False)
+    await asyncio.sleep(breaker.reset_timeout + 0.1)
+    status, _ = await stockdata_client.fetch_json("data/quote", {"symbols": "RECOVERED"})
+    check("circuit closes after recovery", status == 200 and breaker.state == "closed", f"probe returned {status}")
+
+async def token_bucket():
+    upstream = Upstream("bucket", rate=20, burst=5)
+
+    async def noop():
+        return None
+
+    start = time.perf_counter()
+    await asyncio.gather(*(upstream.call(noop) for _ in range(45)))
+    elapsed = time.perf_counter() - start
+    check("token bucket paces requests", 1.9 <= elapsed <= 2.5, f"45 calls at 20/s with burst 5 took {elapsed:.2f}s")
+
+async def agents_rules():
+    agents_api._upstream = Upstream("agents")
+    calls = {"read": 0, "create": 0}
+
+    async def flaky_read():
+        calls["read"] += 1
+        if calls["read"] < 3:
+            raise ServiceRequestError("connection reset")
+        return "ok"
+
+    async def lost_create():
+        calls["create"] += 1
+        raise ServiceResponseError("connection dropped after the request was sent")
+
+    result = await agents_api.call_agents("get_run", flaky_read)
+    try:
+        await agents_api.call_agents("create_message", lost_create, idempotent=False)
+    except ServiceResponseError:
+        pass
+    check(
+        "agents retries are safe", result == "ok" and calls["read"] == 3 and calls["create"] == 1,
+        f"read attempts={calls['read']}, non-idempotent attempts={calls['create']}"
+    )
+
+async def main():
+    runner, base_url, stats = await start_mock_server(latency=0.01)
+    stockdata_client.STOCKDATA_BASE_URL = base_url
+    faults = runner.app["faults"]
+    try:
+        await transient_errors(faults, stats)
+        await rate_limited(faults, stats)
+        await outage(faults, stats)
+        await token_bucket()
+        await agents_rules()
+    finally:
+        await stockdata_client.close_session()
+        await runner.cleanup()
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
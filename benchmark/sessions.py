@@ -0,0 +1,122 @@
+"""
+Session isolation check: many concurrent chats sharing one client and agent.
+
+Usage:
+    python -m benchmark.sessions --sessions 200 --turns 3
+
+Runs simulated chat sessions concurrently through `process_message` with the
+fake agents API. Checks that the process creates one client and one agent,
+that every session gets its own thread holding exactly its own messages,
+that ending sessions leaves the shared client usable for the others, and
+that the idle sweep drops only sessions Chainlit no longer knows while
+connected sessions keep their thread. Exits with status 1 if a check fails.
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from chainlit.session import ws_sessions_id
+from benchmark.fake_agents import FakeAgents, FakeCredential, FakeProjectClient
+from benchmark.load_driver import load_app, percentile
+
+# Tools are not under test here; every run answers without tool calls
+NO_TOOLS_SCRIPT = ([],)
+
+async def run_session(app, session_id, turns, latencies, answers):
+    for turn in range(turns):
+        start = time.perf_counter()
+        answers[session_id].append(await app.process_message(f"{session_id} turn {turn}", session_id))
+        latencies.append(time.perf_counter() - start)
+
+def user_messages(agents, thread_id):
+    return [m["content"][0]["text"]["value"] for m in agents.threads.get(thread_id, ()) if m["role"] == "user"]
+
+async def main(args):
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        agents = FakeAgents(script=NO_TOOLS_SCRIPT, latency=args.agent_latency, think_time=args.think_time)
+        clients = []
+
+        def from_connection_string(**kwargs):
+            clients.append(FakeProjectClient(agents))
+            return clients[-1]
+        app.AIProjectClient.from_connection_string = staticmethod(from_connection_string)
+        credential = app.TokenManager(FakeCredential(latency=0.01))
+        app.get_credential = lambda: credential
+        # Admission control is measured by benchmark.overload; let every session run at once here
+        app.app_state.admission = app.AdmissionController(max_inflight=0)
+
+        session_ids = [f"session-{i}" for i in range(args.sessions)]
+        answers = {sid: [] for sid in session_ids}
+        latencies = []
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(app, sid, args.turns, latencies, answers) for sid in session_ids))
+        elapsed = time.perf_counter() - start
+        threads = {sid: app.app_state.sessions[sid].thread.id for sid in session_ids}
+        mixed = [
+            sid for sid in session_ids
+            if user_messages(agents, threads[sid]) != [f"{sid} turn {t}" for t in reversed(range(args.turns))]
+        ]
+
+        # End half of the chats while the other half keeps talking
+        ended, remaining = session_ids[::2], session_ids[1::2]
+        await asyncio.gather(
+            *(app.cleanup_session(sid) for sid in ended),
+            *(run_session(app, sid, 1, latencies, answers) for sid in remaining),
+        )
+        after_end_ok = all(answers[sid][-1].startswith("Answer") for sid in remaining) and not any(
+            sid in app.app_state.sessions for sid in ended
+        )
+
+        # Idle sweep: the remaining chats are idle; half of them are still connected to Chainlit
+        connected, orphaned = remaining[::2], remaining[1::2]
+        for sid in connected:
+            ws_sessions_id[sid] = object()
+        app.SESSION_IDLE_TIMEOUT = 0
+        app.app_state.last_sweep = float("-inf")
+        try:
+            # A new session's first message triggers the sweep
+            answers["session-late"] = []
+            await run_session(app, "session-late", 1, latencies, answers)
+            evicted = [sid for sid in remaining if sid not in app.app_state.sessions]
+            await asyncio.gather(*(run_session(app, sid, 1, latencies, answers) for sid in connected))
+            kept_threads = [sid for sid in connected if app.app_state.sessions[sid].thread.id == threads[sid]]
+        finally:
+            for sid in connected:
+                ws_sessions_id.pop(sid, None)
+        await app.close_client()
+
+    print(
+        f"sessions={args.sessions} turns/session={args.turns} elapsed={elapsed:.2f}s "
+        f"throughput={args.sessions * args.turns / elapsed:.1f} turns/s "
+        f"p50={percentile(latencies, 50):.3f}s p95={percentile(latencies, 95):.3f}s"
+    )
+    results = [
+        ("one client and one agent", len(clients) == 1 and agents.calls.get("create_agent") == 1,
+         f"{len(clients)} client(s), {agents.calls.get('create_agent', 0)} create_agent call(s)"),
+        ("every turn answered", all(a.startswith("Answer") for sid in session_ids for a in answers[sid][:args.turns]),
+         f"{sum(a.startswith('Answer') for sid in session_ids for a in answers[sid][:args.turns])}/{args.sessions * args.turns}"),
+        ("one thread per session", len(set(threads.values())) == args.sessions,
+         f"{len(set(threads.values()))} distinct threads for {args.sessions} sessions"),
+        ("threads hold only their session's messages", not mixed, f"mixed sessions: {mixed[:5]}"),
+        ("ending sessions leaves the others running", after_end_ok, f"{len(ended)} ended, {len(remaining)} kept talking"),
+        ("idle sweep evicts only disconnected sessions", sorted(evicted) == sorted(orphaned),
+         f"evicted {len(evicted)}, expected {len(orphaned)}"),
+        ("connected idle sessions keep their thread", len(kept_threads) == len(connected),
+         f"{len(kept_threads)}/{len(connected)} continued on the same thread"),
+    ]
+    for name, passed, detail in results:
+        print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+    return all(passed for _, passed, _ in results)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent session isolation and idle eviction check")
+    parser.add_argument("--sessions", type=int, default=200, help="Concurrent simulated chat sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Messages sent by each session, one after another")
+    parser.add_argument("--agent-latency", type=float, default=0.02, help="Seconds per fake agents API call")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Seconds the fake model takes per run")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main(parse_args())) else 1)
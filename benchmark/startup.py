@@ -0,0 +1,93 @@
+"""
+Startup benchmark: import time and first-message latency.
+
+Usage:
+    python -m benchmark.startup
+
+Reports how long importing the tools and the app takes in a fresh interpreter,
+whether pandas/matplotlib were pulled in, and the latency of the first chat
+message with and without warm initialization at process start.
+"""
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from benchmark.load_driver import ROOT, load_app
+
+IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "pandas": "pandas" in sys.modules, "matplotlib": "matplotlib" in sys.modules}}))
+"""
+FIRST_TURN_SCRIPT = ([[("get_quote", {"symbols": "{symbol}"})]],)
+
+def measure_import(module):
+    """Import a module in a fresh interpreter and return its probe result"""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_PROBE.format(module=module)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+async def first_message(workdir, warm, args):
+    """Return (seconds until the session is ready, seconds until the first reply) for a new app instance"""
+    from benchmark.fake_agents import FakeAgents, FakeCredential, FakeProjectClient
+
+    app = load_app(workdir)
+    agents = FakeAgents(script=FIRST_TURN_SCRIPT, latency=args.agent_latency, think_time=args.think_time)
+    credential = app.TokenManager(FakeCredential(latency=args.token_latency))
+    app.AIProjectClient.from_connection_string = staticmethod(lambda **kwargs: FakeProjectClient(agents))
+    app.get_credential = lambda: credential
+
+    if warm:
+        # What on_app_startup does before any user connects
+        await app.initialize()
+        await asyncio.sleep(args.agent_latency * 2)
+
+    start = time.perf_counter()
+    await app.get_session_state("first")
+    ready = time.perf_counter() - start
+    await app.process_message("What is the price of AAPL?", "first")
+    reply = time.perf_counter() - start
+    await app.close_client()
+    return ready, reply
+
+async def main(args):
+    for module in ("user_async_functions", "tool_output"):
+        probe = measure_import(module)
+        print(
+            f"import {module}: {probe['seconds'] * 1000:.0f}ms "
+            f"(pandas loaded={probe['pandas']}, matplotlib loaded={probe['matplotlib']})"
+        )
+
+    from benchmark.mock_stockdata import start_mock_server
+    with tempfile.TemporaryDirectory() as workdir:
+        start = time.perf_counter()
+        load_app(workdir)
+        print(f"load async-app.py (including chainlit): {(time.perf_counter() - start) * 1000:.0f}ms")
+
+        import stockdata_client
+        runner, base_url, _ = await start_mock_server(latency=args.upstream_latency)
+        stockdata_client.STOCKDATA_BASE_URL = base_url
+        for warm in (False, True):
+            ready, reply = await first_message(workdir, warm, args)
+            label = "warm" if warm else "cold"
+            print(f"first message ({label} start): session ready {ready * 1000:.0f}ms, reply {reply * 1000:.0f}ms")
+        await stockdata_client.close_session()
+        await runner.cleanup()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Startup benchmark for the Nasdaq Stock Assistant")
+    parser.add_argument("--agent-latency", type=float, default=0.05, help="Seconds per fake agents API call")
+    parser.add_argument("--think-time", type=float, default=0.3, help="Seconds the fake model takes per step")
+    parser.add_argument("--token-latency", type=float, default=0.2, help="Seconds the fake credential takes per token")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds per mock stockdata request")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,109 @@
+"""
+Streaming benchmark: time to first token and time to completion, streamed versus polled runs.
+
+Usage:
+    python -m benchmark.streaming --sessions 20 --turns 3
+
+Runs the same scripted turns (tool-call steps, then a word-by-word answer)
+through `process_message` with the fake agents API, once polling the run
+with back-off and once consuming its event stream. The fake writes a short
+note before each tool-call step, so streamed turns span several messages.
+Reports time to first token and to completion, and agents API calls per
+turn, and checks that the streamed tokens add up to the final answer with
+the messages kept apart. Exits with status 1 if a check fails.
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from benchmark.fake_agents import FakeAgents, FakeCredential, FakeProjectClient
+from benchmark.load_driver import SYMBOLS, load_app, percentile
+
+async def run_session(app, session_id, turns, results):
+    for turn in range(turns):
+        tokens, first_token = [], None
+        start = time.perf_counter()
+
+        async def on_token(token):
+            nonlocal first_token
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            tokens.append(token)
+        response = await app.process_message(f"Turn {turn}", session_id, on_token=on_token)
+        completion = time.perf_counter() - start
+        # Without streaming the whole answer arrives at once
+        results.append((first_token if first_token is not None else completion, completion, response, "".join(tokens)))
+
+async def measure(args, app, agents, streaming):
+    app.STREAMING_ENABLED = streaming
+    calls_before = sum(agents.calls.values())
+    results = []
+    await asyncio.gather(*(
+        run_session(app, f"{'stream' if streaming else 'poll'}-{i}", args.turns, results) for i in range(args.sessions)
+    ))
+    first_tokens = [first for first, _, _, _ in results]
+    completions = [completion for _, completion, _, _ in results]
+    print(
+        f"{'streaming' if streaming else 'polling':<9} first token p50={percentile(first_tokens, 50) * 1000:.0f}ms "
+        f"p95={percentile(first_tokens, 95) * 1000:.0f}ms | completion p50={percentile(completions, 50) * 1000:.0f}ms "
+        f"p95={percentile(completions, 95) * 1000:.0f}ms | agents API calls/turn={(sum(agents.calls.values()) - calls_before) / len(results):.1f}"
+    )
+    return results
+
+async def main(args):
+    from benchmark.mock_stockdata import start_mock_server
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = load_app(workdir)
+        import stockdata_client
+
+        runner, base_url, _ = await start_mock_server(latency=args.upstream_latency)
+        stockdata_client.STOCKDATA_BASE_URL = base_url
+        agents = FakeAgents(
+            latency=args.agent_latency, think_time=args.think_time, symbols=SYMBOLS,
+            token_interval=args.token_interval, narrate=True,
+        )
+        app.AIProjectClient.from_connection_string = staticmethod(lambda **kwargs: FakeProjectClient(agents))
+        credential = app.TokenManager(FakeCredential(latency=0.01))
+        app.get_credential = lambda: credential
+        print(
+            f"sessions={args.sessions} turns/session={args.turns} agent latency {args.agent_latency * 1000:.0f}ms, "
+            f"think time {args.think_time * 1000:.0f}ms, {args.token_interval * 1000:.0f}ms per token"
+        )
+        try:
+            polled = await measure(args, app, agents, streaming=False)
+            streamed = await measure(args, app, agents, streaming=True)
+        finally:
+            await app.close_client()
+            await stockdata_client.close_session()
+            await runner.cleanup()
+
+    separator = app.STREAM_MESSAGE_SEPARATOR
+    checks = [
+        ("every turn answered", all(response.startswith("Answer") for _, _, response, _ in polled)
+         and all("Answer for" in response for _, _, response, _ in streamed),
+         f"{len(polled)} polled and {len(streamed)} streamed turns"),
+        ("streamed tokens match the answer", all(tokens == response for _, _, response, tokens in streamed),
+         f"{sum(tokens != response for _, _, response, tokens in streamed)} mismatched turn(s)"),
+        ("messages of a run kept apart", all(f".{separator}Let me" in response or f".{separator}Answer" in response
+                                             for _, _, response, _ in streamed if response.startswith("Let me")),
+         f"sample: {streamed[0][2][:80]!r}"),
+        ("tool outputs matched the requested calls", agents.errors == 0, f"{agents.errors} mismatch(es)"),
+    ]
+    for name, passed, detail in checks:
+        print(f"{'PASS' if passed else 'FAIL'} {name}: {detail}")
+    return all(passed for _, passed, _ in checks)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time to first token and completion, streamed versus polled runs")
+    parser.add_argument("--sessions", type=int, default=20, help="Concurrent simulated chat sessions")
+    parser.add_argument("--turns", type=int, default=3, help="Messages sent by each session, one after another")
+    parser.add_argument("--agent-latency", type=float, default=0.05, help="Seconds per fake agents API call")
+    parser.add_argument("--think-time", type=float, default=0.3, help="Seconds the fake model takes per step")
+    parser.add_argument("--token-interval", type=float, default=0.02, help="Seconds between streamed text deltas")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="Seconds per mock stockdata request")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main(parse_args())) else 1)
@@ -0,0 +1,285 @@
+"""
+Off-loop chart rendering for the plotting tools.
+
+Charts are rendered on a bounded thread pool with matplotlib's object-oriented
+Figure/Agg API (no pyplot global state), and rendered images are cached by a
+hash of their input so identical series are not rendered twice.
+
+`CHART_FORMAT` selects the encoding: plain PNG, a 256-color palette PNG
+(`png8`, the default, a fraction of the size for line charts) or WebP.
+`CHART_PRESET` selects the figure size and DPI.
+"""
+import asyncio
+import hashlib
+import io
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from PIL import Image
+from metrics import measure
+from shared_logging import logger
+
+# Constants
+CHART_RENDER_WORKERS = int(os.environ.get("CHART_RENDER_WORKERS", 2))  # Threads rendering charts
+CHART_MAX_PENDING = int(os.environ.get("CHART_MAX_PENDING", 16))  # Render jobs queued or running before rejecting
+CHART_CACHE_SIZE = int(os.environ.get("CHART_CACHE_SIZE", 128))  # Rendered images kept in memory
+CHART_FORMAT = os.environ.get("CHART_FORMAT", "png8")  # png, png8 or webp
+CHART_PRESET = os.environ.get("CHART_PRESET", "standard")  # compact, standard or hires
+CHART_PRESETS = {  # name -> (figure size in inches, DPI)
+    "compact": ((8, 4.8), 80),
+    "standard": ((10, 6), 100),
+    "hires": ((10, 6), 150),
+}
+WEBP_QUALITY = 90  # Lossy WebP quality; lower values blur thin lines
+MIME_TYPES = {"png": "image/png", "png8": "image/png", "webp": "image/webp"}
+MAX_CHART_POINTS = 500  # Points per series kept by LTTB downsampling
+RESAMPLE_RULES = {"weekly": "W", "monthly": "MS"}  # Supported OHLC resampling periods
+OHLCV_AGGREGATION = {"open": "first", "high": "max", "low": "min", "close": "last", "volume": "sum"}
+
+_executor = None
+_pending = 0
+_image_cache = OrderedDict()  # content hash -> rendered output
+
+class ChartQueueFullError(RuntimeError):
+    """Raised when too many render jobs are already pending"""
+
+def get_executor() -> ThreadPoolExecutor:
+    """Get the shared render pool, creating it on first use"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=CHART_RENDER_WORKERS, thread_name_prefix="chart-render")
+    return _executor
+
+def _series_frame(records) -> pd.DataFrame:
+    """Build a date-indexed numeric frame, flattening nested rows such as EOD bars"""
+    df = pd.json_normalize(records)
+    df['date'] = pd.to_datetime(df['date'])
+    df = df.set_index('date').sort_index()
+    # EOD bars arrive as {"date": ..., "data": {"open": ...}}
+    df.columns = [column.split('.')[-1] for column in df.columns]
+    return df.select_dtypes('number')
+
+def _plot_image(df, title=None, chart_format="png", preset="standard") -> bytes:
+    # Each render owns its figure, so no global pyplot state is shared between threads
+    figsize, dpi = CHART_PRESETS[preset]
+    fig = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    for column in df.columns:
+        ax.plot(df.index, df[column], label=column)
+    if len(df.columns):
+        ax.legend()
+    if title:
+        ax.set_title(title)
+    fig.autofmt_xdate()
+    return _encode(fig, canvas, chart_format)
+
+def _encode(fig, canvas, chart_format) -> bytes:
+    img_buf = io.BytesIO()
+    if chart_format == "png":
+        fig.savefig(img_buf, format='png')
+    elif chart_format == "png8":
+        # Line charts use a handful of colors, so a palette loses nothing visible
+        canvas.draw()
+        image = Image.frombuffer("RGBA", canvas.get_width_height(), canvas.buffer_rgba()).convert("RGB")
+        # Octree quantization is fast enough to cost less than it saves; optimize=True doubles the time for ~5%
+        image.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(img_buf, format="PNG")
+    elif chart_format == "webp":
+        # Lossless WebP is larger than PNG for antialiased lines, so use high-quality lossy
+        fig.savefig(img_buf, format='webp', pil_kwargs={"quality": WEBP_QUALITY})
+    else:
+        raise ValueError(f"Unsupported chart format: {chart_format}")
+    return img_buf.getvalue()
+
+def lttb_indices(y, threshold) -> np.ndarray:
+    """
+    Select the indices kept by Largest-Triangle-Three-Buckets downsampling.
+
+    Args:
+        y: Values of the series, evenly treated along the x axis
+        threshold: Number of points to keep
+
+    Returns:
+        np.ndarray: Sorted indices of the points to keep
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    x = np.arange(n, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # Average of the next bucket is the third vertex of the triangle
+        avg_x = x[end:next_end].mean() if next_end > end else x[-1]
+        avg_y = y[end:next_end].mean() if next_end > end else y[-1]
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+def downsample(df, resample=None, max_points=MAX_CHART_POINTS) -> pd.DataFrame:
+    """
+    Reduce a daily OHLCV frame for charting.
+
+    Args:
+        df: Date-indexed frame of daily values
+        resample: "weekly" or "monthly" to aggregate OHLC bars, or None
+        max_points: Points kept by LTTB when the frame is still larger
+
+    Returns:
+        pd.DataFrame: The reduced frame
+    """
+    if resample:
+        rule = RESAMPLE_RULES[resample]
+        aggregation = {column: OHLCV_AGGREGATION.get(column, "last") for column in df.columns}
+        df = df.resample(rule).agg(aggregation).dropna(how="all")
+    if len(df) > max_points and len(df.columns):
+        df = df.iloc[lttb_indices(df.iloc[:, 0].to_numpy(), max_points)]
+    return df
+
+def render_time_series_image(records, chart_format="png", preset="standard") -> bytes:
+    """
+    Render a time series to encoded image bytes. Runs in a worker thread.
+
+    Args:
+        records: List of rows with a `date` field and numeric values, possibly nested
+        chart_format: "png", "png8" or "webp"
+        preset: Size/DPI preset name from CHART_PRESETS
+
+    Returns:
+        bytes: The encoded image
+    """
+    return _plot_image(_series_frame(records), chart_format=chart_format, preset=preset)
+
+def render_eod_chart_image(records, symbol, fields, resample=None, chart_format="png", preset="standard"):
+    """
+    Downsample EOD bars, render the selected fields and summarize them. Runs in a worker thread.
+
+    Args:
+        records: EOD rows as returned by the data/eod endpoint
+        symbol: Ticker shown in the title and summary
+        fields: OHLCV field names to plot
+        resample: "weekly" or "monthly" to aggregate bars, or None
+        chart_format: "png", "png8" or "webp"
+        preset: Size/DPI preset name from CHART_PRESETS
+
+    Returns:
+        tuple: (encoded image bytes, compact summary dict)
+    """
+    daily = _series_frame(records)
+    missing = [field for field in fields if field not in daily.columns]
+    if missing:
+        raise ValueError(f"Unknown field(s) for {symbol}: {', '.join(missing)}")
+    daily = daily[fields]
+    plotted = downsample(daily, resample)
+    image = _plot_image(plotted, title=symbol, chart_format=chart_format, preset=preset)
+
+    summary = {
+        "symbol": symbol,
+        "date_from": daily.index[0].date().isoformat() if len(daily) else None,
+        "date_to": daily.index[-1].date().isoformat() if len(daily) else None,
+        "bars": len(daily),
+        "points_plotted": len(plotted),
+        "fields": {},
+    }
+    for field in fields:
+        series = daily[field].dropna()
+        if series.empty:
+            continue
+        first, last = float(series.iloc[0]), float(series.iloc[-1])
+        summary["fields"][field] = {
+            "first": round(first, 4),
+            "last": round(last, 4),
+            "min": round(float(series.min()), 4),
+            "max": round(float(series.max()), 4),
+            "change_pct": round((last - first) / first * 100, 2) if first else None,
+        }
+    return image, summary
+
+async def _render(key, func, *args):
+    """Run a render function on the pool, sharing the content-hash cache and pending cap"""
+    global _pending
+    cached = _image_cache.get(key)
+    if cached is not None:
+        _image_cache.move_to_end(key)
+        logger.debug(f"Chart cache hit for {key[:12]}")
+        return cached
+
+    if _pending >= CHART_MAX_PENDING:
+        raise ChartQueueFullError(f"Too many charts are being rendered ({_pending} pending), please retry shortly")
+
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        with measure(f"chart_render.{func.__name__}"):
+            result = await loop.run_in_executor(get_executor(), func, *args)
+    finally:
+        _pending -= 1
+
+    _image_cache[key] = result
+    while len(_image_cache) > CHART_CACHE_SIZE:
+        _image_cache.popitem(last=False)
+    return result
+
+def _content_hash(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+async def render_time_series(records):
+    """
+    Render a time series off the event loop, reusing a cached image for identical input.
+
+    Args:
+        records: List of rows with a `date` field and numeric values
+
+    Returns:
+        tuple: (encoded image bytes, MIME type)
+
+    Raises:
+        ChartQueueFullError: If CHART_MAX_PENDING render jobs are already pending
+    """
+    chart_format, preset = CHART_FORMAT, CHART_PRESET
+    key = _content_hash("series", records, chart_format, preset)
+    image = await _render(key, render_time_series_image, records, chart_format, preset)
+    return image, MIME_TYPES[chart_format]
+
+async def render_eod_chart(records, symbol, fields, resample=None):
+    """
+    Downsample and render EOD bars off the event loop, reusing cached output for identical input.
+
+    Args:
+        records: EOD rows as returned by the data/eod endpoint
+        symbol: Ticker shown in the title and summary
+        fields: OHLCV field names to plot
+        resample: "weekly" or "monthly" to aggregate bars, or None
+
+    Returns:
+        tuple: (encoded image bytes, MIME type, compact summary dict)
+
+    Raises:
+        ChartQueueFullError: If CHART_MAX_PENDING render jobs are already pending
+    """
+    chart_format, preset = CHART_FORMAT, CHART_PRESET
+    key = _content_hash("eod", records, symbol, fields, resample, chart_format, preset)
+    image, summary = await _render(key, render_eod_chart_image, records, symbol, fields, resample, chart_format, preset)
+    return image, MIME_TYPES[chart_format], summary
+
+def shutdown_renderer():
+    """Stop the render pool without waiting for queued jobs"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        logger.info("Chart render pool shut down")
@@ -0,0 +1,117 @@
+"""
+Bounded store for rendered chart images.
+
+The plotting tools put the encoded image here and return only its
+reference id to the agent; the Chainlit handler looks the id up and
+attaches the image to the reply. Images are kept in memory, or on disk
+under `CHART_STORE_DIR`, and the least recently used ones are dropped once
+`CHART_STORE_MAX_BYTES` is exceeded. The index lives in the process, so each
+worker process needs its own directory: eviction in one worker would delete
+images another worker still lists.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from shared_logging import logger
+
+# Constants
+CHART_STORE_MAX_BYTES = int(os.environ.get("CHART_STORE_MAX_BYTES", 64 * 1024 * 1024))  # Image bytes kept before evicting
+CHART_STORE_DIR = os.environ.get("CHART_STORE_DIR")  # Keep images on disk instead of in memory, unset for memory; not shared between workers
+CHART_ID_PREFIX = "chart_"
+MIME_EXTENSIONS = {"image/png": "png", "image/webp": "webp"}
+
+class ChartStore:
+    """LRU blob store of chart images keyed by a hash of their content"""
+
+    def __init__(self, max_bytes=CHART_STORE_MAX_BYTES, directory=CHART_STORE_DIR):
+        """
+        Args:
+            max_bytes: Total image bytes kept before the least recently used image is dropped
+            directory: Directory to write images to, or None to keep them in memory
+        """
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.size = 0
+        self._entries = OrderedDict()  # chart id -> (mime type, byte count, image bytes or None on disk)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, chart_id):
+        return os.path.join(self.directory, chart_id)
+
+    def _write(self, chart_id, data):
+        tmp_path = f"{self._path(chart_id)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(chart_id))
+
+    def _read(self, chart_id):
+        with open(self._path(chart_id), "rb") as f:
+            return f.read()
+
+    async def put(self, data, mime_type) -> str:
+        """Store an image and return its reference id; identical images share one id"""
+        chart_id = CHART_ID_PREFIX + hashlib.sha256(data).hexdigest()[:16]
+        if chart_id in self._entries:
+            self._entries.move_to_end(chart_id)
+            return chart_id
+        if self.directory:
+            await asyncio.get_running_loop().run_in_executor(None, self._write, chart_id, data)
+        self._entries[chart_id] = (mime_type, len(data), None if self.directory else data)
+        self.size += len(data)
+        self._evict()
+        return chart_id
+
+    async def get(self, chart_id):
+        """
+        Look up an image by reference id.
+
+        Returns:
+            tuple: (image bytes, MIME type), or None if the id is unknown or was evicted
+        """
+        entry = self._entries.get(chart_id)
+        if entry is None:
+            return None
+        self._entries.move_to_end(chart_id)
+        mime_type, _, data = entry
+        if data is None:
+            try:
+                data = await asyncio.get_running_loop().run_in_executor(None, self._read, chart_id)
+            except OSError as e:
+                logger.warning(f"Could not read chart {chart_id}: {e}")
+                return None
+        return data, mime_type
+
+    def _evict(self):
+        # Always keep the newest image, even if it alone exceeds the budget
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            chart_id, (_, size, _) = self._entries.popitem(last=False)
+            self.size -= size
+            if self.directory:
+                try:
+                    os.remove(self._path(chart_id))
+                except OSError:
+                    pass
+
+def chart_ids(output):
+    """Return the chart reference ids contained in a tool output string"""
+    if not isinstance(output, str) or f'"{CHART_ID_PREFIX}' not in output:
+        return []
+    try:
+        payload = json.loads(output)
+    except ValueError:
+        return []
+    chart_id = payload.get("chart_id") if isinstance(payload, dict) else None
+    return [chart_id] if chart_id else []
+
+def file_name(chart_id, mime_type):
+    """File name shown for an attached chart"""
+    return f"{chart_id}.{MIME_EXTENSIONS.get(mime_type, 'bin')}"
+
+_store = ChartStore()
+
+def get_chart_store() -> ChartStore:
+    """Return the process-wide chart store"""
+    return _store
@@ -0,0 +1,219 @@
+"""
+Local columnar store of daily EOD bars with incremental updates.
+
+Each symbol is stored as one NumPy array per field under EOD_STORE_DIR/<SYMBOL>/
+and read back memory-mapped. After the first download only the days missing
+since the last stored date are fetched, and date-range slices are answered
+from disk without any network call. Worker processes sharing the store
+hold a per-symbol file lock around every read-fetch-merge-write.
+"""
+import asyncio
+import datetime
+import json
+import os
+import re
+from contextlib import asynccontextmanager
+from pathlib import Path
+import numpy as np
+from filelock import FileLock
+from file_locks import hold_file_lock
+from shared_logging import logger
+from stockdata_client import fetch_json, last_market_close_date, normalize_symbols
+
+# Constants
+EOD_STORE_DIR = Path(os.environ.get("EOD_STORE_DIR", "./data/eod"))  # Root directory of the store
+EOD_FIELDS = ("open", "high", "low", "close", "volume")
+META_FILE = "meta.json"
+LOCK_FILE = ".lock"
+SYMBOL_PATTERN = re.compile(r"[A-Z0-9][A-Z0-9.\-]{0,9}")  # One ticker, safe to use as a directory name
+
+class EodStore:
+    """
+    On-disk store of daily bars, one directory per symbol and one .npy file per field.
+
+    Dates are stored as datetime64[D] and kept sorted, so range slicing is two binary searches.
+    """
+
+    def __init__(self, root=EOD_STORE_DIR):
+        self.root = Path(root)
+        self._locks = {}  # symbol -> (asyncio.Lock, FileLock)
+
+    def _symbol_dir(self, symbol) -> Path:
+        # Symbols come from tool arguments; never let one name a path outside the store
+        if not SYMBOL_PATTERN.fullmatch(symbol):
+            raise ValueError(f"Invalid symbol: {symbol!r}")
+        symbol_dir = self.root / symbol
+        if not symbol_dir.resolve().is_relative_to(self.root.resolve()):
+            raise ValueError(f"Invalid symbol: {symbol!r}")
+        return symbol_dir
+
+    @asynccontextmanager
+    async def lock(self, symbol):
+        """Serialize access to a symbol within this process and across worker processes"""
+        if symbol not in self._locks:
+            symbol_dir = self._symbol_dir(symbol)
+            symbol_dir.mkdir(parents=True, exist_ok=True)
+            self._locks[symbol] = (asyncio.Lock(), FileLock(str(symbol_dir / LOCK_FILE)))
+        task_lock, file_lock = self._locks[symbol]
+        # Take the asyncio lock first: FileLock is re-entrant within the event loop thread
+        async with task_lock:
+            async with hold_file_lock(file_lock):
+                yield
+
+    def load_meta(self, symbol) -> dict:
+        """Return bookkeeping for a symbol: the earliest date requested and the last close checked"""
+        try:
+            with open(self._symbol_dir(symbol) / META_FILE) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def read(self, symbol, date_from=None, date_to=None) -> dict:
+        """
+        Read the stored bars of a symbol, optionally sliced by date.
+
+        Args:
+            symbol: Normalized ticker
+            date_from: First date to include (datetime.date or None)
+            date_to: Last date to include (datetime.date or None)
+
+        Returns:
+            dict: Field name -> array, including "date"; empty if nothing is stored
+        """
+        symbol_dir = self._symbol_dir(symbol)
+        if not (symbol_dir / "date.npy").exists():
+            return {}
+        dates = np.load(symbol_dir / "date.npy", mmap_mode="r")
+        start = np.searchsorted(dates, np.datetime64(date_from, "D"), side="left") if date_from else 0
+        end = np.searchsorted(dates, np.datetime64(date_to, "D"), side="right") if date_to else len(dates)
+        columns = {"date": np.array(dates[start:end])}
+        for field in EOD_FIELDS:
+            values = np.load(symbol_dir / f"{field}.npy", mmap_mode="r")
+            columns[field] = np.array(values[start:end])
+        return columns
+
+    def merge(self, symbol, records, meta) -> int:
+        """
+        Merge downloaded EOD rows into the store and update the symbol's bookkeeping.
+
+        Args:
+            symbol: Normalized ticker
+            records: Rows as returned by the data/eod endpoint
+            meta: Bookkeeping to persist alongside the arrays
+
+        Returns:
+            int: Number of new dates added
+        """
+        symbol_dir = self._symbol_dir(symbol)
+        symbol_dir.mkdir(parents=True, exist_ok=True)
+        existing = self.read(symbol)
+        old_count = len(existing.get("date", ()))
+
+        new_dates = np.array([row["date"][:10] for row in records], dtype="datetime64[D]")
+        new_columns = {
+            field: np.array([_bar_value(row, field) for row in records], dtype=float)
+            for field in EOD_FIELDS
+        }
+        if existing:
+            dates = np.concatenate([existing["date"], new_dates])
+            columns = {field: np.concatenate([existing[field], new_columns[field]]) for field in EOD_FIELDS}
+        else:
+            dates, columns = new_dates, new_columns
+
+        # Sort by date and keep the newest download of a duplicated date
+        dates, first = np.unique(dates[::-1], return_index=True)
+        keep = len(columns["close"]) - 1 - first
+
+        self._write_array(symbol_dir / "date.npy", dates)
+        for field in EOD_FIELDS:
+            self._write_array(symbol_dir / f"{field}.npy", columns[field][keep])
+        self._write_meta(symbol_dir, meta)
+        return len(dates) - old_count
+
+    @staticmethod
+    def _write_array(path, array):
+        # Write to a temporary file and swap it in so readers never see a partial array
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, array)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _write_meta(symbol_dir, meta):
+        tmp_path = symbol_dir / f"{META_FILE}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, symbol_dir / META_FILE)
+
+def _bar_value(row, field):
+    # EOD rows nest prices under "data"; missing values are stored as NaN
+    value = row.get("data", row).get(field)
+    return np.nan if value is None else float(value)
+
+_store = EodStore()
+
+async def get_eod_bars(symbol, date_from=None, date_to=None) -> dict:
+    """
+    Return daily bars for a symbol, downloading only what the local store is missing.
+
+    Args:
+        symbol: One ticker
+        date_from: Optional first date to include, formatted as YYYY-MM-DD
+        date_to: Optional last date to include, formatted as YYYY-MM-DD
+
+    Returns:
+        dict: Field name -> array, including "date"; empty if no data is available
+
+    Raises:
+        ValueError: If symbol is not a single valid ticker
+    """
+    symbol = normalize_symbols(symbol)
+    start = datetime.date.fromisoformat(date_from) if date_from else None
+    end = datetime.date.fromisoformat(date_to) if date_to else None
+    loop = asyncio.get_running_loop()
+
+    async with _store.lock(symbol):
+        meta = await loop.run_in_executor(None, _store.load_meta, symbol)
+        last_close = last_market_close_date()
+        fetches = []
+        if not meta:
+            # Cold symbol: download the requested range (or the API default) once
+            fetches.append({"date_from": date_from} if date_from else {})
+        else:
+            if start and start < datetime.date.fromisoformat(meta["first_requested"]):
+                # Backfill older history that was never requested before
+                before = datetime.date.fromisoformat(meta["first_requested"]) - datetime.timedelta(days=1)
+                fetches.append({"date_from": date_from, "date_to": before.isoformat()})
+            checked = datetime.date.fromisoformat(meta["checked_through"])
+            if checked < last_close and (end is None or end > checked):
+                # Only the days since the last stored close are missing
+                fetches.append({"date_from": (checked + datetime.timedelta(days=1)).isoformat()})
+
+        for params in fetches:
+            status, response_json = await fetch_json("data/eod", {"symbols": symbol, **params})
+            if status != 200:
+                raise RuntimeError(response_json.get("error", f"HTTP {status}"))
+            records = response_json.get("data", [])
+            first_requested = params.get("date_from") or (min(r["date"][:10] for r in records) if records else last_close.isoformat())
+            if meta:
+                first_requested = min(first_requested, meta["first_requested"])
+            meta = {"first_requested": first_requested, "checked_through": last_close.isoformat()}
+            added = await loop.run_in_executor(None, _store.merge, symbol, records, meta)
+            logger.debug(f"EOD store: added {added} bar(s) for {symbol} with {params or 'default range'}")
+
+        if not fetches:
+            logger.debug(f"EOD store: served {symbol} from disk")
+        return await loop.run_in_executor(None, _store.read, symbol, start, end)
+
+def bars_to_records(symbol, columns) -> list:
+    """Convert stored columns back to the row layout of the data/eod endpoint, newest first"""
+    records = []
+    for i in range(len(columns.get("date", ())) - 1, -1, -1):
+        records.append({
+            "date": str(columns["date"][i]),
+            "ticker": symbol,
+            "data": {
+                field: (None if np.isnan(columns[field][i]) else float(columns[field][i]))
+                for field in EOD_FIELDS
+            },
+        })
+    return records
@@ -0,0 +1,48 @@
+"""
+Cross-process file locks usable from the event loop, and helpers for files shared by worker processes.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from filelock import Timeout
+
+# Constants
+LOCK_POLL_INTERVAL = 0.05  # Seconds between attempts to take a file lock
+LOCK_TIMEOUT = 60  # Seconds to wait for another process holding the lock
+
+@asynccontextmanager
+async def hold_file_lock(lock, timeout=LOCK_TIMEOUT):
+    """
+    Hold a filelock.FileLock without blocking the event loop.
+
+    FileLock is re-entrant within a thread, so callers in one process must
+    already be serialized, e.g. by an asyncio.Lock for the same resource.
+
+    Raises:
+        TimeoutError: Another process held the lock for longer than timeout
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        try:
+            lock.acquire(timeout=0)
+            break
+        except Timeout:
+            if loop.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock.lock_file}")
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        lock.release()
+
+def pid_alive(pid) -> bool:
+    """Whether a process with this pid still exists"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists but belongs to another user
+        return True
+    return True
@@ -0,0 +1,112 @@
+"""
+Vectorized technical indicators over daily close prices.
+
+Every function takes a date-indexed DataFrame with one column per symbol, so
+a whole batch of symbols is computed in one pandas operation.
+"""
+import numpy as np
+import pandas as pd
+
+# Constants
+TRADING_DAYS_PER_YEAR = 252
+RSI_PERIOD = 14
+MACD_FAST, MACD_SLOW, MACD_SIGNAL = 12, 26, 9
+BOLLINGER_STD = 2
+SUPPORTED_INDICATORS = ("sma", "ema", "rsi", "macd", "bollinger", "volatility", "drawdown")
+
+def sma(close, window) -> pd.DataFrame:
+    """Simple moving average"""
+    return close.rolling(window).mean()
+
+def ema(close, window) -> pd.DataFrame:
+    """Exponential moving average"""
+    return close.ewm(span=window, adjust=False).mean()
+
+def rsi(close, period=RSI_PERIOD) -> pd.DataFrame:
+    """Relative strength index with Wilder smoothing"""
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+    loss = (-delta.clip(upper=0)).ewm(alpha=1 / period, adjust=False).mean()
+    return 100 - 100 / (1 + gain / loss)
+
+def macd(close):
+    """MACD line, signal line and histogram"""
+    line = ema(close, MACD_FAST) - ema(close, MACD_SLOW)
+    signal = line.ewm(span=MACD_SIGNAL, adjust=False).mean()
+    return line, signal, line - signal
+
+def bollinger(close, window):
+    """Lower band, middle band and upper band"""
+    middle = sma(close, window)
+    std = close.rolling(window).std()
+    return middle - BOLLINGER_STD * std, middle, middle + BOLLINGER_STD * std
+
+def volatility(close, window) -> pd.DataFrame:
+    """Annualized rolling volatility of daily log returns"""
+    returns = np.log(close).diff()
+    return returns.rolling(window).std() * np.sqrt(TRADING_DAYS_PER_YEAR)
+
+def max_drawdown(close) -> pd.Series:
+    """Largest peak-to-trough decline over the whole series, as a fraction"""
+    return (close / close.cummax() - 1).min()
+
+def close_frame(bars_by_symbol) -> pd.DataFrame:
+    """
+    Align stored EOD bars of several symbols into one close-price frame.
+
+    Args:
+        bars_by_symbol: Symbol -> columns as returned by eod_store.get_eod_bars
+
+    Returns:
+        pd.DataFrame: Date-indexed close prices, one column per symbol
+    """
+    return pd.DataFrame({
+        symbol: pd.Series(bars["close"], index=pd.to_datetime(bars["date"]))
+        for symbol, bars in bars_by_symbol.items()
+        if len(bars.get("date", ()))
+    })
+
+def compute_indicators(close, names, window) -> dict:
+    """
+    Compute the latest value of a batch of indicators for every symbol.
+
+    Args:
+        close: Date-indexed DataFrame of close prices, one column per symbol
+        names: Indicator names among SUPPORTED_INDICATORS
+        window: Look-back window in trading days for SMA, EMA, Bollinger and volatility
+
+    Returns:
+        dict: Symbol -> compact indicator values
+    """
+    close = close.sort_index()
+
+    def last(frame):
+        return frame.ffill().iloc[-1]
+
+    columns = {"close": last(close)}
+    if "sma" in names:
+        columns[f"sma_{window}"] = last(sma(close, window))
+    if "ema" in names:
+        columns[f"ema_{window}"] = last(ema(close, window))
+    if "rsi" in names:
+        columns[f"rsi_{RSI_PERIOD}"] = last(rsi(close))
+    if "macd" in names:
+        line, signal, histogram = macd(close)
+        columns["macd"], columns["macd_signal"], columns["macd_histogram"] = last(line), last(signal), last(histogram)
+    if "bollinger" in names:
+        lower, middle, upper = bollinger(close, window)
+        columns["bollinger_lower"], columns["bollinger_middle"], columns["bollinger_upper"] = last(lower), last(middle), last(upper)
+    if "volatility" in names:
+        columns[f"volatility_{window}d_annualized"] = last(volatility(close, window))
+    if "drawdown" in names:
+        columns["max_drawdown_pct"] = max_drawdown(close) * 100
+
+    table = pd.DataFrame(columns).round(4)
+    latest = {}
+    for symbol, row in table.iterrows():
+        values = {key: (None if pd.isna(value) else float(value)) for key, value in row.items()}
+        series = close[symbol].dropna()
+        values["as_of"] = series.index[-1].date().isoformat() if len(series) else None
+        values["bars"] = int(len(series))
+        latest[symbol] = values
+    return latest
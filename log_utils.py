@@ -2,30 +2,324 @@
 Utilities for log management in the Nasdaq Stock Assistant application.
 """
 import os
+import atexit
+import contextvars
+import copy
+import json
 import logging
 import datetime
+import gzip
+import queue
+import re
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from logging.handlers import BaseRotatingHandler, QueueHandler, QueueListener
 from pathlib import Path
+from file_locks import pid_alive
 
-def setup_logging(app_name="nasdaq_assistant", log_level=logging.INFO, max_logs=10):
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_listener = None
+_log_context = contextvars.ContextVar("log_context", default={})
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "context"}
+
+# Name suffix of a rotated segment: the rotation timestamp, then the compression extension if any
+ROTATED_SEGMENT = re.compile(r"_\d{8}_\d{6}_\d{6}\.log(\.gz|\.zst)?$")
+
+@contextmanager
+def log_context(**fields):
+    """
+    Attach correlation fields (session id, run id, ...) to every record logged inside the block.
+    
+    Args:
+        fields: Field names and values to attach
+    """
+    token = _log_context.set({**_log_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _log_context.reset(token)
+
+def bind_log_context(**fields):
+    """
+    Attach correlation fields to every record logged later in the current task.
+    
+    Args:
+        fields: Field names and values to attach
+    """
+    _log_context.set({**_log_context.get(), **fields})
+
+class ContextFilter(logging.Filter):
+    """Copy the current correlation fields onto each record in the logging thread"""
+
+    def filter(self, record):
+        record.context = _log_context.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """Formatter writing one JSON object per record, including correlation fields and extras"""
+
+    def __init__(self, max_chars=None):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def format(self, record):
+        message = _truncate(record.getMessage(), self.max_chars)
+        entry = {
+            "ts": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "message": message,
+        }
+        entry.update(getattr(record, "context", {}))
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode()
+        return json.dumps(entry, default=str)
+
+class LazyQueueHandler(QueueHandler):
+    """
+    Queue handler that hands records to the listener thread unformatted.
+
+    The standard QueueHandler formats every record in the calling thread; here
+    message formatting and payload truncation happen on the listener thread.
+    """
+
+    def prepare(self, record):
+        return record
+
+class TruncatingFormatter(logging.Formatter):
+    """Formatter that caps the length of each record's message; tracebacks and stacks are kept whole"""
+
+    def __init__(self, fmt=None, max_chars=None):
+        super().__init__(fmt)
+        self.max_chars = max_chars
+
+    def formatMessage(self, record):
+        message = _truncate(record.message, self.max_chars)
+        if message is not record.message:
+            # Other handlers format the same record; truncate a copy
+            record = copy.copy(record)
+            record.message = message
+        return super().formatMessage(record)
+
+def _truncate(text, max_chars):
+    if max_chars and len(text) > max_chars:
+        return f"{text[:max_chars]}... [truncated {len(text) - max_chars} chars]"
+    return text
+
+class CompressingRotatingFileHandler(BaseRotatingHandler):
+    """
+    File handler that rotates by size and by time while the process runs.
+
+    Rotated segments are renamed with a timestamp, then compressed and pruned
+    by a background worker so the writing thread never waits on compression.
+    With a lock_path (one file per worker process), the files left behind by
+    workers that are no longer running are rotated in turn, at startup and on
+    every rotation, so retention covers them too.
+    """
+
+    def __init__(self, filename, max_bytes=0, interval=0, compression="gzip",
+                 retention_bytes=0, retention_days=0, lock_path=None):
+        """
+        Args:
+            filename: Path of the active log file
+            max_bytes: Rotate when the file reaches this size (0 disables)
+            interval: Rotate after this many seconds (0 disables)
+            compression: "gzip", "zstd" (needs the zstandard package) or None
+            retention_bytes: Keep at most this many bytes of rotated segments (0 keeps all)
+            retention_days: Delete rotated segments older than this (0 keeps all)
+            lock_path: File lock serializing pruning across processes sharing the directory
+        """
+        super().__init__(filename, mode='a', encoding='utf-8')
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compression = "gzip" if compression == "zstd" and zstandard is None else compression
+        self.retention_bytes = retention_bytes
+        self.retention_days = retention_days
+        self.lock_path = lock_path
+        self.rollover_at = time.time() + interval if interval else None
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-compress")
+        if lock_path:
+            # Pick up the files of workers that exited since the directory was last pruned
+            self._worker.submit(self._prune)
+
+    def shouldRollover(self, record):
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            return True
+        if self.max_bytes and self.stream is not None:
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+        base = Path(self.baseFilename)
+        if base.exists() and base.stat().st_size > 0:
+            stamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+            rotated = base.with_name(f"{base.stem}_{stamp}{base.suffix}")
+            os.replace(base, rotated)
+            try:
+                self._worker.submit(self._compress_and_prune, rotated)
+            except RuntimeError:
+                # The worker is gone during interpreter shutdown; compress inline instead
+                self._compress_and_prune(rotated)
+        self.stream = self._open()
+        if self.interval:
+            self.rollover_at = time.time() + self.interval
+
+    def _compress_and_prune(self, path):
+        try:
+            self._compress(path)
+        except Exception as e:
+            print(f"Error compressing rotated log {path}: {e}")
+        self._prune()
+
+    def _compress(self, path):
+        stat = path.stat()
+        if self.compression == "zstd":
+            compressed = Path(f"{path}.zst")
+            with open(path, 'rb') as src, open(compressed, 'wb') as dst:
+                zstandard.ZstdCompressor().copy_stream(src, dst)
+        elif self.compression == "gzip":
+            compressed = Path(f"{path}.gz")
+            with open(path, 'rb') as src, gzip.open(compressed, 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+        else:
+            return
+        # Age-based retention goes by the last write to the segment, not by when it was compressed
+        os.utime(compressed, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        path.unlink()
+
+    def _prune(self):
+        log_dir = Path(self.baseFilename).parent
+        try:
+            if self.lock_path:
+                from filelock import FileLock
+                with FileLock(self.lock_path):
+                    for orphan in self._rotate_orphaned_logs():
+                        self._compress(orphan)
+                    prune_rotated_logs(log_dir, self.retention_bytes, self.retention_days)
+            else:
+                prune_rotated_logs(log_dir, self.retention_bytes, self.retention_days)
+        except Exception as e:
+            print(f"Error pruning rotated logs in {log_dir}: {e}")
+
+    def _rotate_orphaned_logs(self):
+        """
+        Rename the active files of dead worker processes as rotated segments.
+
+        Worker files are named <app>_<pid>.log; must be called with the pruning
+        lock held so only one worker claims each file.
+
+        Returns:
+            list: Paths of the renamed segments, not compressed yet
+        """
+        base = Path(self.baseFilename)
+        app_name = base.stem.rsplit("_", 1)[0]
+        worker_file = re.compile(rf"{re.escape(app_name)}_(\d+){re.escape(base.suffix)}")
+        rotated = []
+        for path in base.parent.iterdir():
+            match = worker_file.fullmatch(path.name)
+            if not match or pid_alive(int(match.group(1))):
+                continue
+            try:
+                stat = path.stat()
+                if stat.st_size == 0:
+                    path.unlink()
+                    continue
+                stamp = datetime.datetime.fromtimestamp(stat.st_mtime).strftime('%Y%m%d_%H%M%S_%f')
+                segment = path.with_name(f"{path.stem}_{stamp}{path.suffix}")
+                os.replace(path, segment)
+            except FileNotFoundError:
+                continue
+            rotated.append(segment)
+        return rotated
+
+    def close(self):
+        # Let pending compressions finish before the process exits
+        self._worker.shutdown(wait=True)
+        super().close()
+
+def prune_rotated_logs(log_dir, retention_bytes=0, retention_days=0):
+    """
+    Delete rotated log segments by age and by total size, oldest first.
+    
+    Args:
+        log_dir: Directory containing rotated segments (*_<timestamp>.log, compressed or not)
+        retention_bytes: Keep at most this many bytes of segments (0 keeps all)
+        retention_days: Delete segments older than this many days (0 keeps all)
+    """
+    segments = []
+    for path in Path(log_dir).iterdir():
+        if ROTATED_SEGMENT.search(path.name):
+            try:
+                segments.append((path, path.stat()))
+            except FileNotFoundError:
+                pass  # Pruned or compressed by another worker meanwhile
+    # Newest first, so the running total drops the oldest segments
+    segments.sort(key=lambda item: item[1].st_mtime, reverse=True)
+    cutoff = time.time() - retention_days * 86400
+    total = 0
+    for segment, stat in segments:
+        total += stat.st_size
+        if (retention_days and stat.st_mtime < cutoff) or (retention_bytes and total > retention_bytes):
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass  # Already pruned by another worker
+
+def setup_logging(app_name="nasdaq_assistant", log_level=logging.INFO, max_logs=10, async_mode=False,
+                  max_message_chars=None, max_bytes=0, rotate_interval=0, compression="gzip",
+                  retention_bytes=0, retention_days=0, multiprocess=False, json_format=False):
     """
     Set up logging with both console and file output.
     
     Args:
         app_name: Name prefix for the log file
         log_level: Logging level (e.g., logging.DEBUG, logging.INFO)
-        max_logs: Maximum number of log files to keep
+        max_logs: Maximum number of log files to keep when rotation is disabled
+        async_mode: Do console and file I/O on a background thread through a queue
+        max_message_chars: Truncate messages longer than this, tracebacks excluded (None keeps them whole)
+        max_bytes: Rotate the log file when it reaches this size (0 disables)
+        rotate_interval: Rotate the log file after this many seconds (0 disables)
+        compression: Compression of rotated segments: "gzip", "zstd" or None
+        retention_bytes: Total bytes of rotated segments to keep (0 keeps all)
+        retention_days: Age in days after which rotated segments are deleted (0 keeps all)
+        multiprocess: Give each worker process its own file and lock pruning across processes
+        json_format: Write one JSON object per line to the log file, with correlation fields
     
     Returns:
         logger: Configured logger
     """
+    global _listener
     # Create log directory
     log_dir = Path('./log')
     log_dir.mkdir(exist_ok=True)
     
-    # Generate log filename with timestamp
-    timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    log_filename = f"{app_name}_{timestamp}.log"
+    rotating = bool(max_bytes or rotate_interval)
+    if rotating:
+        # Stable name that rotates in place; per-process names keep workers from renaming each other's file
+        log_filename = f"{app_name}_{os.getpid()}.log" if multiprocess else f"{app_name}.log"
+    else:
+        # Generate log filename with timestamp
+        timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
+        log_filename = f"{app_name}_{timestamp}.log"
     log_filepath = log_dir / log_filename
     
     # Configure logger
@@ -35,30 +329,63 @@ def setup_logging(app_name="nasdaq_assistant", log_level=logging.INFO, max_logs=
     # Clear any existing handlers
     if logger.hasHandlers():
         logger.handlers.clear()
+    logger.filters.clear()
+    # Capture correlation fields in the calling task, before records cross to the listener thread
+    logger.addFilter(ContextFilter())
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
     
     # Create console handler
     console_handler = logging.StreamHandler()
     console_handler.setLevel(log_level)
     
     # Create file handler
-    file_handler = logging.FileHandler(log_filepath)
+    if rotating:
+        file_handler = CompressingRotatingFileHandler(
+            log_filepath,
+            max_bytes=max_bytes,
+            interval=rotate_interval,
+            compression=compression,
+            retention_bytes=retention_bytes,
+            retention_days=retention_days,
+            lock_path=str(log_dir / f".{app_name}.lock") if multiprocess else None,
+        )
+    else:
+        file_handler = logging.FileHandler(log_filepath)
     file_handler.setLevel(log_level)
     
     # Create formatter and add it to the handlers
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    formatter = TruncatingFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s', max_message_chars)
     console_handler.setFormatter(formatter)
-    file_handler.setFormatter(formatter)
+    file_handler.setFormatter(JsonFormatter(max_message_chars) if json_format else formatter)
     
-    # Add the handlers to the logger
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    if async_mode:
+        # Callers only enqueue records; a listener thread formats and writes them
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, console_handler, file_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        logger.addHandler(LazyQueueHandler(log_queue))
+    else:
+        # Add the handlers to the logger
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
     
-    # Clean up old logs
-    cleanup_old_logs(log_dir, max_logs)
+    # Clean up old logs; rotating handlers prune their own segments
+    if not rotating:
+        cleanup_old_logs(log_dir, max_logs)
     
     logger.info(f"Logging initialized. Logs will be saved to {log_filepath}")
     return logger
 
+def stop_logging():
+    """Flush queued records and stop the background logging thread, if any"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
 def cleanup_old_logs(log_dir, max_logs):
     """
     Delete old log files when the number exceeds max_logs.
@@ -0,0 +1,191 @@
+"""
+Low-overhead latency metrics for the stages of a chat turn.
+
+Stage durations are recorded in fixed-bucket histograms, exposed in the
+Prometheus text format on a local /metrics endpoint and summarized
+periodically in the shared log.
+"""
+import asyncio
+import bisect
+import os
+import time
+from contextlib import contextmanager
+from aiohttp import web
+from shared_logging import logger
+
+# Constants
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))  # Port of the /metrics endpoint, 0 (default) disables it
+METRICS_LOG_INTERVAL = int(os.environ.get("METRICS_LOG_INTERVAL", 300))  # Seconds between log summaries, 0 disables
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)  # Seconds
+METRIC_PREFIX = "nasdaq_assistant"
+
+class Histogram:
+    """Cumulative fixed-bucket histogram, one series per label value"""
+
+    def __init__(self, name, help_text, label, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., +Inf count, sum, max]
+
+    def observe(self, label_value, value):
+        series = self._series.get(label_value)
+        if series is None:
+            series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0, 0.0]
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] = max(series[-1], value)
+
+    def snapshot(self):
+        """Return label value -> (count, sum, max, p50, p95) estimated from the buckets"""
+        summary = {}
+        for label_value, series in self._series.items():
+            counts = series[:-2]
+            count = sum(counts)
+            summary[label_value] = (
+                count, series[-2], series[-1],
+                self._quantile(counts, count, 0.5), self._quantile(counts, count, 0.95),
+            )
+        return summary
+
+    def _quantile(self, counts, count, q):
+        rank, seen = q * count, 0
+        for i, bucket_count in enumerate(counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for label_value, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), series[:-2]):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{self.label}="{label_value}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{self.label}="{label_value}"}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{self.label}="{label_value}"}} {cumulative}')
+        return lines
+
+class Counter:
+    """Monotonic counter, one series per label value"""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+
+    def inc(self, label_value, amount=1):
+        self._values[label_value] = self._values.get(label_value, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for label_value, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+class Gauge:
+    """Current value, one series per label value"""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self._values = {}
+
+    def set(self, label_value, value):
+        self._values[label_value] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} gauge"]
+        for label_value, value in sorted(self._values.items()):
+            lines.append(f'{self.name}{{{self.label}="{label_value}"}} {value}')
+        return lines
+
+STAGE_LATENCY = Histogram(f"{METRIC_PREFIX}_stage_duration_seconds", "Duration of each chat turn stage", "stage")
+STAGE_ERRORS = Counter(f"{METRIC_PREFIX}_stage_errors_total", "Stages that raised an exception", "stage")
+TOOL_OUTPUT_BYTES = Counter(f"{METRIC_PREFIX}_tool_output_bytes_total", "Tool output bytes before and after compaction", "kind")
+_registry = [STAGE_LATENCY, STAGE_ERRORS, TOOL_OUTPUT_BYTES]
+
+_runner = None
+_summary_task = None
+
+def register(metric):
+    """Add a metric defined in another module to the /metrics output and return it"""
+    _registry.append(metric)
+    return metric
+
+@contextmanager
+def measure(stage):
+    """
+    Record the duration of the enclosed block, which may contain awaits, under a stage name.
+
+    Args:
+        stage: Stage label, e.g. "create_run" or "tool.get_quote"
+    """
+    start_time = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage)
+        raise
+    finally:
+        STAGE_LATENCY.observe(stage, time.perf_counter() - start_time)
+
+def render_metrics() -> str:
+    """Render every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+async def _handle_metrics(request):
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+def log_summary():
+    """Write count, average, p50/p95 (bucket estimates) and max per stage to the shared logger"""
+    for stage, (count, total, maximum, p50, p95) in sorted(STAGE_LATENCY.snapshot().items()):
+        logger.info(
+            f"metrics {stage}: count={count} avg={total / count:.3f}s p50<={p50}s p95<={p95}s max={maximum:.3f}s",
+            extra={"stage": stage, "count": count, "avg_s": total / count, "max_s": maximum}
+        )
+
+async def _log_summaries():
+    while True:
+        await asyncio.sleep(METRICS_LOG_INTERVAL)
+        log_summary()
+
+async def start_metrics():
+    """Start the /metrics endpoint and the periodic log summary once per process"""
+    global _runner, _summary_task
+    if METRICS_LOG_INTERVAL and _summary_task is None:
+        _summary_task = asyncio.ensure_future(_log_summaries())
+    if METRICS_PORT and _runner is None:
+        app = web.Application()
+        app.router.add_get("/metrics", _handle_metrics)
+        _runner = web.AppRunner(app, access_log=None)
+        await _runner.setup()
+        try:
+            await web.TCPSite(_runner, METRICS_HOST, METRICS_PORT).start()
+            logger.info(f"Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+        except OSError as e:
+            # Another worker may already own the port; metrics still go to the log summaries
+            logger.warning(f"Could not start metrics endpoint on port {METRICS_PORT}: {e}")
+
+async def stop_metrics():
+    """Stop the /metrics endpoint and write a final summary"""
+    global _runner, _summary_task
+    log_summary()
+    summary_task, runner = _summary_task, _runner
+    _summary_task, _runner = None, None
+    try:
+        if summary_task is not None:
+            summary_task.cancel()
+        if runner is not None:
+            await runner.cleanup()
+    except Exception as e:
+        # The owning loop may already be closed (e.g. atexit shutdown)
+        logger.debug(f"Error stopping metrics endpoint: {e}")
@@ -0,0 +1,244 @@
+"""
+Background news prefetching for popular symbols.
+
+Symbols users ask news for are ranked by a time-decayed popularity score.
+A background task pages through new articles for the top symbols that were
+asked for since their last refresh, starting after the newest article
+already seen, and keeps them deduplicated by uuid in a bounded in-memory
+index that `get_news` is served from. Symbols that are not prefetched yet
+fall back to a live request and are warmed in the background once popular;
+a query for a symbol whose refresh is running waits for that refresh instead
+of requesting the same articles again.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from shared_logging import logger
+from stockdata_client import fetch_json
+
+# Constants
+NEWS_PREFETCH_INTERVAL = int(os.environ.get("NEWS_PREFETCH_INTERVAL", 300))  # Seconds between refresh cycles, 0 disables
+NEWS_WATCHLIST_SIZE = int(os.environ.get("NEWS_WATCHLIST_SIZE", 20))  # Symbols refreshed per cycle
+NEWS_WATCHLIST_MIN_SCORE = 1.5  # Popularity needed to be prefetched, roughly two recent queries
+NEWS_POPULARITY_HALF_LIFE = 3600  # Seconds for a query's weight to halve
+NEWS_INDEX_MAX_ARTICLES = int(os.environ.get("NEWS_INDEX_MAX_ARTICLES", 5000))  # Articles kept in memory
+NEWS_PAGE_LIMIT = 3  # Articles per upstream page allowed by the API plan
+NEWS_MAX_PAGES = 5  # Pages fetched per symbol and cycle
+NEWS_FRESHNESS = 2 * NEWS_PREFETCH_INTERVAL  # Seconds a refreshed symbol is served from the index
+DROPPED_ARTICLE_FIELDS = ("similar",)  # Large and unused by the assistant
+
+class Watchlist:
+    """Popularity ranking of symbols with exponentially decaying scores"""
+
+    def __init__(self, half_life=NEWS_POPULARITY_HALF_LIFE):
+        self.decay = math.log(2) / half_life
+        self._scores = {}  # symbol -> (score, updated_at)
+        self.last_query = {}  # symbol -> monotonic time of the last query
+
+    def _current(self, symbol, now):
+        score, updated_at = self._scores.get(symbol, (0.0, now))
+        return score * math.exp(-self.decay * (now - updated_at))
+
+    def record(self, symbols):
+        """Count one query for each symbol"""
+        now = time.monotonic()
+        for symbol in symbols:
+            self._scores[symbol] = (self._current(symbol, now) + 1, now)
+            self.last_query[symbol] = now
+
+    def top(self, n=NEWS_WATCHLIST_SIZE, min_score=NEWS_WATCHLIST_MIN_SCORE):
+        """Return up to n symbols with the highest current score, most popular first"""
+        now = time.monotonic()
+        scores = {symbol: self._current(symbol, now) for symbol in self._scores}
+        # Forget symbols whose score has decayed to nothing
+        for symbol in [s for s, score in scores.items() if score < 0.01]:
+            del self._scores[symbol]
+            self.last_query.pop(symbol, None)
+        ranked = sorted((s for s in scores if scores[s] >= min_score), key=scores.get, reverse=True)
+        return ranked[:n]
+
+class NewsIndex:
+    """Bounded uuid-deduplicated article store with a newest-first list per symbol"""
+
+    def __init__(self, max_articles=NEWS_INDEX_MAX_ARTICLES):
+        self.max_articles = max_articles
+        self._articles = OrderedDict()  # uuid -> article, oldest insert first
+        self._by_symbol = {}  # symbol -> list of uuids, newest first
+        self.last_published = {}  # symbol -> newest published_at seen
+        self.refreshed_at = {}  # symbol -> monotonic time of the last successful refresh
+
+    def add(self, symbol, articles) -> int:
+        """Index articles for a symbol and return how many were new"""
+        new = 0
+        uuids = self._by_symbol.setdefault(symbol, [])
+        for article in articles:
+            uuid = article.get("uuid")
+            if not uuid:
+                continue
+            if uuid not in self._articles:
+                self._articles[uuid] = {k: v for k, v in article.items() if k not in DROPPED_ARTICLE_FIELDS}
+                new += 1
+            if uuid not in uuids:
+                uuids.append(uuid)
+            published = article.get("published_at") or ""
+            if published > self.last_published.get(symbol, ""):
+                self.last_published[symbol] = published
+        uuids.sort(key=lambda u: self._articles[u].get("published_at") or "", reverse=True)
+        self._evict()
+        return new
+
+    def _evict(self):
+        while len(self._articles) > self.max_articles:
+            uuid, _ = self._articles.popitem(last=False)
+            for uuids in self._by_symbol.values():
+                if uuid in uuids:
+                    uuids.remove(uuid)
+
+    def is_fresh(self, symbol, max_age=NEWS_FRESHNESS) -> bool:
+        refreshed_at = self.refreshed_at.get(symbol)
+        return refreshed_at is not None and time.monotonic() - refreshed_at < max_age
+
+    def latest(self, symbol, n):
+        """Return the n newest articles indexed for a symbol"""
+        return [self._articles[uuid] for uuid in self._by_symbol.get(symbol, [])[:n]]
+
+    def __len__(self):
+        return len(self._articles)
+
+class NewsPrefetcher:
+    """Refreshes the news index for the watchlist in the background"""
+
+    def __init__(self, interval=NEWS_PREFETCH_INTERVAL):
+        self.interval = interval
+        self.watchlist = Watchlist()
+        self.index = NewsIndex()
+        self._task = None
+        self._refreshing = {}  # symbol -> refresh task
+        self.upstream_requests = 0
+
+    def start(self):
+        """Start the refresh loop on the running event loop, once"""
+        if self.interval and (self._task is None or self._task.done()):
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None and not task.done():
+            try:
+                task.cancel()
+            except RuntimeError:
+                # The owning loop is already closed (e.g. atexit shutdown)
+                pass
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            # Only symbols asked for since their last refresh; the others keep their quota
+            symbols = [
+                symbol for symbol in self.watchlist.top()
+                if self.watchlist.last_query.get(symbol, 0) > self.index.refreshed_at.get(symbol, -1)
+            ]
+            if not symbols:
+                continue
+            start_time = time.perf_counter()
+            results = await asyncio.gather(*(self._refresh_once(symbol) for symbol in symbols), return_exceptions=True)
+            new = sum(r for r in results if isinstance(r, int))
+            for symbol, result in zip(symbols, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"News prefetch for {symbol} failed: {result}")
+            logger.info(
+                f"News prefetch refreshed {len(symbols)} symbol(s) in {time.perf_counter() - start_time:.2f}s, "
+                f"{new} new article(s), {len(self.index)} indexed"
+            )
+
+    def _refresh_once(self, symbol):
+        """Return the running refresh of a symbol, starting one if none is running"""
+        task = self._refreshing.get(symbol)
+        if task is None or task.done():
+            task = asyncio.ensure_future(self.refresh(symbol))
+            self._refreshing[symbol] = task
+            task.add_done_callback(lambda t, symbol=symbol: self._refreshing.pop(symbol, None))
+        return task
+
+    def warm(self, symbols):
+        """
+        Start refreshing popular symbols that are not indexed yet, without waiting for the next cycle.
+
+        Returns:
+            dict: symbol -> refresh task, for the symbols refreshed now or already being refreshed
+        """
+        if not self.interval:
+            return {}
+        popular = set(self.watchlist.top())
+        refreshing = {}
+        for symbol in symbols:
+            task = self._refreshing.get(symbol)
+            if task is None and symbol in popular and not self.index.is_fresh(symbol):
+                task = self._refresh_once(symbol)
+                task.add_done_callback(_log_failure)
+            if task is not None:
+                refreshing[symbol] = task
+        return refreshing
+
+    async def refresh(self, symbol) -> int:
+        """
+        Page through articles for a symbol published since the newest one indexed.
+
+        Returns:
+            int: Number of new articles
+        """
+        since = self.index.last_published.get(symbol)
+        # A symbol seen for the first time only needs its newest page
+        max_pages = NEWS_MAX_PAGES if since else 1
+        new = 0
+        for page in range(1, max_pages + 1):
+            params = {"symbols": symbol, "limit": NEWS_PAGE_LIMIT, "page": page}
+            if since:
+                params["published_after"] = since[:19]
+            self.upstream_requests += 1
+            status, payload = await fetch_json("news/all", params)
+            if status != 200:
+                raise RuntimeError(f"news/all returned {status}")
+            articles = payload.get("data", [])
+            new += self.index.add(symbol, articles)
+            meta = payload.get("meta", {})
+            returned = meta.get("returned", len(articles))
+            if returned < NEWS_PAGE_LIMIT or page * NEWS_PAGE_LIMIT >= meta.get("found", 0):
+                break
+        self.index.refreshed_at[symbol] = time.monotonic()
+        return new
+
+    def cached_news(self, symbols, per_symbol):
+        """
+        Split a news request into articles served from the index and symbols needing a live fetch.
+
+        Returns:
+            tuple: (articles of the fresh symbols, newest first; list of symbols that are not fresh)
+        """
+        articles, cold = [], []
+        for symbol in symbols:
+            if self.index.is_fresh(symbol):
+                articles.extend(self.index.latest(symbol, per_symbol))
+            else:
+                cold.append(symbol)
+        return articles, cold
+
+def _log_failure(task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"News warm-up failed: {task.exception()}")
+
+def merge_articles(*article_lists):
+    """Merge article lists, dropping duplicate uuids, newest first"""
+    merged = {}
+    for articles in article_lists:
+        for article in articles:
+            merged.setdefault(article.get("uuid"), article)
+    return sorted(merged.values(), key=lambda a: a.get("published_at") or "", reverse=True)
+
+_prefetcher = NewsPrefetcher()
+
+def get_prefetcher() -> NewsPrefetcher:
+    """Return the process-wide prefetcher"""
+    return _prefetcher
@@ -0,0 +1,183 @@
+"""
+Vectorized portfolio statistics for many symbols at once.
+
+Quotes or stored EOD bars of a whole portfolio are merged into one
+symbol-indexed table, and only aggregates (returns, breadth, top movers,
+sector breakdown) are handed back to the agent instead of raw rows.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+from indicators import TRADING_DAYS_PER_YEAR, close_frame, max_drawdown
+
+# Constants
+SECTOR_MAP_FILE = os.environ.get("SECTOR_MAP_FILE")  # Optional JSON {symbol: sector} extending the built-in map
+UNKNOWN_SECTOR = "Unknown"
+
+# GICS sectors of the Nasdaq-100 constituents as of December 2024; update when the index is rebalanced
+NASDAQ_100_SECTORS = {
+    **dict.fromkeys((
+        "AAPL", "MSFT", "NVDA", "AVGO", "AMD", "ADBE", "CSCO", "QCOM", "INTC", "TXN", "INTU", "AMAT", "ADI",
+        "LRCX", "MU", "KLAC", "SNPS", "CDNS", "PANW", "CRWD", "FTNT", "MRVL", "NXPI", "ADSK", "ROP", "WDAY",
+        "MCHP", "ON", "CTSH", "ANSS", "CDW", "GFS", "TEAM", "DDOG", "ZS", "PLTR", "ASML", "ARM", "MDB", "MSTR",
+        "APP", "TTD",
+    ), "Information Technology"),
+    **dict.fromkeys((
+        "GOOGL", "GOOG", "META", "NFLX", "CMCSA", "TMUS", "CHTR", "EA", "TTWO", "WBD",
+    ), "Communication Services"),
+    **dict.fromkeys((
+        "AMZN", "TSLA", "BKNG", "SBUX", "MELI", "ABNB", "ORLY", "MAR", "ROST", "LULU", "DASH", "PDD",
+    ), "Consumer Discretionary"),
+    **dict.fromkeys((
+        "PEP", "COST", "MDLZ", "KDP", "KHC", "MNST", "CCEP",
+    ), "Consumer Staples"),
+    **dict.fromkeys((
+        "AMGN", "ISRG", "GILD", "VRTX", "REGN", "AZN", "IDXX", "DXCM", "BIIB", "GEHC", "MRNA",
+    ), "Health Care"),
+    **dict.fromkeys((
+        "HON", "ADP", "CSX", "PCAR", "CTAS", "PAYX", "FAST", "ODFL", "CPRT", "VRSK", "AXON",
+    ), "Industrials"),
+    **dict.fromkeys(("AEP", "XEL", "EXC", "CEG"), "Utilities"),
+    **dict.fromkeys(("FANG", "BKR"), "Energy"),
+    "PYPL": "Financials",
+    "LIN": "Materials",
+    "CSGP": "Real Estate",
+}
+INDEX_ALIASES = {  # Names the agent may pass instead of a symbol list
+    "NASDAQ100": tuple(NASDAQ_100_SECTORS),
+    "NASDAQ-100": tuple(NASDAQ_100_SECTORS),
+    "NDX": tuple(NASDAQ_100_SECTORS),
+}
+
+_sectors = None
+
+def sectors() -> dict:
+    """Return the symbol -> sector map, loading SECTOR_MAP_FILE once"""
+    global _sectors
+    if _sectors is None:
+        _sectors = dict(NASDAQ_100_SECTORS)
+        if SECTOR_MAP_FILE:
+            with open(SECTOR_MAP_FILE) as f:
+                _sectors.update({symbol.upper(): sector for symbol, sector in json.load(f).items()})
+    return _sectors
+
+def expand_symbols(symbol_list) -> list:
+    """Replace index names such as NASDAQ100 by their constituents, keeping the first occurrence of each symbol"""
+    expanded = []
+    for symbol in symbol_list:
+        expanded.extend(INDEX_ALIASES.get(symbol, (symbol,)))
+    return list(dict.fromkeys(expanded))
+
+def quote_table(quotes) -> pd.DataFrame:
+    """
+    Merge quote rows into one table.
+
+    Args:
+        quotes: Rows of the data/quote endpoint
+
+    Returns:
+        pd.DataFrame: Indexed by symbol with name, sector, price, change_pct, market_cap and volume
+    """
+    table = pd.DataFrame.from_records(
+        [{
+            "symbol": quote.get("ticker"),
+            "name": quote.get("name"),
+            "price": quote.get("price"),
+            "change_pct": quote.get("day_change"),
+            "market_cap": quote.get("market_cap"),
+            "volume": quote.get("volume"),
+        } for quote in quotes if quote.get("ticker")],
+        columns=["symbol", "name", "price", "change_pct", "market_cap", "volume"],
+    ).drop_duplicates("symbol").set_index("symbol")
+    for column in ("price", "change_pct", "market_cap", "volume"):
+        table[column] = pd.to_numeric(table[column], errors="coerce")
+    table["sector"] = [sectors().get(symbol, UNKNOWN_SECTOR) for symbol in table.index]
+    return table
+
+def history_table(bars_by_symbol) -> pd.DataFrame:
+    """
+    Compute per-symbol period statistics from stored EOD bars.
+
+    Args:
+        bars_by_symbol: Symbol -> columns as returned by eod_store.get_eod_bars
+
+    Returns:
+        pd.DataFrame: Indexed by symbol with sector, first/last close, change_pct,
+            annualized volatility and max drawdown in percent
+    """
+    close = close_frame(bars_by_symbol).sort_index()
+    first = close.bfill().iloc[0] if len(close) else pd.Series(dtype=float)
+    last = close.ffill().iloc[-1] if len(close) else pd.Series(dtype=float)
+    returns = np.log(close).diff()
+    table = pd.DataFrame({
+        "first_close": first,
+        "last_close": last,
+        "change_pct": (last / first - 1) * 100,
+        "volatility_annualized": returns.std() * np.sqrt(TRADING_DAYS_PER_YEAR),
+        "max_drawdown_pct": max_drawdown(close) * 100,
+    })
+    table.index.name = "symbol"
+    table["sector"] = [sectors().get(symbol, UNKNOWN_SECTOR) for symbol in table.index]
+    return table
+
+def _rounded(value, digits=2):
+    return None if value is None or pd.isna(value) else round(float(value), digits)
+
+def _movers(table, top, ascending):
+    rows = table.sort_values("change_pct", ascending=ascending).head(top)
+    return [
+        {"symbol": symbol, "sector": row["sector"], "change_pct": _rounded(row["change_pct"])}
+        for symbol, row in rows.iterrows()
+    ]
+
+def summarize(table, top=5) -> dict:
+    """
+    Aggregate a portfolio table into breadth, average returns, top movers and a sector breakdown.
+
+    Args:
+        table: Output of quote_table or history_table
+        top: Number of gainers and losers to list
+
+    Returns:
+        dict: Compact statistics; change_pct values are percentages
+    """
+    valid = table.dropna(subset=["change_pct"])
+    change = valid["change_pct"]
+    summary = {
+        "symbols": int(len(valid)),
+        "advancers": int((change > 0).sum()),
+        "decliners": int((change < 0).sum()),
+        "unchanged": int((change == 0).sum()),
+        "mean_change_pct": _rounded(change.mean()),
+        "median_change_pct": _rounded(change.median()),
+    }
+    if "market_cap" in valid and valid["market_cap"].notna().any():
+        weights = valid["market_cap"].fillna(0)
+        if weights.sum() > 0:
+            summary["cap_weighted_change_pct"] = _rounded((change * weights).sum() / weights.sum())
+    if "volatility_annualized" in valid:
+        summary["median_volatility_annualized"] = _rounded(valid["volatility_annualized"].median(), 4)
+        worst = valid["max_drawdown_pct"].idxmin() if valid["max_drawdown_pct"].notna().any() else None
+        if worst is not None:
+            summary["worst_drawdown"] = {"symbol": worst, "max_drawdown_pct": _rounded(valid.at[worst, "max_drawdown_pct"])}
+    summary["top_gainers"] = _movers(valid, top, ascending=False)
+    summary["top_losers"] = _movers(valid, top, ascending=True)
+
+    grouped = valid.groupby("sector")["change_pct"]
+    breakdown = pd.DataFrame({
+        "count": grouped.size(),
+        "mean_change_pct": grouped.mean(),
+        "best": grouped.idxmax(),
+        "worst": grouped.idxmin(),
+    }).sort_values("mean_change_pct", ascending=False)
+    summary["sectors"] = {
+        sector: {
+            "count": int(row["count"]),
+            "mean_change_pct": _rounded(row["mean_change_pct"]),
+            "best": row["best"],
+            "worst": row["worst"],
+        }
+        for sector, row in breakdown.iterrows()
+    }
+    return summary
@@ -0,0 +1,124 @@
+"""
+Micro-batching dispatcher for quote requests.
+
+Quote requests that arrive within a short window are merged into one
+multi-symbol upstream call, and the returned `data` array is split back
+to each caller.
+"""
+import asyncio
+from shared_logging import logger
+
+class QuoteBatcher:
+    """
+    Collect quote requests for a short window and serve them with as few
+    upstream calls as the per-request symbol limit allows.
+    """
+
+    def __init__(self, fetch, window=0.03, max_symbols=3):
+        """
+        Args:
+            fetch: Coroutine function taking a comma-separated symbol string and
+                returning (HTTP status code, decoded JSON body)
+            window: Seconds to wait for more requests before dispatching a batch
+            max_symbols: Maximum symbols the API accepts in one request
+        """
+        self._fetch = fetch
+        self.window = window
+        self.max_symbols = max_symbols
+        self._pending = []  # (symbols, future) per caller
+        self._pending_symbols = set()
+        self._flush_handle = None
+        self._dispatches = set()  # Running dispatch tasks, referenced until done
+        self.requests = 0
+        self.upstream_calls = 0
+
+    async def fetch(self, symbols):
+        """
+        Queue a quote request and wait for its share of the batched response.
+
+        Args:
+            symbols: Normalized comma-separated symbols, e.g. "AAPL,MSFT"
+
+        Returns:
+            tuple: (HTTP status code, JSON body containing only the requested tickers)
+        """
+        symbol_list = [s for s in symbols.split(",") if s]
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.requests += 1
+
+        # Dispatch the current batch first if these symbols would not fit in it
+        if self._pending and len(self._pending_symbols | set(symbol_list)) > self.max_symbols:
+            self._flush()
+        self._pending.append((symbol_list, future))
+        self._pending_symbols.update(symbol_list)
+
+        if len(self._pending_symbols) >= self.max_symbols:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, symbols = self._pending, sorted(self._pending_symbols)
+        self._pending, self._pending_symbols = [], set()
+        task = asyncio.ensure_future(self._dispatch(batch, symbols))
+        self._dispatches.add(task)
+        task.add_done_callback(lambda task: self._dispatch_done(task, batch))
+
+    def _dispatch_done(self, task, batch):
+        """Fail the callers of a batch whose dispatch was cancelled or raised, so none of them waits forever"""
+        self._dispatches.discard(task)
+        if task.cancelled():
+            for _, future in batch:
+                future.cancel()
+            return
+        error = task.exception()
+        if error is None:
+            return
+        logger.error(f"Quote batch dispatch failed: {error!r}")
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _dispatch(self, batch, symbols):
+        chunks = [symbols[i:i + self.max_symbols] for i in range(0, len(symbols), self.max_symbols)]
+        self.upstream_calls += len(chunks)
+        results = await asyncio.gather(
+            *(self._fetch(",".join(chunk)) for chunk in chunks), return_exceptions=True
+        )
+        logger.debug(
+            f"Quote batch: {len(batch)} request(s), {len(symbols)} symbol(s) in {len(chunks)} upstream call(s) "
+            f"(total {self.requests} requests, {self.upstream_calls} upstream calls)"
+        )
+
+        # Index the merged response by ticker and remember failures per symbol
+        by_ticker = {}
+        failures = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception) or result[0] != 200:
+                for symbol in chunk:
+                    failures[symbol] = result
+                continue
+            for item in result[1].get("data", []):
+                by_ticker[str(item.get("ticker", "")).upper()] = item
+
+        for symbol_list, future in batch:
+            if future.done():
+                continue
+            failure = next((failures[s] for s in symbol_list if s in failures), None)
+            if isinstance(failure, Exception):
+                future.set_exception(failure)
+            elif failure is not None:
+                future.set_result(failure)
+            else:
+                data = [by_ticker[s] for s in symbol_list if s in by_ticker]
+                future.set_result((200, {
+                    "meta": {"requested": len(symbol_list), "returned": len(data)},
+                    "data": data,
+                }))
@@ -0,0 +1,226 @@
+"""
+Shared resilience layer for calls to upstream services.
+
+`Upstream` combines bounded retries with jittered exponential backoff, a
+circuit breaker that fails fast while the service is down and a client-side
+token bucket. Used for both the stockdata.org API and the Azure agents API.
+"""
+import asyncio
+import email.utils
+import random
+import time
+from metrics import Counter, METRIC_PREFIX, register
+from shared_logging import logger
+
+# Constants
+RETRY_ATTEMPTS = 3  # Attempts per call, including the first
+RETRY_BASE_DELAY = 0.25  # Seconds; the backoff cap doubles from here on every retry
+RETRY_MAX_DELAY = 4  # Upper bound for a computed backoff
+MAX_RETRY_AFTER = 10  # Longest server-requested wait honored before giving up instead
+BREAKER_FAILURE_THRESHOLD = 5  # Consecutive failed attempts that open the circuit
+BREAKER_RESET_TIMEOUT = 30  # Seconds the circuit stays open before a probe call is let through
+
+UPSTREAM_EVENTS = register(Counter(
+    f"{METRIC_PREFIX}_upstream_events_total", "Retries and fast failures per upstream", "event"
+))
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the upstream while its circuit is open"""
+
+class RetryableError(Exception):
+    """Raised by an operation for a failure worth retrying, e.g. HTTP 429 or 503"""
+
+    def __init__(self, message, retry_after=None, result=None):
+        """
+        Args:
+            message: Description of the failure
+            retry_after: Seconds the upstream asked us to wait, if it said so
+            result: Value to return instead of raising once the retries are exhausted
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.result = result
+
+def parse_retry_after(headers):
+    """
+    Return the seconds to wait from Retry-After style headers, or None.
+
+    Understands `Retry-After` as seconds or an HTTP date, `retry-after-ms` /
+    `x-ms-retry-after-ms` and `X-RateLimit-Reset` as an epoch timestamp.
+    """
+    if not headers:
+        return None
+    for name in ("retry-after-ms", "x-ms-retry-after-ms"):
+        value = headers.get(name)
+        if value:
+            try:
+                return float(value) / 1000
+            except ValueError:
+                pass
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            try:
+                return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+            except (TypeError, ValueError):
+                pass
+    value = headers.get("X-RateLimit-Reset")
+    if value and headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            return max(float(value) - time.time(), 0)
+        except ValueError:
+            pass
+    return None
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker over consecutive failures"""
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self._probing or time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half-open"
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        state = self.state
+        if state == "open":
+            raise CircuitOpenError(f"{self.name} is unavailable, retry in {self._remaining():.0f}s")
+        if state == "half-open":
+            # Let exactly one probe through; its outcome closes or re-opens the circuit
+            self._probing = True
+
+    def _remaining(self):
+        return max(self.reset_timeout - (time.monotonic() - self.opened_at), 0)
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or (self.opened_at is None and self.failures >= self.failure_threshold):
+            if self.opened_at is None:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+class TokenBucket:
+    """Client-side rate limiter: `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def pause(self, seconds):
+        """Hold every caller back, e.g. after the upstream answered 429 with Retry-After"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        """Wait until a request may be sent"""
+        while True:
+            now = self._refill()
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+                continue
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class Upstream:
+    """Retry, circuit breaker and rate limit policy for one upstream service"""
+
+    def __init__(self, name, attempts=RETRY_ATTEMPTS, rate=0, burst=None, breaker=None):
+        """
+        Args:
+            name: Upstream name used in logs and metrics, e.g. "stockdata"
+            attempts: Maximum attempts per call, including the first
+            rate: Requests per second allowed by the API plan, 0 for no client-side limit
+            burst: Requests that may be sent at once before `rate` applies
+            breaker: Circuit breaker to use, one per upstream by default
+        """
+        self.name = name
+        self.attempts = attempts
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.breaker = breaker or CircuitBreaker(name)
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (1-based): server hint or full jitter"""
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+    async def call(self, operation, retryable=(RetryableError,)):
+        """
+        Run `operation()` under the upstream's policy.
+
+        Args:
+            operation: Coroutine function performing one attempt
+            retryable: Exception types that are retried; RetryableError carries the server's Retry-After
+
+        Returns:
+            The operation's result, or the `result` of the last RetryableError once retries are exhausted
+        """
+        for attempt in range(1, self.attempts + 1):
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                UPSTREAM_EVENTS.inc(f"{self.name}.circuit_open")
+                raise
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            try:
+                result = await operation()
+            except retryable as e:
+                self.breaker.record_failure()
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is not None and self.bucket is not None:
+                    self.bucket.pause(retry_after)
+                # Give up now if retries are used up, the wait is too long or this failure opened the circuit
+                if attempt == self.attempts or (retry_after or 0) > MAX_RETRY_AFTER or self.breaker.state == "open":
+                    if isinstance(e, RetryableError) and e.result is not None:
+                        return e.result
+                    raise
+                delay = self.backoff(attempt, retry_after)
+                UPSTREAM_EVENTS.inc(f"{self.name}.retry")
+                logger.warning(
+                    f"{self.name} attempt {attempt}/{self.attempts} failed ({e}), retrying in {delay:.2f}s",
+                    extra={"upstream": self.name, "attempt": attempt}
+                )
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                # A cancelled probe says nothing about the upstream; let the next call probe
+                self.breaker._probing = False
+                raise
+            except Exception:
+                # Not transient (e.g. a bad request); does not count against the circuit
+                self.breaker.record_success()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
@@ -0,0 +1,224 @@
+"""
+Asynchronous TTL + LRU cache for upstream responses used by the agent tools.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from shared_logging import logger
+
+STATS_LOG_INTERVAL = 100  # Log a statistics summary every N lookups
+SHARED_MAX_ENTRIES = 4096  # Entry files kept in the shared directory before the soonest to expire are removed
+SHARED_SWEEP_INTERVAL = 300  # Seconds between sweeps of expired shared entries
+STALE_TMP_AGE = 60  # Seconds after which a temporary file left by a crashed writer is removed
+
+class SharedFileCache:
+    """
+    Second cache tier kept in a directory shared by the worker processes of one host.
+
+    Each entry is a JSON file holding the wall clock expiry and the value,
+    named after a hash of its key and replaced atomically, so readers never
+    see a partial entry. Values must be JSON-serializable; a top-level list
+    is returned as a tuple, so (status, body) responses round-trip. The
+    file's mtime is set to its expiry, which lets a periodic sweep drop
+    expired entries and bound the directory with stat calls only.
+    File IO runs in the default executor.
+    """
+
+    def __init__(self, directory, max_entries=SHARED_MAX_ENTRIES, sweep_interval=SHARED_SWEEP_INTERVAL):
+        """
+        Args:
+            directory: Directory shared by the workers, created if missing
+            max_entries: Entry files kept before the soonest to expire are removed
+            sweep_interval: Seconds between sweeps, run after a write
+        """
+        self.directory = directory
+        self.max_entries = max_entries
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode()).hexdigest())
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            expires_at, value = entry["expires_at"], entry["value"]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable shared cache entry {path}: {e}")
+            return None
+        remaining = expires_at - time.time()
+        if remaining <= 0:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        return remaining, tuple(value) if isinstance(value, list) else value
+
+    def _write(self, key, value, seconds):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        expires_at = time.time() + seconds
+        with open(tmp_path, "w") as f:
+            json.dump({"expires_at": expires_at, "value": value}, f)
+        os.utime(tmp_path, (expires_at, expires_at))
+        os.replace(tmp_path, path)
+
+    def sweep(self) -> int:
+        """
+        Remove expired entries, stale temporary files and, above max_entries, the entries expiring soonest.
+
+        Returns:
+            int: Number of files removed
+        """
+        now = time.time()
+        entries, doomed = [], []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                try:
+                    mtime = item.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                if item.name.endswith(".tmp"):
+                    if mtime < now - STALE_TMP_AGE:
+                        doomed.append(item.path)
+                elif mtime <= now:
+                    doomed.append(item.path)
+                else:
+                    entries.append((mtime, item.path))
+        if len(entries) > self.max_entries:
+            entries.sort()
+            doomed.extend(path for _, path in entries[:len(entries) - self.max_entries])
+        removed = 0
+        for path in doomed:
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                # Another worker swept it first
+                pass
+        return removed
+
+    async def get(self, key):
+        """Return (seconds left, value) for a live entry, or None"""
+        return await asyncio.get_running_loop().run_in_executor(None, self._read, key)
+
+    async def put(self, key, value, seconds):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write, key, value, seconds)
+            if time.monotonic() >= self._next_sweep:
+                self._next_sweep = time.monotonic() + self.sweep_interval
+                removed = await loop.run_in_executor(None, self.sweep)
+                logger.debug(f"Shared cache sweep removed {removed} file(s) from {self.directory}")
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write shared cache entry: {e}")
+
+class AsyncTTLCache:
+    """
+    Bounded LRU cache whose entries expire after a per-entry TTL.
+
+    Concurrent lookups of a key that is being fetched share the same
+    in-flight request, so a burst of identical queries makes one upstream call.
+    """
+
+    def __init__(self, name, max_entries=1024, shared=None):
+        """
+        Args:
+            name: Name used in the statistics log
+            max_entries: Entries kept in memory before the least recently used is evicted
+            shared: Optional SharedFileCache consulted on a miss and filled after a fetch
+        """
+        self.name = name
+        self.max_entries = max_entries
+        self.shared = shared
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> task fetching the value
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.shared_hits = 0
+        self._lookups = 0
+
+    async def get_or_fetch(self, key, fetch, ttl):
+        """
+        Return the cached value for key, fetching it if missing or expired.
+
+        Args:
+            key: Hashable cache key
+            fetch: Coroutine function called without arguments to load the value
+            ttl: Seconds to keep the value, or a callable taking the value and
+                returning the seconds to keep it (None or 0 means do not cache)
+
+        Returns:
+            value: The cached or freshly fetched value
+        """
+        self._count_lookup()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, fetch, ttl))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shield the shared fetch so one cancelled caller does not cancel it for the others
+        return await asyncio.shield(task)
+
+    async def _load(self, key, fetch, ttl):
+        if self.shared is not None:
+            entry = await self.shared.get(key)
+            if entry is not None:
+                # Another worker fetched it; keep it for the rest of its lifetime
+                seconds, value = entry
+                self.shared_hits += 1
+                self._store(key, value, seconds)
+                return value
+        value = await fetch()
+        seconds = ttl(value) if callable(ttl) else ttl
+        if seconds:
+            self._store(key, value, seconds)
+            if self.shared is not None:
+                await self.shared.put(key, value, seconds)
+        return value
+
+    def _store(self, key, value, seconds):
+        self._entries[key] = (time.monotonic() + seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _count_lookup(self):
+        self._lookups += 1
+        if self._lookups % STATS_LOG_INTERVAL == 0:
+            self.log_stats()
+
+    def clear(self):
+        """Drop every cached entry"""
+        self._entries.clear()
+
+    def log_stats(self):
+        """Write hit/miss/eviction counters to the shared logger"""
+        logger.info(
+            f"{self.name} cache: size={len(self._entries)} hits={self.hits} misses={self.misses} "
+            f"coalesced={self.coalesced} evictions={self.evictions} shared_hits={self.shared_hits}"
+        )
@@ -3,15 +3,38 @@ Shared logging configuration for the Nasdaq Stock Assistant application.
 This ensures all modules log to the same files with consistent formatting.
 """
 import logging
-from log_utils import setup_logging
+import os
+from log_utils import bind_log_context, log_context, setup_logging
 
 # Common parameters for all loggers in the application
 APP_NAME = "nasdaq_assistant"
-LOG_LEVEL = logging.DEBUG
+LOG_LEVEL = logging.getLevelName(os.environ.get("LOG_LEVEL", "DEBUG").upper())
 MAX_LOGS = 20
+LOG_ASYNC = os.environ.get("LOG_ASYNC", "true").lower() == "true"  # Write logs from a background thread
+LOG_MAX_MESSAGE_CHARS = int(os.environ.get("LOG_MAX_MESSAGE_CHARS", 2000))  # Truncate large payloads in log records
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 50 * 1024 * 1024))  # Rotate the active log at this size
+LOG_ROTATE_INTERVAL = int(os.environ.get("LOG_ROTATE_INTERVAL", 24 * 3600))  # Rotate the active log after these seconds
+LOG_COMPRESSION = os.environ.get("LOG_COMPRESSION", "gzip")  # gzip, zstd or none for rotated segments
+LOG_RETENTION_BYTES = int(os.environ.get("LOG_RETENTION_BYTES", 1024 * 1024 * 1024))  # Total size of rotated segments kept
+LOG_RETENTION_DAYS = int(os.environ.get("LOG_RETENTION_DAYS", 14))  # Age after which rotated segments are deleted
+LOG_MULTIPROCESS = os.environ.get("LOG_MULTIPROCESS", "false").lower() == "true"  # Several workers share ./log
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()  # "json" writes structured records to the log file
 
 # Create a single logger instance to be imported by all modules
-logger = setup_logging(app_name=APP_NAME, log_level=LOG_LEVEL, max_logs=MAX_LOGS)
+logger = setup_logging(
+    app_name=APP_NAME,
+    log_level=LOG_LEVEL,
+    max_logs=MAX_LOGS,
+    async_mode=LOG_ASYNC,
+    max_message_chars=LOG_MAX_MESSAGE_CHARS,
+    max_bytes=LOG_MAX_BYTES,
+    rotate_interval=LOG_ROTATE_INTERVAL,
+    compression=LOG_COMPRESSION,
+    retention_bytes=LOG_RETENTION_BYTES,
+    retention_days=LOG_RETENTION_DAYS,
+    multiprocess=LOG_MULTIPROCESS,
+    json_format=LOG_FORMAT == "json"
+)
 
 def get_logger():
     """
@@ -0,0 +1,214 @@
+"""
+Shared asynchronous HTTP client for the stockdata.org API.
+
+All agent tools go through a single pooled aiohttp session so that upstream
+calls never block the Chainlit event loop and keep-alive connections are
+reused across chat sessions.
+"""
+import asyncio
+import datetime
+import json
+import os
+import time
+from zoneinfo import ZoneInfo
+import aiohttp
+from metrics import measure
+from quote_batcher import QuoteBatcher
+from resilience import RetryableError, Upstream, parse_retry_after
+from response_cache import AsyncTTLCache, SharedFileCache
+from shared_logging import logger
+
+# Constants
+STOCKDATA_BASE_URL = os.environ.get("STOCKDATA_BASE_URL", "https://api.stockdata.org/v1")
+STOCKDATA_API_TOKEN = os.environ.get("STOCKDATA_API_TOKEN", "zYrWkwgLVNH2Okm1GUyvsv437fEKSH8wNDxHl8w8")
+CONNECTION_LIMIT = int(os.environ.get("STOCKDATA_CONNECTION_LIMIT", 100))  # Total pooled connections
+CONNECTION_LIMIT_PER_HOST = int(os.environ.get("STOCKDATA_CONNECTION_LIMIT_PER_HOST", 20))  # Pooled connections per host
+CONNECT_TIMEOUT = 5  # Seconds to establish a connection
+READ_TIMEOUT = 30  # Seconds to wait between bytes of a response
+REQUEST_TIMEOUT = float(os.environ.get("STOCKDATA_REQUEST_TIMEOUT", 8))  # Seconds for one attempt, end to end
+RATE_LIMIT = float(os.environ.get("STOCKDATA_RATE_LIMIT", 10))  # Requests per second allowed by the API plan, 0 disables
+RATE_LIMIT_BURST = int(os.environ.get("STOCKDATA_RATE_LIMIT_BURST", 10))  # Requests sent at once before the rate applies
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+KEEPALIVE_TIMEOUT = 30  # Seconds an idle connection stays in the pool
+CACHE_MAX_ENTRIES = int(os.environ.get("STOCKDATA_CACHE_MAX_ENTRIES", 2048))  # Bounded LRU size for responses
+QUOTE_CACHE_TTL = 15  # Seconds a quote stays fresh
+QUOTE_BATCH_WINDOW = float(os.environ.get("STOCKDATA_QUOTE_BATCH_WINDOW", 0.03))  # Seconds to collect quote requests
+QUOTE_SYMBOL_LIMIT = int(os.environ.get("STOCKDATA_QUOTE_SYMBOL_LIMIT", 3))  # Symbols per quote request allowed by the API plan
+SHARED_CACHE_DIR = os.environ.get("STOCKDATA_SHARED_CACHE_DIR")  # Directory shared by workers on one host, unset disables
+NEWS_CACHE_TTL = 300  # Seconds a news page stays fresh
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+MARKET_CLOSE_TIME = datetime.time(16, 0)  # Regular session close, exchange local time
+
+_session = None
+_session_loop = None
+_upstream = Upstream("stockdata", rate=RATE_LIMIT, burst=RATE_LIMIT_BURST)
+_response_cache = AsyncTTLCache(
+    "stockdata", max_entries=CACHE_MAX_ENTRIES, shared=SharedFileCache(SHARED_CACHE_DIR) if SHARED_CACHE_DIR else None
+)
+_quote_batcher = QuoteBatcher(
+    lambda symbols: fetch_json("data/quote", {"symbols": symbols}),
+    window=QUOTE_BATCH_WINDOW,
+    max_symbols=QUOTE_SYMBOL_LIMIT,
+)
+
+def normalize_symbols(symbols):
+    """
+    Normalize a comma-separated symbol list so equivalent requests share a cache key.
+
+    Args:
+        symbols: Symbols separated by commas, e.g. "aapl, MSFT"
+
+    Returns:
+        str: Upper-cased, de-duplicated and sorted symbols, e.g. "AAPL,MSFT"
+    """
+    return ",".join(sorted({s.strip().upper() for s in str(symbols).split(",") if s.strip()}))
+
+def last_market_close_date(now=None):
+    """
+    Date of the most recent regular market close, skipping weekends.
+
+    This is the newest date an end-of-day bar can exist for.
+    """
+    now = now or datetime.datetime.now(MARKET_TIMEZONE)
+    day = now.date()
+    if now.time() < MARKET_CLOSE_TIME:
+        day -= datetime.timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= datetime.timedelta(days=1)
+    return day
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Get the shared client session, creating it on first use.
+
+    The session is bound to the running event loop, so a new one is created
+    if the previous session was closed or belongs to another loop.
+
+    Returns:
+        session: The pooled aiohttp client session
+    """
+    global _session, _session_loop
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.closed or _session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=CONNECTION_LIMIT,
+            limit_per_host=CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        )
+        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT, sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT)
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={"Content-Type": "application/json"},
+        )
+        _session_loop = loop
+        logger.debug("Created pooled stockdata HTTP session")
+    return _session
+
+async def fetch_json(endpoint, params):
+    """
+    Perform a GET request against a stockdata.org endpoint.
+
+    Requests are rate limited to the API plan, 429/5xx responses and network
+    errors are retried with backoff (honoring Retry-After), and calls fail
+    fast with CircuitOpenError while the API is down.
+
+    Args:
+        endpoint: Path of the endpoint relative to STOCKDATA_BASE_URL (e.g. "data/quote")
+        params: Query parameters, without the API token
+
+    Returns:
+        tuple: (HTTP status code, decoded JSON body); the last error response once retries are exhausted
+    """
+    return await _upstream.call(
+        lambda: _fetch_once(endpoint, params),
+        retryable=(RetryableError, aiohttp.ClientConnectionError, asyncio.TimeoutError),
+    )
+
+async def _fetch_once(endpoint, params):
+    session = get_session()
+    url = f"{STOCKDATA_BASE_URL.rstrip('/')}/{endpoint.lstrip('/')}"
+    query = {"api_token": STOCKDATA_API_TOKEN, **params}
+    start_time = time.perf_counter()
+    with measure(f"stockdata.{endpoint}"):
+        async with session.get(url, params=query) as response:
+            body = await response.read()
+            status = response.status
+            headers = response.headers
+    duration = time.perf_counter() - start_time
+    logger.debug(
+        f"stockdata {endpoint} returned {status} in {duration:.3f}s",
+        extra={"endpoint": endpoint, "status": status, "duration_ms": round(duration * 1000, 1), "bytes": len(body)}
+    )
+    if status in RETRYABLE_STATUSES:
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = {"error": {"code": status, "message": body[:200].decode("utf-8", "replace")}}
+        raise RetryableError(
+            f"HTTP {status} from {endpoint}", retry_after=parse_retry_after(headers), result=(status, payload)
+        )
+    return status, json.loads(body)
+
+async def fetch_json_cached(endpoint, params, ttl):
+    """
+    Perform a GET request through the shared response cache.
+
+    Identical in-flight requests are coalesced and only successful responses are cached.
+
+    Args:
+        endpoint: Path of the endpoint relative to STOCKDATA_BASE_URL
+        params: Query parameters, without the API token
+        ttl: Seconds to cache a successful response, or a callable returning them
+
+    Returns:
+        tuple: (HTTP status code, decoded JSON body)
+    """
+    key = (endpoint, tuple(sorted(params.items())))
+    return await _response_cache.get_or_fetch(key, lambda: fetch_json(endpoint, params), _success_ttl(ttl))
+
+async def fetch_quotes(symbols):
+    """
+    Get quotes through the response cache and the micro-batching dispatcher.
+
+    Cache misses from concurrent sessions are merged into multi-symbol upstream calls.
+
+    Args:
+        symbols: One or more symbols separated by commas
+
+    Returns:
+        tuple: (HTTP status code, decoded JSON body)
+    """
+    symbols = normalize_symbols(symbols)
+    key = ("data/quote", (("symbols", symbols),))
+    return await _response_cache.get_or_fetch(
+        key, lambda: _quote_batcher.fetch(symbols), _success_ttl(QUOTE_CACHE_TTL)
+    )
+
+def _success_ttl(ttl):
+    """Build a cache TTL resolver that only keeps successful responses"""
+    def resolve(result):
+        status, _ = result
+        if status != 200:
+            return None
+        return ttl() if callable(ttl) else ttl
+    return resolve
+
+async def close_session():
+    """Close the shared client session and release pooled connections."""
+    global _session, _session_loop
+    _response_cache.log_stats()
+    session, session_loop = _session, _session_loop
+    _session, _session_loop = None, None
+    if session is None or session.closed:
+        return
+    try:
+        if session_loop is asyncio.get_running_loop():
+            await session.close()
+            logger.info("Closed stockdata HTTP session")
+        else:
+            # The owning loop is gone (e.g. atexit shutdown); its sockets die with it
+            logger.debug("Dropped stockdata HTTP session from a finished event loop")
+    except Exception as e:
+        logger.error(f"Error closing stockdata HTTP session: {e}")
@@ -0,0 +1,98 @@
+"""
+Lifecycle of agent conversation threads.
+
+New chat sessions take a thread from a small pool of pre-created threads, so
+session start does not wait on `create_thread`. Runs only see the most recent
+messages of their thread, and replies are read with a single-message
+`list_messages` call scoped to the run.
+"""
+import asyncio
+import os
+from azure.ai.projects.models import ListSortOrder, TruncationObject, TruncationStrategy
+from agents_api import call_agents
+from shared_logging import logger
+
+# Constants
+THREAD_POOL_SIZE = int(os.environ.get("THREAD_POOL_SIZE", 4))  # Pre-created threads kept ready, 0 disables
+THREAD_HISTORY_MESSAGES = int(os.environ.get("THREAD_HISTORY_MESSAGES", 20))  # Messages a run sees, 0 lets the service decide
+
+class ThreadPool:
+    """Pool of pre-created, unused agent threads that is refilled in the background"""
+
+    def __init__(self, agents, size=THREAD_POOL_SIZE):
+        """
+        Args:
+            agents: The `AIProjectClient.agents` operations of the shared client
+            size: Number of threads to keep ready
+        """
+        self.agents = agents
+        self.size = size
+        self._threads = []
+        self._refill_task = None
+        self._closed = False
+
+    async def _create(self):
+        return await call_agents("create_thread", self.agents.create_thread, idempotent=False)
+
+    def start(self):
+        """Start filling the pool in the background"""
+        self._schedule_refill()
+
+    def _schedule_refill(self):
+        if self._closed or len(self._threads) >= self.size:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.ensure_future(self._refill())
+
+    async def _refill(self):
+        try:
+            while not self._closed and len(self._threads) < self.size:
+                missing = self.size - len(self._threads)
+                threads = await asyncio.gather(*(self._create() for _ in range(missing)))
+                self._threads.extend(threads)
+            logger.debug(f"Thread pool filled with {len(self._threads)} thread(s)")
+        except Exception as e:
+            # Sessions fall back to creating their thread on demand
+            logger.warning(f"Failed to refill thread pool: {e}")
+
+    async def acquire(self):
+        """Return an unused thread, from the pool when one is ready"""
+        if self._threads:
+            thread = self._threads.pop()
+            self._schedule_refill()
+            return thread
+        self._schedule_refill()
+        return await self._create()
+
+    async def close(self):
+        """Stop refilling and delete the threads no session has used"""
+        self._closed = True
+        if self._refill_task is not None and not self._refill_task.done():
+            self._refill_task.cancel()
+        threads, self._threads = self._threads, []
+        results = await asyncio.gather(
+            *(self.agents.delete_thread(thread.id) for thread in threads), return_exceptions=True
+        )
+        failures = sum(isinstance(result, Exception) for result in results)
+        if threads:
+            logger.info(f"Deleted {len(threads) - failures} pooled thread(s)")
+
+def truncation_strategy():
+    """Return the truncation applied to every run, or None to let the service decide"""
+    if THREAD_HISTORY_MESSAGES <= 0:
+        return None
+    return TruncationObject(type=TruncationStrategy.LAST_MESSAGES, last_messages=THREAD_HISTORY_MESSAGES)
+
+async def latest_response(agents, thread_id, run_id=None):
+    """
+    Return the text of the newest message of a thread without listing its whole history.
+
+    Args:
+        agents: The `AIProjectClient.agents` operations of the shared client
+        thread_id: The thread to read
+        run_id: Optional run whose reply is wanted
+    """
+    messages = await call_agents("list_messages", lambda: agents.list_messages(
+        thread_id=thread_id, run_id=run_id, limit=1, order=ListSortOrder.DESCENDING
+    ))
+    return messages['data'][0]['content'][0]['text']['value']
@@ -0,0 +1,117 @@
+"""
+Process-wide Azure AD token cache with proactive background refresh.
+
+`TokenManager` wraps an async credential such as `DefaultAzureCredential` and
+is passed to every client in place of it. Tokens are acquired at startup,
+shared by all sessions and clients, and refreshed in the background before
+they expire, so no user request waits on the credential chain.
+"""
+import asyncio
+import os
+import time
+from metrics import measure
+from shared_logging import logger
+
+# Constants
+TOKEN_REFRESH_MARGIN = int(os.environ.get("TOKEN_REFRESH_MARGIN", 300))  # Seconds before expiry to refresh
+TOKEN_RETRY_INTERVAL = 30  # Seconds between refresh attempts after a failure
+TOKEN_MIN_REFRESH_DELAY = 1  # Lower bound between refreshes for very short-lived tokens
+
+class TokenManager:
+    """Async credential that serves cached tokens and refreshes them ahead of expiry"""
+
+    def __init__(self, credential, refresh_margin=TOKEN_REFRESH_MARGIN):
+        """
+        Args:
+            credential: The underlying async credential, e.g. DefaultAzureCredential
+            refresh_margin: Seconds before expiry at which a token is refreshed
+        """
+        self.credential = credential
+        self.refresh_margin = refresh_margin
+        self._tokens = {}  # (scopes, tenant_id) -> AccessToken
+        self._in_flight = {}  # (scopes, tenant_id) -> acquisition task
+        self._refresh_tasks = {}  # (scopes, tenant_id) -> background refresh task
+
+    async def start(self, *scopes):
+        """Acquire a token for the scopes now and keep it refreshed in the background"""
+        await self.get_token(*scopes)
+
+    async def get_token(self, *scopes, claims=None, tenant_id=None, **kwargs):
+        """
+        Return a token for the scopes, from the cache unless it is about to expire.
+
+        Requests carrying claims (e.g. a CAE challenge) always go to the credential.
+        """
+        if claims:
+            return await self._acquire(scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+        key = (scopes, tenant_id)
+        token = self._tokens.get(key)
+        if token is not None and token.expires_on - time.time() > self.refresh_margin:
+            return token
+        task = self._in_flight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            # One acquisition per scope; concurrent callers share it
+            task = asyncio.ensure_future(self._acquire(scopes, tenant_id=tenant_id, **kwargs))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda t, key=key: self._store(key, t))
+        return await asyncio.shield(task)
+
+    async def _acquire(self, scopes, **kwargs):
+        start_time = time.perf_counter()
+        with measure("credential.get_token"):
+            token = await self.credential.get_token(*scopes, **kwargs)
+        logger.info(
+            f"Acquired token for {', '.join(scopes)} in {time.perf_counter() - start_time:.3f}s, "
+            f"expires in {token.expires_on - time.time():.0f}s"
+        )
+        return token
+
+    def _store(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._tokens[key] = task.result()
+        self._schedule_refresh(key)
+
+    def _schedule_refresh(self, key):
+        refresh_task = self._refresh_tasks.get(key)
+        if refresh_task is None or refresh_task.done():
+            self._refresh_tasks[key] = asyncio.ensure_future(self._refresh(key))
+
+    async def _refresh(self, key):
+        """Refresh the token of one scope ahead of expiry for as long as the manager is open"""
+        scopes, tenant_id = key
+        while True:
+            token = self._tokens[key]
+            delay = token.expires_on - time.time() - self.refresh_margin
+            await asyncio.sleep(max(delay, TOKEN_MIN_REFRESH_DELAY))
+            try:
+                self._tokens[key] = await self._acquire(scopes, tenant_id=tenant_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Keep serving the current token while it is valid and retry shortly
+                logger.warning(f"Token refresh for {', '.join(scopes)} failed: {e}")
+                if self._tokens[key].expires_on <= time.time():
+                    del self._tokens[key]
+                    return
+                await asyncio.sleep(TOKEN_RETRY_INTERVAL)
+
+    async def close(self):
+        """Stop background refreshes and close the underlying credential"""
+        tasks = list(self._refresh_tasks.values()) + list(self._in_flight.values())
+        self._refresh_tasks.clear()
+        self._in_flight.clear()
+        self._tokens.clear()
+        for task in tasks:
+            if not task.done():
+                try:
+                    task.cancel()
+                except RuntimeError:
+                    # The owning loop is already closed (e.g. atexit shutdown)
+                    pass
+        try:
+            await self.credential.close()
+        except Exception as e:
+            logger.debug(f"Error closing credential: {e}")
@@ -0,0 +1,189 @@
+"""
+Compaction of tool outputs before they are submitted to the agent.
+
+Raw stockdata.org responses carry many fields the assistant never uses
+(entity highlights, similar articles, exchange codes, full daily histories).
+Each tool's output is projected to the fields the assistant needs, numeric
+noise is rounded away, long series are summarized as head/tail rows plus
+statistics, and every output is kept within a byte budget.
+"""
+import json
+import os
+from shared_logging import logger
+
+# Constants
+TOOL_OUTPUT_COMPACTION = os.environ.get("TOOL_OUTPUT_COMPACTION", "true").lower() != "false"
+TOOL_OUTPUT_MAX_BYTES = int(os.environ.get("TOOL_OUTPUT_MAX_BYTES", 12000))  # Per tool output
+SIGNIFICANT_DIGITS = 6  # Enough for prices and volumes, drops float noise such as 187.33999999
+SERIES_FULL_ROWS = 30  # Series up to this length are returned row by row
+SERIES_EDGE_ROWS = 5  # Rows kept from each end of a summarized series
+SNIPPET_MAX_CHARS = 200
+BYTES_PER_TOKEN = 4  # Rough estimate for English text and JSON
+
+QUOTE_FIELDS = (
+    "ticker", "name", "currency", "price", "day_change", "day_open", "day_high", "day_low",
+    "previous_close_price", "52_week_high", "52_week_low", "market_cap", "volume",
+    "is_extended_hours_price", "last_trade_time",
+)
+NEWS_FIELDS = ("uuid", "title", "description", "snippet", "url", "published_at", "source")
+NEWS_META_FIELDS = ("found", "returned", "limit", "page")
+ENTITY_FIELDS = ("symbol", "name", "sentiment_score")
+EOD_FIELDS = ("open", "high", "low", "close", "volume")
+
+def estimate_tokens(text) -> int:
+    """Approximate the number of model tokens in a string"""
+    return (len(text.encode("utf-8")) + BYTES_PER_TOKEN - 1) // BYTES_PER_TOKEN
+
+def round_numbers(value, digits=SIGNIFICANT_DIGITS):
+    """Round every float nested in dicts and lists to a number of significant digits"""
+    if isinstance(value, float):
+        return float(f"{value:.{digits}g}")
+    if isinstance(value, dict):
+        return {k: round_numbers(v, digits) for k, v in value.items()}
+    if isinstance(value, list):
+        return [round_numbers(v, digits) for v in value]
+    return value
+
+def _project(item, fields):
+    return {field: item[field] for field in fields if item.get(field) is not None}
+
+def _compact_quote(payload):
+    return {
+        "meta": payload.get("meta", {}),
+        "data": [_project(quote, QUOTE_FIELDS) for quote in payload.get("data", [])],
+    }
+
+def _compact_news(payload):
+    articles = []
+    for article in payload.get("data", []):
+        compact = _project(article, NEWS_FIELDS)
+        snippet = compact.get("snippet")
+        if snippet and len(snippet) > SNIPPET_MAX_CHARS:
+            compact["snippet"] = snippet[:SNIPPET_MAX_CHARS].rstrip() + "..."
+        # Highlights and similar articles are dropped; the per-entity sentiment is kept
+        compact["entities"] = [_project(entity, ENTITY_FIELDS) for entity in article.get("entities") or []]
+        articles.append(compact)
+    return {"meta": _project(payload.get("meta", {}), NEWS_META_FIELDS), "data": articles}
+
+def summarize_series(rows, fields, key="date"):
+    """
+    Summarize rows ordered newest first as head/tail rows and per-field statistics.
+
+    Args:
+        rows: List of flat dicts containing `key` and the numeric `fields`
+        fields: Numeric fields to compute statistics for
+
+    Returns:
+        dict: "rows" (count), "first"/"last" dates, "stats" per field, "newest" and "oldest" edge rows
+    """
+    stats = {}
+    for field in fields:
+        values = [row[field] for row in rows if row.get(field) is not None]
+        if not values:
+            continue
+        # Rows are newest first, so the period starts at the end of the list
+        first, last = values[-1], values[0]
+        stats[field] = {
+            "first": first, "last": last, "min": min(values), "max": max(values),
+            "mean": sum(values) / len(values),
+            "change_pct": (last - first) / first * 100 if first else None,
+        }
+    return {
+        "rows": len(rows),
+        "first": rows[-1].get(key) if rows else None,
+        "last": rows[0].get(key) if rows else None,
+        "stats": stats,
+        "newest": rows[:SERIES_EDGE_ROWS],
+        "oldest": rows[-SERIES_EDGE_ROWS:],
+    }
+
+def _compact_eod(payload):
+    rows = []
+    for record in payload.get("data", []):
+        row = {"date": str(record.get("date", ""))[:10]}
+        row.update(_project(record.get("data") or {}, EOD_FIELDS))
+        rows.append(row)
+    compact = {"meta": payload.get("meta", {})}
+    if len(rows) <= SERIES_FULL_ROWS:
+        compact["data"] = rows
+    else:
+        compact["summary"] = summarize_series(rows, EOD_FIELDS)
+        compact["note"] = (
+            f"{len(rows)} daily bars summarized; request a narrower date range for individual days "
+            "or use plot_historical_eod / get_technical_indicators"
+        )
+    return compact
+
+# Tool name -> projection of its parsed JSON output
+COMPACTORS = {
+    "get_quote": _compact_quote,
+    "get_news": _compact_news,
+    "get_historical_eod": _compact_eod,
+}
+
+def _dumps(payload):
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+def _largest_list(payload):
+    """Return the longest list among the top-level values and their direct children, meta excluded"""
+    candidates = []
+    for key, value in payload.items():
+        # meta never holds data rows; lists such as a portfolio's pending symbols tell the model what is missing
+        if key == "meta":
+            continue
+        if isinstance(value, list):
+            candidates.append(value)
+        elif isinstance(value, dict):
+            candidates.extend(v for v in value.values() if isinstance(v, list))
+    return max(candidates, key=len, default=None)
+
+def enforce_budget(payload, max_bytes=TOOL_OUTPUT_MAX_BYTES) -> str:
+    """
+    Serialize a payload, dropping trailing list items until it fits the byte budget.
+
+    The result always stays valid JSON; an "omitted" count tells the model how much was cut.
+    """
+    text = _dumps(payload)
+    omitted = 0
+    while len(text.encode("utf-8")) > max_bytes:
+        items = _largest_list(payload)
+        if not items:
+            break
+        drop = max(1, len(items) // 4)
+        del items[-drop:]
+        omitted += drop
+        payload["omitted"] = omitted
+        text = _dumps(payload)
+    return text
+
+def compact_tool_output(name, output):
+    """
+    Compact one tool output for submission to the agent.
+
+    Args:
+        name: Name of the function that produced the output
+        output: The output string returned by the function tool
+
+    Returns:
+        str: The compacted output, or the original output if it is not JSON or is an error
+    """
+    if not TOOL_OUTPUT_COMPACTION or not isinstance(output, str):
+        return output
+    try:
+        payload = json.loads(output)
+    except ValueError:
+        return output
+    if not isinstance(payload, dict) or "error" in payload:
+        return output
+    compactor = COMPACTORS.get(name)
+    if compactor is not None:
+        payload = compactor(payload)
+    compacted = enforce_budget(round_numbers(payload))
+    if len(compacted) >= len(output):
+        return output
+    logger.debug(
+        f"Compacted {name} output from {len(output)} to {len(compacted)} bytes "
+        f"(~{estimate_tokens(output) - estimate_tokens(compacted)} tokens saved)",
+        extra={"tool": name, "bytes": len(compacted), "raw_bytes": len(output)}
+    )
+    return compacted
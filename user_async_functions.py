@@ -1,51 +1,73 @@
 # Python 3
-import requests
+import asyncio
+import importlib
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
+import os
 from typing import Set, Callable, Any
 from shared_logging import logger
+from stockdata_client import (
+    NEWS_CACHE_TTL,
+    QUOTE_SYMBOL_LIMIT,
+    fetch_json_cached,
+    fetch_quotes,
+    normalize_symbols,
+)
+from eod_store import bars_to_records, get_eod_bars
+from news_prefetcher import get_prefetcher, merge_articles
+from chart_store import get_chart_store
+
+NEWS_ARTICLES_PER_SYMBOL = 2  # Articles returned per symbol by get_news
+PORTFOLIO_CONCURRENCY = int(os.environ.get("PORTFOLIO_CONCURRENCY", 8))  # Upstream fetches in flight per portfolio call
+PORTFOLIO_MAX_SYMBOLS = 500  # Symbols accepted by one get_portfolio_summary call
+PORTFOLIO_FETCH_DEADLINE = float(os.environ.get("PORTFOLIO_FETCH_DEADLINE", 20))  # Seconds of fetching before answering with what is loaded; keep below TOOL_TIMEOUT
+
+_lazy_modules = {}  # Modules imported on first use, added once fully initialized
+_background_fetches = set()  # Portfolio fetches still running after their call answered, referenced until done
+
+async def import_off_loop(name):
+    """
+    Import a module on a worker thread the first time a tool needs it.
+
+    pandas and matplotlib take about a second to import, so the chart and
+    indicator modules are only loaded when one of their tools first runs.
+    """
+    module = _lazy_modules.get(name)
+    if module is None:
+        # The import lock makes concurrent first calls wait for one complete import
+        module = await asyncio.get_running_loop().run_in_executor(None, importlib.import_module, name)
+        _lazy_modules[name] = module
+    return module
 
 async def plot_time_series(data):
     """
-    Plot a time series starting from the json data and return it as an in-memory image.
+    Plot a time series starting from the json data. The chart is shown to the user with the reply.
     
-    This function creates a time series plot from the provided JSON data and returns
-    it as binary data that can be directly displayed in a Chainlit interface without
-    saving to disk.
+    The rendered image is kept in the chart store; only a short reference to it is
+    returned, and the Chainlit handler attaches the image to the answer.
     
     :param data: The JSON response from the API containing time series data
-    :return: Dictionary with keys:
-        - image_data: Binary representation of the PNG image
-        - mime_type: The MIME type of the image (image/png)
+    :return: The JSON response organized as follows:
+        chart_id:                                       Reference of the chart attached to the reply.
+        mime_type:                                      The MIME type of the image.
+        bytes:                                          Size of the image.
     """
     logger.info(f'plot_time_series() tool used.')
     logger.info('Entering in plot_time_series()')
-    # Convert the JSON response to a pandas DataFrame
-    logger.debug(f'working on data: {data}')
-    df = pd.DataFrame(data['data'])
-    # Convert the date column to datetime
-    df['date'] = pd.to_datetime(df['date'])
-    # Set the date as the index
-    df.set_index('date', inplace=True)
-    
-    # Create the plot
-    plt.figure(figsize=(10, 6))
-    fig = df.plot().get_figure()
-    
-    # Create in-memory representation for Chainlit
-    import io
-    img_buf = io.BytesIO()
-    fig.savefig(img_buf, format='png')
-    img_buf.seek(0)
+    # Lazy formatting: the payload is only rendered if DEBUG is enabled
+    logger.debug('working on data: %s', data)
+    # The tool schema declares data as a string, so the agent passes the JSON text
+    if isinstance(data, str):
+        try:
+            data = json.loads(data)
+        except json.JSONDecodeError as e:
+            return json.dumps({"error": str(e), "message": "Failed to parse the time series data"})
+    # Render on the shared pool; identical series are served from the image cache
+    chart_renderer = await import_off_loop("chart_renderer")
+    image_data, mime_type = await chart_renderer.render_time_series(data['data'])
     
-    plt.close(fig)  # Close the figure to free memory
-    
-    # Return only image data needed for Chainlit
-    return {
-        "image_data": img_buf.getvalue(),
-        "mime_type": "image/png"
-    }
+    # The agent only needs a reference; the image itself goes to the user
+    chart_id = await get_chart_store().put(image_data, mime_type)
+    return json.dumps({"chart_id": chart_id, "mime_type": mime_type, "bytes": len(image_data)})
 
 async def get_news(symbols) -> str:
     """
@@ -84,21 +106,38 @@ async def get_news(symbols) -> str:
     """
     logger.info(f'get_news() tool used.')
     logger.info(f'Getting news for symbol(s): {symbols}')
-    # Define the endpoint
-    url = "https://api.stockdata.org//v1/news/all"
-    headers = {
-        "Content-Type": "application/json"
-    }
+    symbol_list = normalize_symbols(symbols).split(",")
+    prefetcher = get_prefetcher()
+    prefetcher.watchlist.record(symbol_list)
+    # Popular symbols are served from the background-refreshed news index
+    articles, cold = prefetcher.cached_news(symbol_list, NEWS_ARTICLES_PER_SYMBOL)
+    # Symbols being refreshed are served from the index once their refresh lands, not fetched twice
+    refreshing = prefetcher.warm(cold)
+    if refreshing:
+        # Shielded: the refresh is shared, a cancelled tool call must not abort it
+        results = await asyncio.gather(*(asyncio.shield(task) for task in refreshing.values()), return_exceptions=True)
+        for symbol, result in zip(refreshing, results):
+            if not isinstance(result, BaseException):
+                articles.extend(prefetcher.index.latest(symbol, NEWS_ARTICLES_PER_SYMBOL))
+                cold.remove(symbol)
+    if not cold:
+        logger.debug(f'get_news() served {symbols} from the prefetched index')
+        return json.dumps({
+            "meta": {"found": len(articles), "returned": len(articles), "limit": NEWS_ARTICLES_PER_SYMBOL, "page": 1},
+            "data": merge_articles(articles)
+        })
     params = {
-        "api_token": "zYrWkwgLVNH2Okm1GUyvsv437fEKSH8wNDxHl8w8",
-        "symbols": symbols,
-        "limit": 2
+        "symbols": ",".join(cold),
+        "limit": NEWS_ARTICLES_PER_SYMBOL
     }
-    # Make the GET request
+    # Make the GET request on the shared session, served from cache when fresh
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response_json = response.json()
-        logger.debug(f'get_news() response status: {response.status_code}')
+        status, response_json = await fetch_json_cached("news/all", params, NEWS_CACHE_TTL)
+        logger.debug(f'get_news() response status: {status}')
+        if articles and status == 200:
+            # Combine the live articles of the cold symbols with the indexed ones
+            data = merge_articles(articles, response_json.get("data", []))
+            response_json = {**response_json, "data": data, "meta": {**response_json.get("meta", {}), "returned": len(data)}}
         # Return the JSON response
         return json.dumps(response_json)
     except Exception as e:
@@ -135,34 +174,26 @@ async def get_quote(symbols) -> str:
     """
     logger.info(f'get_quote() tool used.')
     logger.info(f'Getting quote for symbol(s): {symbols}')
-    # Define the endpoint
-    url = "https://api.stockdata.org/v1/data/quote"
-    headers = {
-        "Content-Type": "application/json"
-    }
-    params = {
-        "api_token": "zYrWkwgLVNH2Okm1GUyvsv437fEKSH8wNDxHl8w8",
-        "symbols": symbols
-    }
-    # Make the GET request
+    # Make the GET request on the shared session, served from cache when fresh
+    # and batched with concurrent quote requests from other sessions
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response_json = response.json()
-        logger.debug(f'get_quote() response status: {response.status_code}')
+        status, response_json = await fetch_quotes(symbols)
+        logger.debug(f'get_quote() response status: {status}')
         # Return the JSON response
         return json.dumps(response_json)
     except Exception as e:
         logger.error(f"Error getting quotes: {e}")
         return json.dumps({"error": str(e), "message": "Failed to get quote data"})
 
-async def get_historical_eod(symbol) -> str:
+async def get_historical_eod(symbol, date_from=None, date_to=None) -> str:
     """
     Get historical end of day data for US stocks, adjusted for splits.
-    :param symbol: One symbol to get the quotes for
+    :param symbol: One symbol, or several separated by commas, to get the quotes for
+    :param date_from: Optional first date to include, formatted as YYYY-MM-DD
+    :param date_to: Optional last date to include, formatted as YYYY-MM-DD
     :return: The JSON response organized as follows:
         meta > date_from:   	Date that data was collected from.
         meta > date_to:     	Date that data was collected to. This will be overridden if the interval max period is exceeded.
-        meta > max_period_days:	Max period in days depending on the interval. Will return null if no max period is specified for the interval.
         data > date:        	Date of the related data (local time).
         data > ticker:      	The symbol/ticker of the quote.
         data > data > open:	    Open price for the specified date/time range.
@@ -173,31 +204,208 @@ async def get_historical_eod(symbol) -> str:
     """
     logger.info(f'get_historical_eod() tool used.')
     logger.info(f'Getting historical quotes for symbol: {symbol}')
-    # Define the endpoint
-    url = "https://api.stockdata.org/v1/data/eod"
-    headers = {
-        "Content-Type": "application/json"
-    }
-    params = {
-        "api_token": "zYrWkwgLVNH2Okm1GUyvsv437fEKSH8wNDxHl8w8",
-        "symbols": symbol
-    }
-    # Make the GET request
+    symbol_list = normalize_symbols(symbol).split(",")
+    # Serve from the local EOD store, downloading only the days it is missing; one lookup per ticker
     try:
-        response = requests.get(url, headers=headers, params=params)
-        response_json = response.json()
-        logger.debug(f'get_historical_eod() response status: {response.status_code}')
+        bars = await asyncio.gather(*(get_eod_bars(s, date_from, date_to) for s in symbol_list))
+        records = [record for s, columns in zip(symbol_list, bars) for record in bars_to_records(s, columns)]
+        # Newest first across tickers, as the data/eod endpoint returns them
+        records.sort(key=lambda record: record["date"], reverse=True)
+        response_json = {
+            "meta": {
+                "date_from": records[-1]["date"] if records else date_from,
+                "date_to": records[0]["date"] if records else date_to
+            },
+            "data": records
+        }
         # Return the JSON response
         return json.dumps(response_json)
     except Exception as e:
         logger.error(f"Error getting historical data: {e}")
         return json.dumps({"error": str(e), "message": "Failed to get historical data"})
 
+async def plot_historical_eod(symbol, date_from=None, date_to=None, fields="close", resample=None):
+    """
+    Fetch historical end of day data for one US stock and plot it in a single step, without returning the raw data; prefer this over get_historical_eod followed by plot_time_series when the user wants a chart.
+    :param symbol: One symbol to plot
+    :param date_from: Optional first date to include, formatted as YYYY-MM-DD
+    :param date_to: Optional last date to include, formatted as YYYY-MM-DD
+    :param fields: Comma-separated fields to plot among open, high, low, close, volume (default: close)
+    :param resample: Optional period to aggregate daily bars into: weekly or monthly
+    :return: The JSON response organized as follows:
+        chart_id:                                       Reference of the chart attached to the reply.
+        mime_type:                                      The MIME type of the image.
+        bytes:                                          Size of the image.
+        summary:                                        Date range, number of bars and first/last/min/max/change_pct for each plotted field.
+    """
+    logger.info(f'plot_historical_eod() tool used.')
+    logger.info(f'Plotting historical quotes for symbol: {symbol}')
+    symbol = normalize_symbols(symbol)
+    field_list = [f.strip().lower() for f in fields.split(",") if f.strip()]
+    try:
+        if resample and resample not in ("weekly", "monthly"):
+            raise ValueError(f"Unsupported resample period: {resample}")
+        records = bars_to_records(symbol, await get_eod_bars(symbol, date_from, date_to))
+        if not records:
+            return json.dumps({"error": "no data", "message": f"No historical data available for {symbol}"})
+        # Downsample and render inside the process; only the image and a summary go back to the agent
+        chart_renderer = await import_off_loop("chart_renderer")
+        image_data, mime_type, summary = await chart_renderer.render_eod_chart(records, symbol, field_list, resample)
+        chart_id = await get_chart_store().put(image_data, mime_type)
+        return json.dumps({"chart_id": chart_id, "mime_type": mime_type, "bytes": len(image_data), "summary": summary})
+    except Exception as e:
+        logger.error(f"Error plotting historical data: {e}")
+        return json.dumps({"error": str(e), "message": "Failed to plot historical data"})
+
+async def get_technical_indicators(symbols, indicators="sma,ema,rsi,macd,bollinger,volatility,drawdown", window=20, date_from=None, date_to=None) -> str:
+    """
+    Compute technical indicators from historical end of day data for one or more symbols at once; use this instead of computing indicators from get_historical_eod data.
+    :param symbols: One or more symbols, separated by commas
+    :param indicators: Comma-separated indicators among sma, ema, rsi, macd, bollinger, volatility, drawdown
+    :param window: Look-back window in trading days for sma, ema, bollinger and volatility (default: 20)
+    :param date_from: Optional first date of the history to use, formatted as YYYY-MM-DD
+    :param date_to: Optional last date of the history to use, formatted as YYYY-MM-DD
+    :return: The JSON response organized as follows:
+        data > <symbol> > as_of:                        Date of the latest bar used.
+        data > <symbol> > bars:                         Number of daily bars used.
+        data > <symbol> > close:                        Latest close price.
+        data > <symbol> > sma_<window>:                 Simple moving average.
+        data > <symbol> > ema_<window>:                 Exponential moving average.
+        data > <symbol> > rsi_14:                       Relative strength index.
+        data > <symbol> > macd, macd_signal, macd_histogram:   MACD (12, 26, 9).
+        data > <symbol> > bollinger_lower, bollinger_middle, bollinger_upper:   Bollinger bands (2 standard deviations).
+        data > <symbol> > volatility_<window>d_annualized:     Annualized volatility of daily log returns.
+        data > <symbol> > max_drawdown_pct:             Largest peak-to-trough decline in percent over the period.
+    """
+    logger.info(f'get_technical_indicators() tool used.')
+    logger.info(f'Computing {indicators} for symbol(s): {symbols}')
+    try:
+        names = [name.strip().lower() for name in indicators.split(",") if name.strip()]
+        indicators_module = await import_off_loop("indicators")
+        unknown = [name for name in names if name not in indicators_module.SUPPORTED_INDICATORS]
+        if unknown:
+            raise ValueError(f"Unsupported indicator(s): {', '.join(unknown)}")
+        symbol_list = normalize_symbols(symbols).split(",")
+        bars = await asyncio.gather(*(get_eod_bars(symbol, date_from, date_to) for symbol in symbol_list))
+        bars_by_symbol = dict(zip(symbol_list, bars))
+
+        # Vectorized across all symbols, off the event loop
+        def compute():
+            close = indicators_module.close_frame(bars_by_symbol)
+            return indicators_module.compute_indicators(close, names, int(window))
+
+        data = await asyncio.get_running_loop().run_in_executor(None, compute)
+        return json.dumps({"data": data})
+    except Exception as e:
+        logger.error(f"Error computing technical indicators: {e}")
+        return json.dumps({"error": str(e), "message": "Failed to compute technical indicators"})
+
+async def get_portfolio_summary(symbols, date_from=None, date_to=None, top=5) -> str:
+    """
+    Summarize how a whole portfolio or index (up to 500 symbols) did in one call, instead of calling get_quote or get_historical_eod symbol by symbol; without dates it uses today's quotes, with date_from/date_to the daily closes over the period; symbols listed in meta.pending are still loading, call again to include them.
+    :param symbols: Symbols separated by commas, or an index name: NASDAQ100
+    :param date_from: Optional first date of the period, formatted as YYYY-MM-DD
+    :param date_to: Optional last date of the period, formatted as YYYY-MM-DD
+    :param top: Number of top gainers and losers to list (default: 5)
+    :return: The JSON response organized as follows:
+        meta > requested:                               The number of symbols requested.
+        meta > missing:                                 Symbols without data.
+        meta > pending:                                 Symbols still loading when the answer was returned.
+        meta > period:                                  "day" for quotes, or the first and last date of the bars used.
+        data > symbols:                                 The number of symbols with data.
+        data > advancers, decliners, unchanged:         Breadth of the portfolio.
+        data > mean_change_pct, median_change_pct:      Equal-weighted average and median change in percent.
+        data > cap_weighted_change_pct:                 Market-cap weighted change in percent (quotes only).
+        data > median_volatility_annualized:            Median annualized volatility (period only).
+        data > worst_drawdown:                          Symbol with the largest peak-to-trough decline (period only).
+        data > top_gainers, top_losers:                 Symbol, sector and change_pct of the biggest movers.
+        data > sectors > <sector>:                      Count, mean_change_pct, best and worst symbol per sector.
+    """
+    logger.info(f'get_portfolio_summary() tool used.')
+    try:
+        portfolio = await import_off_loop("portfolio")
+        symbol_list = portfolio.expand_symbols(normalize_symbols(symbols).split(","))
+        if len(symbol_list) > PORTFOLIO_MAX_SYMBOLS:
+            raise ValueError(f"At most {PORTFOLIO_MAX_SYMBOLS} symbols are supported, got {len(symbol_list)}")
+        logger.info(f'Summarizing {len(symbol_list)} symbol(s) from {date_from or "today"}')
+
+        # Fetch API-sized chunks concurrently, with a bounded number in flight
+        semaphore = asyncio.Semaphore(PORTFOLIO_CONCURRENCY)
+        async def bounded(fetch, chunk):
+            async with semaphore:
+                return await fetch(chunk)
+
+        async def fetch_all(fetch, chunks):
+            """Return (result or exception per chunk, None for chunks not done by the deadline)"""
+            tasks = [asyncio.ensure_future(bounded(fetch, chunk)) for chunk in chunks]
+            await asyncio.wait(tasks, timeout=PORTFOLIO_FETCH_DEADLINE)
+            results = []
+            for task in tasks:
+                if not task.done():
+                    # Keep loading into the caches and the EOD store so a repeated call is complete
+                    _background_fetches.add(task)
+                    task.add_done_callback(_background_fetch_done)
+                    results.append(None)
+                else:
+                    results.append(task.exception() or task.result())
+            return results
+
+        if date_from or date_to:
+            results = await fetch_all(lambda symbol: get_eod_bars(symbol, date_from, date_to), symbol_list)
+            pending = [symbol for symbol, bars in zip(symbol_list, results) if bars is None]
+            bars_by_symbol = {
+                symbol: bars for symbol, bars in zip(symbol_list, results)
+                if isinstance(bars, dict) and len(bars.get("date", ()))
+            }
+            def compute():
+                table = portfolio.history_table(bars_by_symbol)
+                dates = [bars["date"] for bars in bars_by_symbol.values()]
+                period = {"date_from": str(min(d[0] for d in dates)), "date_to": str(max(d[-1] for d in dates))} if dates else None
+                return table, period
+        else:
+            chunks = [symbol_list[i:i + QUOTE_SYMBOL_LIMIT] for i in range(0, len(symbol_list), QUOTE_SYMBOL_LIMIT)]
+            results = await fetch_all(lambda chunk: fetch_quotes(",".join(chunk)), chunks)
+            pending = [symbol for chunk, result in zip(chunks, results) if result is None for symbol in chunk]
+            quotes = [
+                quote for result in results
+                if isinstance(result, tuple) and result[0] == 200
+                for quote in result[1].get("data", [])
+            ]
+            def compute():
+                return portfolio.quote_table(quotes), "day"
+
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logger.warning(f"get_portfolio_summary(): {len(failures)} fetch(es) failed, first: {failures[0]}")
+        if pending:
+            logger.warning(f"get_portfolio_summary(): {len(pending)} symbol(s) not loaded after {PORTFOLIO_FETCH_DEADLINE}s")
+        # Merge and aggregate off the event loop
+        def summarize():
+            table, period = compute()
+            missing = [s for s in symbol_list if s not in table.index and s not in pending]
+            return portfolio.summarize(table, int(top)), missing, period
+        data, missing, period = await asyncio.get_running_loop().run_in_executor(None, summarize)
+        return json.dumps({
+            "meta": {"requested": len(symbol_list), "missing": missing, "pending": pending, "period": period},
+            "data": data
+        })
+    except Exception as e:
+        logger.error(f"Error summarizing portfolio: {e}")
+        return json.dumps({"error": str(e), "message": "Failed to summarize portfolio"})
+
+def _background_fetch_done(task):
+    _background_fetches.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.warning(f"Background portfolio fetch failed: {task.exception()}")
+
 user_async_functions: Set[Callable[..., Any]] = {
     get_quote,
     get_news,
     get_historical_eod,
-    plot_time_series
+    plot_time_series,
+    plot_historical_eod,
+    get_technical_indicators,
+    get_portfolio_summary
 }
 
 # The commented code block is not needed in production, so it's been removed